@@ -0,0 +1,52 @@
+import os
+
+from pydantic import ValidationError
+
+# Helper generik endpoint /sync_*/bulk: validasi per item, chunk query, response per item.
+
+# Batas jumlah email per query IN
+SYNC_BULK_CHUNK_SIZE = int(os.getenv("SYNC_BULK_CHUNK_SIZE", "500"))
+
+
+def chunks(rows, size=SYNC_BULK_CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def validate_items(items, schema):
+    """
+    Validasi item bulk satu per satu: item yang tidak valid tidak menggagalkan batch.
+    Return: (list (index, data) yang valid, dict index -> status item tidak valid)
+    """
+    valid, results = [], {}
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema(**item)))
+        except (ValidationError, TypeError) as e:
+            detail = [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()] \
+                if isinstance(e, ValidationError) else [str(e)]
+            results[index] = {"index": index, "status": "invalid", "detail": detail}
+    return valid, results
+
+
+def mark_ok(valid, results):
+    for index, data in valid:
+        results[index] = {"index": index, "email": data.email, "status": "ok"}
+
+
+def bulk_response(results, total):
+    ordered = [results[index] for index in range(total)]
+    return {
+        "synced": sum(1 for r in ordered if r["status"] == "ok"),
+        "failed": sum(1 for r in ordered if r["status"] != "ok"),
+        "results": ordered,
+    }
+
+
+def load_by_email(db, model, emails):
+    # Satu query IN per chunk; baris pertama per email (sama dengan .first())
+    found = {}
+    for chunk in chunks(sorted(emails)):
+        for row in db.query(model).filter(model.email.in_(chunk)).order_by(model.id):
+            found.setdefault(row.email, row)
+    return found
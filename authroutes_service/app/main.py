@@ -1,5 +1,8 @@
 import logging
 import os
+import time
+import uuid
+import anyio
 import redis.asyncio as aioredis
 from datetime import datetime, timedelta
 from typing import List
@@ -8,7 +11,7 @@ from typing import List
 from fastapi import FastAPI, Depends, HTTPException, status, Request, APIRouter
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import extract
+from sqlalchemy import extract, insert, select
 from sqlalchemy.orm import Session
 from jose import jwt
 from dotenv import load_dotenv
@@ -17,9 +20,13 @@ from dotenv import load_dotenv
 import models
 import schemas
 import utils
+import bulk_sync
 import database
+import http_client
+import metrics
+import password_pool
+import token_auth
 from database import get_db
-import httpx
 
 # --- KONFIGURASI & SETUP ---
 
@@ -43,6 +50,14 @@ app = FastAPI()
 router = APIRouter()
 
 PREDICT_SERVICE_URL = "http://predictroutes_service:8001"
+# Shared secret endpoint internal Predict Service (header X-Admin-Token)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Shared HTTP client ke Predict Service (dibuat saat startup, ditutup saat shutdown)
+predict_client = http_client.ServiceClient("predict", PREDICT_SERVICE_URL)
+
+# Pool bcrypt (hash & verify password) di luar event loop
+passwords = password_pool.PasswordPool()
 
 # CORS Configuration
 app.add_middleware(
@@ -59,6 +74,9 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Verifikasi JWT dengan cache lokal + daftar revokasi di Redis
+tokens = token_auth.TokenVerifier(SECRET_KEY, ALGORITHM)
+
 # Redis Global Variable
 redis = None
 
@@ -73,21 +91,99 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"Redis connection failed: {e}")
 
+    await predict_client.start()
+    passwords.start()
+    tokens.start(redis)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await predict_client.aclose()
+    passwords.shutdown()
+    await tokens.stop()
+
 # --- UTILITY FUNCTIONS ---
 
 def normalize_work_title(work_title: str) -> str:
     """Membersihkan string pekerjaan untuk pencocokan ID."""
     return ''.join(e for e in work_title.lower().strip() if e.isalnum() or e.isspace()).replace(" ", "")
 
+# Mapping pekerjaan -> work_id (fitur Occupation model), lainnya 20
+WORK_ID_MAP = {
+    'accountant': 0, 'doctor': 1, 'engineer': 2, 'lawyer': 3,
+    'manager': 4, 'nurse': 5, 'salesrepresentative': 6, 'salesperson': 7,
+    'scientist': 8, 'softwareengineer': 9, 'teacher': 10
+}
+
+def work_id_for(work_title: str) -> int:
+    return WORK_ID_MAP.get(normalize_work_title(work_title), 20)
+
+def calculate_age(date_of_birth: str):
+    """Umur dari tanggal lahir 'YYYY-MM-DD', None jika format tidak valid."""
+    try:
+        birth_date = datetime.strptime(date_of_birth, '%Y-%m-%d')
+    except ValueError:
+        return None
+    today = datetime.today()
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+def apply_work(db: Session, user, work_title: str):
+    """Set pekerjaan user + work_id di tabel Work (dibuat dengan nilai default jika belum ada)."""
+    user.work = work_title
+    work_id = user.work_id = work_id_for(work_title)
+
+    work_record = db.query(models.Work).filter(models.Work.email == user.email).first()
+    if not work_record:
+        work_record = models.Work(
+            email=user.email, work_id=work_id,
+            quality_of_sleep=5.0, physical_activity_level=50.0, stress_level=5.0
+        )
+        db.add(work_record)
+    else:
+        work_record.work_id = work_id
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # jti: identitas token untuk revokasi (logout)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+async def hash_password(password: str):
+    try:
+        return await passwords.hash(password)
+    except password_pool.PoolSaturated:
+        raise HTTPException(status_code=503, detail="Server sibuk, coba lagi", headers={"Retry-After": "1"})
+
+async def verify_password(user, plain_password: str, db: Session):
+    """
+    Verifikasi password di pool bcrypt. Jika benar tetapi cost hash-nya
+    berbeda dari cost aktif, hash baru langsung disimpan (rehash transparan).
+    """
+    try:
+        valid, new_hash = await passwords.verify_and_update(plain_password, user.hashed_password)
+    except password_pool.PoolSaturated:
+        metrics.inc("login_rejected_total")
+        raise HTTPException(status_code=503, detail="Server sibuk, coba lagi", headers={"Retry-After": "1"})
+    if valid and new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+        metrics.inc("password_rehash_total")
+    return valid
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """Dependency: claims JWT yang valid & belum di-logout, 401 jika tidak."""
+    try:
+        return await tokens.verify(token)
+    except token_auth.InvalidToken:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
 # --- TAMBAHAN HELPER FUNCTION ---
 async def push_to_daily_service(data: dict):
     """
@@ -99,16 +195,26 @@ async def push_to_daily_service(data: dict):
         if "date" not in data:
             data["date"] = str(datetime.now().date())
             
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                f"{PREDICT_SERVICE_URL}/sync_daily",
-                json=data,
-                timeout=5.0
-            )
+        await predict_client.post("/sync_daily", json=data)
     except Exception as e:
         # Kita log error saja, jangan sampai user gagal save cuma karena service 8001 mati
         logger.error(f"Gagal sinkron ke Predict Service: {e}")
 
+async def invalidate_profile_cache(email: str):
+    """
+    Memberi tahu Predict Service bahwa profil user berubah,
+    agar cache profil di sana tidak menyajikan data lama.
+    """
+    try:
+        resp = await predict_client.post(
+            "/user-profile-cache/invalidate", json={"email": email},
+            headers={"X-Admin-Token": ADMIN_TOKEN or ""},
+        )
+        if resp.status_code != 200:
+            logger.error(f"Gagal invalidasi cache profil di Predict Service: HTTP {resp.status_code}")
+    except Exception as e:
+        logger.error(f"Gagal invalidasi cache profil di Predict Service: {e}")
+
 # ==========================================
 # 1. AUTHENTICATION ENDPOINTS
 # ==========================================
@@ -119,7 +225,8 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = utils.get_password_hash(user.password)
+    # Handler sync (thread pool FastAPI): hashing tetap lewat pool bcrypt
+    hashed_password = anyio.from_thread.run(hash_password, user.password)
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
@@ -138,37 +245,52 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
 @app.post("/login/")
 async def login(request: schemas.LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == request.email).first()
-    
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email tidak terdaftar")
-    
-    if not utils.verify_password(request.password, user.hashed_password):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Password salah")
-    
-    access_token = create_access_token(
-        data={"sub": user.email, "role": user.role},
-        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
-    
-    return {"access_token": access_token, "token_type": "bearer", "role": user.role}
+    started = time.perf_counter()
+    try:
+        user = db.query(models.User).filter(models.User.email == request.email).first()
 
-@app.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not utils.verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email tidak terdaftar")
+
+        if not await verify_password(user, request.password, db):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Password salah")
+
+        access_token = create_access_token(
+            data={"sub": user.email, "role": user.role},
+            expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         )
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer", "role": "user"}
+        return {"access_token": access_token, "token_type": "bearer", "role": user.role}
+    finally:
+        # Semua hasil (200, 401, 503 pool penuh) ikut terukur
+        metrics.observe("login_latency_ms", (time.perf_counter() - started) * 1000)
+
+@app.post("/token", response_model=schemas.Token)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    started = time.perf_counter()
+    try:
+        user = db.query(models.User).filter(models.User.email == form_data.username).first()
+        if not user or not await verify_password(user, form_data.password, db):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Incorrect username or password",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        access_token = create_access_token(data={"sub": user.email})
+        return {"access_token": access_token, "token_type": "bearer", "role": "user"}
+    finally:
+        metrics.observe("login_latency_ms", (time.perf_counter() - started) * 1000)
 
 @app.post("/logout/")
 async def logout(token: str = Depends(oauth2_scheme)):
+    claims = await get_current_user(token)
+    await tokens.revoke(token, claims)
     return {"msg": "Logout successful"}
 
+@app.get("/verify-token")
+async def verify_token(claims: dict = Depends(get_current_user)):
+    """Validasi token untuk service lain (mis. Predict Service)."""
+    return {"email": claims.get("sub"), "role": claims.get("role"), "exp": claims.get("exp")}
+
 # ==========================================
 # 2. USER PROFILE & HEALTH DATA
 # ==========================================
@@ -180,6 +302,43 @@ async def get_user_profile(email: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+# Kolom profil yang dipakai model di Predict Service (features.prepare_features)
+PROFILE_USER_COLUMNS = (
+    models.User.age, models.User.gender, models.User.height, models.User.weight,
+    models.User.upper_pressure, models.User.lower_pressure, models.User.daily_steps, models.User.heart_rate,
+)
+PROFILE_WORK_COLUMNS = (
+    models.Work.work_id, models.Work.quality_of_sleep, models.Work.physical_activity_level, models.Work.stress_level,
+)
+
+@app.post("/user-profiles/batch")
+def get_user_profiles_batch(request: schemas.ProfileBatchRequest, db: Session = Depends(get_db)):
+    """
+    Profil banyak user sekaligus untuk job batch di Predict Service:
+    satu query IN per chunk (outer join work_data), hanya kolom fitur model.
+    Return: {"profiles": {email: {...}}, "not_found": [email, ...]}
+    """
+    emails = list(dict.fromkeys(request.emails))
+    profiles = {}
+    for chunk in bulk_sync.chunks(emails):
+        rows = db.execute(
+            select(models.User.email, *PROFILE_USER_COLUMNS, *PROFILE_WORK_COLUMNS)
+            .outerjoin(models.Work, models.Work.email == models.User.email)
+            .where(models.User.email.in_(chunk))
+            .order_by(models.User.email, models.Work.id)
+        ).mappings()
+        for row in rows:
+            # work_data pertama per email (sama dengan _load_by_email)
+            if row["email"] in profiles:
+                continue
+            profile = {column.key: row[column.key] for column in PROFILE_USER_COLUMNS}
+            # Tanpa work_data: kolom dihilangkan agar Predict Service memakai nilai default fitur
+            profile.update(
+                (column.key, row[column.key]) for column in PROFILE_WORK_COLUMNS if row[column.key] is not None
+            )
+            profiles[row["email"]] = profile
+    return {"profiles": profiles, "not_found": [email for email in emails if email not in profiles]}
+
 @app.put("/user-profile/update")
 async def update_user_profile(user_data: schemas.UserProfile, db: Session = Depends(database.get_db)):
     user = db.query(models.User).filter(models.User.email == user_data.email).first()
@@ -194,6 +353,7 @@ async def update_user_profile(user_data: schemas.UserProfile, db: Session = Depe
 
     db.commit()
     db.refresh(user)
+    await invalidate_profile_cache(user.email)
 
     return {"message": "User profile updated successfully", "user": user}
 
@@ -205,6 +365,7 @@ async def save_name(request: schemas.UserUpdate, db: Session = Depends(get_db)):
     
     user.name = request.name
     db.commit()
+    await invalidate_profile_cache(user.email)
     return {"message": "Name saved successfully", "user": user}
 
 @app.put("/save-gender/")
@@ -215,6 +376,7 @@ async def save_gender(request: schemas.UserUpdate, db: Session = Depends(get_db)
     if request.gender is not None:
         user.gender = int(request.gender)
     db.commit()
+    await invalidate_profile_cache(user.email)
     return {"message": "Gender saved successfully", "user": user}
 
 @app.put("/save-dob/")
@@ -225,14 +387,11 @@ async def save_dob(request: schemas.UserUpdate, db: Session = Depends(get_db)):
     if request.date_of_birth:
         user.date_of_birth = request.date_of_birth
         # Hitung Umur
-        try:
-            birth_date = datetime.strptime(request.date_of_birth, '%Y-%m-%d')
-            today = datetime.today()
-            age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+        age = calculate_age(request.date_of_birth)
+        if age is not None:
             user.age = age
-        except ValueError:
-            pass 
     db.commit()
+    await invalidate_profile_cache(user.email)
     return {"message": "DOB saved", "user": user}
 
 @app.put("/save-weight/")
@@ -241,6 +400,7 @@ async def save_weight(request: schemas.UserUpdate, db: Session = Depends(get_db)
     if not user: raise HTTPException(status_code=404, detail="User not found")
     user.weight = request.weight
     db.commit()
+    await invalidate_profile_cache(user.email)
     return {"message": "Weight saved"}
 
 @app.put("/save-height/")
@@ -249,6 +409,7 @@ async def save_height(request: schemas.UserUpdate, db: Session = Depends(get_db)
     if not user: raise HTTPException(status_code=404, detail="User not found")
     user.height = request.height
     db.commit()
+    await invalidate_profile_cache(user.email)
     return {"message": "Height saved"}
 
 @app.put("/save-blood-pressure/")
@@ -263,6 +424,7 @@ async def save_blood_pressure(request: Request, db: Session = Depends(get_db)):
     user.upper_pressure = data.get('upperPressure')
     user.lower_pressure = data.get('lowerPressure')
     db.commit()
+    await invalidate_profile_cache(email)
     
     # 2. Kirim ke Predict Service (History Harian)
     await push_to_daily_service({
@@ -284,6 +446,7 @@ async def save_daily_steps(request: Request, db: Session = Depends(get_db)):
     # 1. Update DB Lokal (User Profile)
     user.daily_steps = data.get('dailySteps')
     db.commit()
+    await invalidate_profile_cache(email)
     
     # 2. Kirim ke Predict Service (History Harian)
     await push_to_daily_service({
@@ -304,6 +467,7 @@ async def save_heart_rate(request: Request, db: Session = Depends(get_db)):
     # 1. Update DB Lokal (User Profile)
     user.heart_rate = data.get('heartRate')
     db.commit()
+    await invalidate_profile_cache(email)
 
     # 2. Kirim ke Predict Service (History Harian)
     await push_to_daily_service({
@@ -318,33 +482,50 @@ async def save_work(request: schemas.UserUpdate, db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.email == request.email).first()
     if not user: raise HTTPException(status_code=404, detail="User not found")
 
-    normalized_work = normalize_work_title(request.work)
-    user.work = request.work
-
-    # Mapping Work ID
-    work_id_map = {
-        'accountant': 0, 'doctor': 1, 'engineer': 2, 'lawyer': 3,
-        'manager': 4, 'nurse': 5, 'salesrepresentative': 6, 'salesperson': 7,
-        'scientist': 8, 'softwareengineer': 9, 'teacher': 10
-    }
-    
-    work_id = work_id_map.get(normalized_work, 20) 
-    user.work_id = work_id
-
     # Simpan ke tabel Work
-    work_record = db.query(models.Work).filter(models.Work.email == user.email).first()
-    if not work_record:
-        work_record = models.Work(
-            email=user.email, work_id=work_id, 
-            quality_of_sleep=5.0, physical_activity_level=50.0, stress_level=5.0
-        )
-        db.add(work_record)
-    else:
-        work_record.work_id = work_id
+    apply_work(db, user, request.work)
 
     db.commit()
+    await invalidate_profile_cache(user.email)
     return {"message": "Work saved", "user": user}
 
+# Field yang juga dicatat ke tabel daily di Predict Service (sama dengan save-blood-pressure dkk.)
+DAILY_PROFILE_FIELDS = ("upper_pressure", "lower_pressure", "daily_steps", "heart_rate")
+
+@app.patch("/user-profile")
+async def patch_user_profile(request: schemas.UserProfilePatch, db: Session = Depends(get_db)):
+    """
+    Ubah sebagian profil sekaligus (pengganti rangkaian save-* saat onboarding):
+    satu SELECT, satu commit, satu invalidasi cache, maksimal satu push ke sync_daily.
+    """
+    fields = request.model_dump(exclude_unset=True, exclude={"email"})
+    # null eksplisit tidak menghapus nilai (kolom profil bukan nullable di sisi Predict)
+    nulls = [field for field, value in fields.items() if value is None]
+    if nulls:
+        raise HTTPException(status_code=422, detail=f"Fields cannot be null: {', '.join(nulls)}")
+    user = db.query(models.User).filter(models.User.email == request.email).first()
+    if not user: raise HTTPException(status_code=404, detail="User not found")
+    if not fields:
+        return {"message": "Nothing to update", "updated": [], "user": user}
+
+    for field, value in fields.items():
+        if field == "work":
+            apply_work(db, user, value)
+        else:
+            setattr(user, field, value)
+    if fields.get("date_of_birth"):
+        age = calculate_age(fields["date_of_birth"])
+        if age is not None:
+            user.age = age
+    db.commit()
+    await invalidate_profile_cache(user.email)
+
+    daily = {field: fields[field] for field in DAILY_PROFILE_FIELDS if field in fields}
+    if daily:
+        await push_to_daily_service({"email": user.email, **daily})
+
+    return {"message": "Profile updated", "updated": list(fields), "user": user}
+
 @app.post("/store-info")
 async def store_user_info(user_info: schemas.UserInfo):
     if redis:
@@ -389,14 +570,8 @@ def get_user_detail(email: str, db: Session = Depends(get_db)):
 # ==========================================
 # Bagian ini TIDAK DIUBAH sesuai permintaan Anda.
 
-@app.post("/sync_users")
-def sync_users(data: schemas.SyncUserRequest, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == data.email).first()
-    
-    if not user:
-        user = models.User(email=data.email, role="user", hashed_password="OFFLINE_CREATED")
-        db.add(user)
-    
+# Aturan field dipakai bersama endpoint single & /bulk
+def apply_sync_user(user, data):
     if data.name: user.name = data.name
     if data.gender is not None: user.gender = data.gender
     if data.work: user.work = data.work
@@ -409,20 +584,37 @@ def sync_users(data: schemas.SyncUserRequest, db: Session = Depends(get_db)):
     if data.daily_steps: user.daily_steps = data.daily_steps
     if data.heart_rate: user.heart_rate = data.heart_rate
 
+def apply_sync_work(work, data):
+    work.quality_of_sleep = data.quality_of_sleep
+    work.physical_activity_level = data.physical_activity_level
+    work.stress_level = data.stress_level
+    work.work_id = data.work_id
+
+def parse_sync_created_at(created_at):
+    try:
+        return datetime.fromisoformat(created_at)
+    except:
+        return datetime.now()
+
+@app.post("/sync_users")
+def sync_users(data: schemas.SyncUserRequest, db: Session = Depends(get_db)):
+    user = db.query(models.User).filter(models.User.email == data.email).first()
+    
+    if not user:
+        user = models.User(email=data.email, role="user", hashed_password="OFFLINE_CREATED")
+        db.add(user)
+    
+    apply_sync_user(user, data)
+
     db.commit()
     return {"message": "User synced"}
 
 @app.post("/sync_feedback")
 async def sync_feedback(feedback: schemas.SyncFeedbackRequest, db: Session = Depends(get_db)):
-    try:
-        created = datetime.fromisoformat(feedback.created_at)
-    except:
-        created = datetime.now()
-        
     new_fb = models.Feedback(
         email=feedback.email, 
         feedback=feedback.feedback, 
-        created_at=created
+        created_at=parse_sync_created_at(feedback.created_at)
     )
     db.add(new_fb)
     db.commit()
@@ -431,19 +623,80 @@ async def sync_feedback(feedback: schemas.SyncFeedbackRequest, db: Session = Dep
 @app.post("/sync_work_data")
 def sync_work_data(data: schemas.SyncWorkDataRequest, db: Session = Depends(get_db)):
     work = db.query(models.Work).filter(models.Work.email == data.email).first()
-    if work:
-        work.quality_of_sleep = data.quality_of_sleep
-        work.physical_activity_level = data.physical_activity_level
-        work.stress_level = data.stress_level
-        work.work_id = data.work_id
-    else:
-        new_work = models.Work(
-            email=data.email,
-            quality_of_sleep=data.quality_of_sleep,
-            physical_activity_level=data.physical_activity_level,
-            stress_level=data.stress_level,
-            work_id=data.work_id
-        )
-        db.add(new_work)
+    if not work:
+        work = models.Work(email=data.email)
+        db.add(work)
+    apply_sync_work(work, data)
     db.commit()
-    return {"message": "Work synced"}
\ No newline at end of file
+    return {"message": "Work synced"}
+
+# --- BULK SYNC (replay antrian offline dalam satu request) ---
+
+@app.post("/sync_users/bulk")
+def sync_users_bulk(request: schemas.SyncBulkRequest, db: Session = Depends(get_db)):
+    valid, results = bulk_sync.validate_items(request.items, schemas.SyncUserRequest)
+    if valid:
+        try:
+            users = bulk_sync.load_by_email(db, models.User, {data.email for _, data in valid})
+            for _, data in valid:
+                user = users.get(data.email)
+                if not user:
+                    user = users[data.email] = models.User(
+                        email=data.email, role="user", hashed_password="OFFLINE_CREATED"
+                    )
+                    db.add(user)
+                apply_sync_user(user, data)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Bulk Sync Users Error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+    bulk_sync.mark_ok(valid, results)
+    return bulk_sync.bulk_response(results, len(request.items))
+
+@app.post("/sync_feedback/bulk")
+def sync_feedback_bulk(request: schemas.SyncBulkRequest, db: Session = Depends(get_db)):
+    valid, results = bulk_sync.validate_items(request.items, schemas.SyncFeedbackRequest)
+    if valid:
+        rows = [
+            {"email": data.email, "feedback": data.feedback, "created_at": parse_sync_created_at(data.created_at)}
+            for _, data in valid
+        ]
+        try:
+            # executemany: satu statement INSERT untuk semua baris
+            db.execute(insert(models.Feedback), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Bulk Sync Feedback Error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+    bulk_sync.mark_ok(valid, results)
+    return bulk_sync.bulk_response(results, len(request.items))
+
+@app.post("/sync_work_data/bulk")
+def sync_work_data_bulk(request: schemas.SyncBulkRequest, db: Session = Depends(get_db)):
+    valid, results = bulk_sync.validate_items(request.items, schemas.SyncWorkDataRequest)
+    if valid:
+        try:
+            works = bulk_sync.load_by_email(db, models.Work, {data.email for _, data in valid})
+            for _, data in valid:
+                work = works.get(data.email)
+                if not work:
+                    work = works[data.email] = models.Work(email=data.email)
+                    db.add(work)
+                apply_sync_work(work, data)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Bulk Sync Work Error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+    bulk_sync.mark_ok(valid, results)
+    return bulk_sync.bulk_response(results, len(request.items))
+
+# ==========================================
+# 6. MONITORING
+# ==========================================
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import metrics
+import utils
+
+logger = logging.getLogger(__name__)
+
+# --- PASSWORD POOL SETTINGS ---
+# bcrypt (hash & verify) berat di CPU: dijalankan di pool terpisah, bukan di event loop.
+# "thread"  : thread pool (bcrypt melepas GIL saat hashing)
+# "process" : process pool (bebas GIL sepenuhnya, memori per worker)
+PASSWORD_EXECUTOR = os.getenv("PASSWORD_EXECUTOR", "thread").lower()
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "4"))
+PASSWORD_QUEUE_MAX = int(os.getenv("PASSWORD_QUEUE_MAX", "32"))  # antrian di luar yang sedang diproses
+
+
+class PoolSaturated(Exception):
+    """Antrian pool penuh: request ditolak (503) daripada menunggu tanpa batas."""
+
+
+class PasswordPool:
+    """
+    Pool bcrypt dengan batas antrian.
+
+    Maksimal workers + queue_max pekerjaan sekaligus (sedang diproses + menunggu);
+    di atas itu langsung raise PoolSaturated, sehingga login storm tidak
+    menumpuk latency untuk semua request lain di worker ini.
+    """
+
+    def __init__(self, kind=PASSWORD_EXECUTOR, workers=PASSWORD_WORKERS, queue_max=PASSWORD_QUEUE_MAX):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_max)
+        self.inflight = 0
+        self._executor = None
+
+        metrics.register_gauge("password_pool_inflight", lambda: self.inflight)
+        metrics.register_gauge("password_pool_saturation", lambda: round(self.inflight / self.capacity, 4))
+        metrics.register_gauge("bcrypt_rounds", lambda: utils.bcrypt_rounds)
+
+    def start(self):
+        if self._executor is not None:
+            return
+        # Cost bcrypt ditentukan sekali di proses utama (kalibrasi), worker process memakai nilai yang sama
+        rounds = utils.bcrypt_rounds or utils.configure_bcrypt()
+        if self.kind == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=utils.configure_bcrypt, initargs=(rounds,),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        logger.info(
+            f"Password pool started ({self.kind}, workers={self.workers}, capacity={self.capacity}, "
+            f"bcrypt rounds={rounds})"
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        if self.inflight >= self.capacity:
+            metrics.inc("password_pool_rejected_total")
+            raise PoolSaturated(f"Password pool saturated ({self.inflight}/{self.capacity})")
+        self.start()
+
+        self.inflight += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.inflight -= 1
+            metrics.observe("password_pool_latency_ms", (time.perf_counter() - started) * 1000)
+
+    async def hash(self, password):
+        return await self._run(utils.get_password_hash, password)
+
+    async def verify(self, plain_password, hashed_password):
+        return await self._run(utils.verify_password, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password, hashed_password):
+        return await self._run(utils.verify_and_update, plain_password, hashed_password)
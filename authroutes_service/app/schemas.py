@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import date, datetime, time
-from typing import Optional
+from typing import Optional, List, Dict, Any
 
 # =======================
 # AUTHENTICATION SCHEMAS
@@ -56,6 +56,27 @@ class UserProfile(BaseModel):
     gender: Optional[int] = None
     date_of_birth: Optional[str] = None
 
+class UserProfilePatch(BaseModel):
+    # Hanya field yang dikirim yang diubah (PATCH /user-profile).
+    # Nama camelCase dari save-blood-pressure / save-daily-steps / save-heart-rate juga diterima.
+    email: str
+    name: Optional[str] = None
+    gender: Optional[int] = None
+    date_of_birth: Optional[str] = None
+    weight: Optional[float] = None
+    height: Optional[float] = None
+    upper_pressure: Optional[int] = Field(None, alias="upperPressure")
+    lower_pressure: Optional[int] = Field(None, alias="lowerPressure")
+    daily_steps: Optional[int] = Field(None, alias="dailySteps")
+    heart_rate: Optional[int] = Field(None, alias="heartRate")
+    work: Optional[str] = None
+
+    class Config:
+        populate_by_name = True
+
+class ProfileBatchRequest(BaseModel):
+    emails: List[str]
+
 class UserData(BaseModel):
     email: str
     name: str
@@ -66,6 +87,10 @@ class UserData(BaseModel):
     height: float
     weight: float 
 
+class SyncBulkRequest(BaseModel):
+    # Item divalidasi satu per satu di endpoint (status per item)
+    items: List[Dict[str, Any]]
+
 class UserInfo(BaseModel):
     gender: int
     age: int
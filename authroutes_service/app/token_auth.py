@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from jose import jwt, JWTError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- TOKEN VERIFICATION SETTINGS ---
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "5"))  # detik, sinkron bloom dari Redis
+REVOCATION_BLOOM_BITS = int(os.getenv("REVOCATION_BLOOM_BITS", str(1 << 20)))
+REVOCATION_BLOOM_HASHES = 4
+
+# Sorted set Redis: member = jti, score = exp token (dipakai untuk membuang yang sudah kadaluarsa)
+REVOKED_KEY = "auth:revoked_jti"
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def token_id(token, claims):
+    """jti token; token lama tanpa jti memakai hash token itu sendiri."""
+    return claims.get("jti") or hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+class BloomFilter:
+    """Bloom filter sederhana: False = pasti tidak ada, True = mungkin ada."""
+
+    def __init__(self, bits=REVOCATION_BLOOM_BITS, hashes=REVOCATION_BLOOM_HASHES):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=8 * self.hashes).digest()
+        for i in range(self.hashes):
+            yield int.from_bytes(digest[8 * i:8 * (i + 1)], "big") % self.bits
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class TokenVerifier:
+    """
+    Verifikasi JWT dengan cache lokal.
+
+    - Token yang sudah diverifikasi disimpan (LRU) sampai `exp`-nya, request
+      berikutnya tidak perlu cek signature lagi
+    - Revokasi (logout) disimpan di Redis (REVOKED_KEY). Worker ini memegang
+      bloom filter dari isi set tersebut (disinkron tiap REVOCATION_SYNC_INTERVAL
+      detik): jti yang tidak ada di bloom pasti belum dicabut -> tanpa panggilan
+      Redis. Hanya jika bloom "mungkin ada", Redis ditanya untuk memastikan.
+    - Logout di worker lain terlihat paling lambat setelah satu kali sinkron
+    """
+
+    def __init__(self, secret_key, algorithm, max_entries=TOKEN_CACHE_MAX_ENTRIES,
+                 sync_interval=REVOCATION_SYNC_INTERVAL):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.max_entries = max_entries
+        self.sync_interval = sync_interval
+        self.redis = None
+        self._entries = OrderedDict()  # token -> (claims, exp)
+        self._bloom = BloomFilter()
+        self._local_revoked = {}       # jti -> exp, dicabut di worker ini (tetap ada walau Redis gagal)
+        self._sync_task = None
+
+        metrics.register_gauge("token_cache_entries", lambda: len(self._entries))
+        metrics.register_gauge("revocation_bloom_entries", lambda: self._bloom.count)
+
+    def start(self, redis):
+        self.redis = redis
+        if redis is not None:
+            self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self):
+        if self._sync_task is None:
+            return
+        self._sync_task.cancel()
+        try:
+            await self._sync_task
+        except asyncio.CancelledError:
+            pass
+        self._sync_task = None
+
+    async def verify(self, token):
+        """Claims token yang valid & belum dicabut; raise InvalidToken jika tidak."""
+        now = time.time()
+        entry = self._entries.get(token)
+        if entry is not None and entry[1] > now:
+            self._entries.move_to_end(token)
+            metrics.inc("token_cache_hit_total")
+            claims = entry[0]
+        else:
+            if entry is not None:
+                self._entries.pop(token, None)
+            metrics.inc("token_cache_miss_total")
+            try:
+                claims = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+            except JWTError as e:
+                raise InvalidToken(str(e))
+            if claims.get("exp") is not None:
+                # Token tanpa exp tidak di-cache (tidak ada batas umur)
+                self._store(token, claims, claims["exp"])
+
+        return await self._check_revoked(token, claims)
+
+    async def revoke(self, token, claims):
+        """Cabut token (logout): masuk ke Redis & bloom lokal, dibuang dari cache."""
+        jti = token_id(token, claims)
+        exp = claims.get("exp") or time.time() + 24 * 3600
+        self._bloom.add(jti)
+        self._local_revoked[jti] = exp
+        self._entries.pop(token, None)
+        metrics.inc("token_revoked_total")
+        if self.redis is None:
+            return
+        try:
+            await self.redis.zadd(REVOKED_KEY, {jti: exp})
+        except Exception as e:
+            logger.error(f"Failed to store revoked token in Redis: {e}")
+
+    async def sync_revocations(self):
+        """Bangun ulang bloom dari jti yang belum kadaluarsa di Redis."""
+        now = time.time()
+        try:
+            await self.redis.zremrangebyscore(REVOKED_KEY, "-inf", now)
+            revoked = await self.redis.zrangebyscore(REVOKED_KEY, now, "+inf")
+        except Exception as e:
+            logger.warning(f"Revocation sync failed: {e}")
+            return
+        self._local_revoked = {jti: exp for jti, exp in self._local_revoked.items() if exp > now}
+        bloom = BloomFilter(self._bloom.bits, self._bloom.hashes)
+        for jti in [*revoked, *self._local_revoked]:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    async def _sync_loop(self):
+        while True:
+            await self.sync_revocations()
+            await asyncio.sleep(self.sync_interval)
+
+    async def _check_revoked(self, token, claims):
+        jti = token_id(token, claims)
+        if jti not in self._bloom:
+            return claims
+        if jti not in self._local_revoked:
+            if self.redis is None:
+                return claims  # tanpa Redis bloom hanya berisi _local_revoked: false positive
+            metrics.inc("token_revocation_redis_checks_total")
+            try:
+                if await self.redis.zscore(REVOKED_KEY, jti) is None:
+                    return claims  # false positive bloom
+            except Exception as e:
+                # Redis tidak bisa dipastikan: anggap dicabut (aman)
+                logger.warning(f"Revocation check failed: {e}")
+        self._entries.pop(token, None)
+        raise InvalidToken("Token has been revoked")
+
+    def _store(self, token, claims, exp):
+        self._entries[token] = (claims, exp)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
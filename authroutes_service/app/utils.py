@@ -1,20 +1,109 @@
 from passlib.context import CryptContext
 import logging
+import math
+import os
 import sqlite3
+import time
 from sqlalchemy.exc import OperationalError, SQLAlchemyError, DBAPIError
 
 # Konfigurasi Logger
 logger = logging.getLogger(__name__)
 
+# --- BCRYPT COST ---
+# Urutan sumber cost: BCRYPT_ROUNDS -> BCRYPT_ROUNDS_FILE (hasil kalibrasi
+# sebelumnya) -> kalibrasi sekali saat startup, lalu disimpan ke file tsb.
+# Kalibrasi: cost terbesar yang satu hash-nya masih <= BCRYPT_TARGET_MS di host ini.
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+BCRYPT_ROUNDS_FILE = os.getenv("BCRYPT_ROUNDS_FILE", "/app/data/bcrypt_rounds")
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+BCRYPT_MIN_ROUNDS = 12  # default passlib; cost tidak pernah diturunkan di bawah ini
+BCRYPT_MAX_ROUNDS = 16
+BCRYPT_CALIBRATION_ROUNDS = 10  # cost untuk pengukuran (lebih murah dari batas bawah)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+bcrypt_rounds = None  # cost aktif setelah configure_bcrypt()
+
+def _bcrypt_context(rounds):
+    # Hanya hash dengan cost < rounds yang needs_update (di-rehash saat login);
+    # hash dengan cost lebih tinggi dibiarkan, cost tidak pernah diturunkan
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto",
+        bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds,
+    )
+
+def calibrate_bcrypt_rounds(target_ms=BCRYPT_TARGET_MS, samples=3):
+    """
+    Ukur satu hash pada BCRYPT_CALIBRATION_ROUNDS (ambil yang tercepat dari `samples`),
+    lalu naikkan cost selama perkiraan waktunya <= target (tiap +1 round = 2x waktu).
+    Hasil tidak pernah di bawah BCRYPT_MIN_ROUNDS.
+    """
+    context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=BCRYPT_CALIBRATION_ROUNDS)
+    elapsed_ms = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash("calibration")
+        elapsed_ms.append((time.perf_counter() - started) * 1000)
+    base_ms = min(elapsed_ms)
+    extra = int(math.floor(math.log2(target_ms / base_ms))) if target_ms > base_ms else 0
+    rounds = max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, BCRYPT_CALIBRATION_ROUNDS + extra))
+    logger.info(
+        f"bcrypt calibrated: {base_ms:.1f} ms at {BCRYPT_CALIBRATION_ROUNDS} rounds -> {rounds} rounds "
+        f"(~{base_ms * 2 ** (rounds - BCRYPT_CALIBRATION_ROUNDS):.0f} ms, target {target_ms:.0f} ms)"
+    )
+    return rounds
+
+def _load_bcrypt_rounds(path=BCRYPT_ROUNDS_FILE):
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring bcrypt rounds file {path}: {e}")
+        return None
 
-# --- 1. Fungsi Password (Tetap Sama) ---
+def _save_bcrypt_rounds(rounds, path=BCRYPT_ROUNDS_FILE):
+    try:
+        with open(path, "w") as f:
+            f.write(f"{rounds}\n")
+    except OSError as e:
+        logger.warning(f"Failed to persist bcrypt rounds to {path}: {e}")
+
+def configure_bcrypt(rounds=None):
+    """
+    Set cost bcrypt proses ini: `rounds`, BCRYPT_ROUNDS, BCRYPT_ROUNDS_FILE, atau
+    hasil kalibrasi (disimpan ke BCRYPT_ROUNDS_FILE agar tidak dikalibrasi ulang).
+    Juga dipakai sebagai initializer worker process pool (rounds dari proses utama).
+    """
+    global pwd_context, bcrypt_rounds
+    if rounds is None and BCRYPT_ROUNDS:
+        rounds = int(BCRYPT_ROUNDS)
+    if rounds is None:
+        rounds = _load_bcrypt_rounds()
+    if rounds is None:
+        rounds = calibrate_bcrypt_rounds()
+        _save_bcrypt_rounds(rounds)
+    if rounds < BCRYPT_MIN_ROUNDS:
+        logger.warning(f"bcrypt rounds {rounds} below minimum, using {BCRYPT_MIN_ROUNDS}")
+        rounds = BCRYPT_MIN_ROUNDS
+    pwd_context = _bcrypt_context(rounds)
+    bcrypt_rounds = rounds
+    return rounds
+
+# --- 1. Fungsi Password ---
 def get_password_hash(password: str):
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update(plain_password: str, hashed_password: str):
+    """
+    Return: (valid, hash baru atau None). Hash baru ada jika password benar
+    tetapi cost hash lama di bawah cost aktif (passlib needs_update).
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 # --- 2. Logika Fallback (BARU) ---
 def fallback_or_mysql(action_mysql, action_sqlite):
     """
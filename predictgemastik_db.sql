@@ -36,7 +36,8 @@ CREATE TABLE `daily` (
   `daily_steps` int DEFAULT NULL,
   `heart_rate` int DEFAULT NULL,
   `duration` float NOT NULL,
-  `prediction_result` int DEFAULT NULL
+  `prediction_result` int DEFAULT NULL,
+  `model_version` varchar(64) DEFAULT NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 --
@@ -56,7 +57,29 @@ INSERT INTO `daily` (`id`, `email`, `date`, `upper_pressure`, `lower_pressure`,
 CREATE TABLE `monthly_predictions` (
   `id` int NOT NULL,
   `email` varchar(255) NOT NULL,
-  `prediction_result` varchar(255) NOT NULL
+  `prediction_result` varchar(255) NOT NULL,
+  `prediction_date` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `period_start` date DEFAULT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `prediction_rollups`
+--
+
+CREATE TABLE `prediction_rollups` (
+  `email` varchar(255) NOT NULL,
+  `as_of` date NOT NULL,
+  `day_results` varchar(31) NOT NULL,
+  `week_insomnia` int NOT NULL DEFAULT '0',
+  `week_normal` int NOT NULL DEFAULT '0',
+  `week_apnea` int NOT NULL DEFAULT '0',
+  `week_days` int NOT NULL DEFAULT '0',
+  `month_insomnia` int NOT NULL DEFAULT '0',
+  `month_normal` int NOT NULL DEFAULT '0',
+  `month_apnea` int NOT NULL DEFAULT '0',
+  `month_days` int NOT NULL DEFAULT '0'
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 -- --------------------------------------------------------
@@ -69,6 +92,7 @@ CREATE TABLE `sleep_records` (
   `id` int NOT NULL,
   `email` varchar(255) NOT NULL,
   `sleep_time` datetime NOT NULL,
+  `sleep_date` date NOT NULL,
   `wake_time` datetime NOT NULL,
   `duration` float NOT NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -77,8 +101,8 @@ CREATE TABLE `sleep_records` (
 -- Dumping data for table `sleep_records`
 --
 
-INSERT INTO `sleep_records` (`id`, `email`, `sleep_time`, `wake_time`, `duration`) VALUES
-(1, 'kahfi032004.kb.kb@gmail.com', '2026-01-07 18:36:39', '2026-01-07 18:38:00', 0.0224907);
+INSERT INTO `sleep_records` (`id`, `email`, `sleep_time`, `sleep_date`, `wake_time`, `duration`) VALUES
+(1, 'kahfi032004.kb.kb@gmail.com', '2026-01-07 18:36:39', '2026-01-07', '2026-01-07 18:38:00', 0.0224907);
 
 -- --------------------------------------------------------
 
@@ -90,7 +114,8 @@ CREATE TABLE `weekly_predictions` (
   `id` int NOT NULL,
   `email` varchar(255) NOT NULL,
   `prediction_result` enum('Insomnia','Normal','Sleep Apnea') NOT NULL,
-  `prediction_date` timestamp NULL DEFAULT CURRENT_TIMESTAMP
+  `prediction_date` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `period_start` date DEFAULT NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 --
@@ -102,27 +127,39 @@ CREATE TABLE `weekly_predictions` (
 --
 ALTER TABLE `daily`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `email` (`email`);
+  ADD UNIQUE KEY `uq_daily_email_date` (`email`,`date`),
+  ADD KEY `email` (`email`),
+  ADD KEY `ix_daily_email_date_result` (`email`,`date`,`prediction_result`);
 
 --
 -- Indexes for table `monthly_predictions`
 --
 ALTER TABLE `monthly_predictions`
   ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `uq_monthly_predictions_email_period` (`email`,`period_start`),
   ADD KEY `email` (`email`);
 
+--
+-- Indexes for table `prediction_rollups`
+--
+ALTER TABLE `prediction_rollups`
+  ADD PRIMARY KEY (`email`);
+
 --
 -- Indexes for table `sleep_records`
 --
 ALTER TABLE `sleep_records`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `email` (`email`);
+  ADD UNIQUE KEY `uq_sleep_records_email_sleep_date` (`email`,`sleep_date`),
+  ADD KEY `email` (`email`),
+  ADD KEY `ix_sleep_records_email_sleep_time` (`email`,`sleep_time`);
 
 --
 -- Indexes for table `weekly_predictions`
 --
 ALTER TABLE `weekly_predictions`
   ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `uq_weekly_predictions_email_period` (`email`,`period_start`),
   ADD KEY `email` (`email`);
 
 --
@@ -0,0 +1,81 @@
+-- Migrasi skema untuk database `predictgemastik_db` yang sudah berjalan.
+-- predictgemastik_db.sql selalu berisi skema terbaru; jalankan blok di bawah
+-- secara berurutan pada database lama.
+
+-- --------------------------------------------------------
+-- Versi model yang menghasilkan prediksi harian
+-- --------------------------------------------------------
+ALTER TABLE `daily`
+  ADD COLUMN `model_version` varchar(64) DEFAULT NULL AFTER `prediction_result`;
+
+-- --------------------------------------------------------
+-- Covering index untuk agregasi prediksi mingguan/bulanan
+-- --------------------------------------------------------
+ALTER TABLE `daily`
+  ADD KEY `ix_daily_email_date_result` (`email`,`date`,`prediction_result`);
+
+-- --------------------------------------------------------
+-- Rollup prediksi mingguan/bulanan per user
+-- Setelah tabel dibuat, isi dari riwayat: python rollups.py rebuild
+-- --------------------------------------------------------
+CREATE TABLE `prediction_rollups` (
+  `email` varchar(255) NOT NULL,
+  `as_of` date NOT NULL,
+  `day_results` varchar(31) NOT NULL,
+  `week_insomnia` int NOT NULL DEFAULT '0',
+  `week_normal` int NOT NULL DEFAULT '0',
+  `week_apnea` int NOT NULL DEFAULT '0',
+  `week_days` int NOT NULL DEFAULT '0',
+  `month_insomnia` int NOT NULL DEFAULT '0',
+  `month_normal` int NOT NULL DEFAULT '0',
+  `month_apnea` int NOT NULL DEFAULT '0',
+  `month_days` int NOT NULL DEFAULT '0'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+ALTER TABLE `prediction_rollups`
+  ADD PRIMARY KEY (`email`);
+
+-- --------------------------------------------------------
+-- Satu baris per (email, date) di daily & per (email, sleep_date) di
+-- sleep_records, supaya penulisan bisa memakai INSERT ... ON DUPLICATE KEY UPDATE.
+-- Duplikat lama dihapus lebih dulu.
+-- --------------------------------------------------------
+DELETE d1 FROM `daily` d1
+  JOIN `daily` d2 ON d1.`email` = d2.`email` AND d1.`date` = d2.`date` AND d1.`id` < d2.`id`;
+
+ALTER TABLE `daily`
+  ADD UNIQUE KEY `uq_daily_email_date` (`email`,`date`);
+
+ALTER TABLE `sleep_records`
+  ADD COLUMN `sleep_date` date DEFAULT NULL AFTER `sleep_time`;
+
+UPDATE `sleep_records` SET `sleep_date` = DATE(`sleep_time`);
+
+-- Per hari, simpan record dengan sleep_time paling akhir (sama seperti yang ditampilkan)
+DELETE s1 FROM `sleep_records` s1
+  JOIN `sleep_records` s2 ON s1.`email` = s2.`email` AND s1.`sleep_date` = s2.`sleep_date`
+   AND (s1.`sleep_time` < s2.`sleep_time` OR (s1.`sleep_time` = s2.`sleep_time` AND s1.`id` < s2.`id`));
+
+ALTER TABLE `sleep_records`
+  MODIFY `sleep_date` date NOT NULL,
+  ADD UNIQUE KEY `uq_sleep_records_email_sleep_date` (`email`,`sleep_date`);
+
+-- --------------------------------------------------------
+-- Urutan riwayat tidur & keyset pagination /get-sleep-records
+-- --------------------------------------------------------
+ALTER TABLE `sleep_records`
+  ADD KEY `ix_sleep_records_email_sleep_time` (`email`,`sleep_time`);
+
+-- --------------------------------------------------------
+-- Materialisasi prediksi mingguan & bulanan oleh scheduler malam:
+-- satu baris per (email, awal periode), ditulis ulang dengan upsert.
+-- Baris lama (tanpa period_start) tetap ada; NULL tidak bentrok di UNIQUE.
+-- --------------------------------------------------------
+ALTER TABLE `weekly_predictions`
+  ADD COLUMN `period_start` date DEFAULT NULL AFTER `prediction_date`,
+  ADD UNIQUE KEY `uq_weekly_predictions_email_period` (`email`,`period_start`);
+
+ALTER TABLE `monthly_predictions`
+  ADD COLUMN `prediction_date` timestamp NULL DEFAULT CURRENT_TIMESTAMP AFTER `prediction_result`,
+  ADD COLUMN `period_start` date DEFAULT NULL AFTER `prediction_date`,
+  ADD UNIQUE KEY `uq_monthly_predictions_email_period` (`email`,`period_start`);
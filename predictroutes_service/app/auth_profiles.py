@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+
+import httpx
+
+import http_client
+import metrics
+import profile_cache
+
+logger = logging.getLogger(__name__)
+
+# Auth Service URL
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://authroutes_service:8000")
+
+# Batas request paralel ke Auth Service saat fallback per user
+PROFILE_FETCH_CONCURRENCY = int(os.getenv("PROFILE_FETCH_CONCURRENCY", "20"))
+# Email per request POST /user-profiles/batch
+PROFILE_BATCH_SIZE = int(os.getenv("PROFILE_BATCH_SIZE", "2000"))
+# Kolom work_data (work_id, quality_of_sleep, ...) dari /user-profiles/batch ikut jadi fitur model.
+# false: profil bulk sama dengan GET /user-profile/{email} (fitur tsb memakai default)
+# true : hasil prediksi jalur bulk (/predict/batch, rescore) berubah; jalur per user tetap GET
+PROFILE_WORK_FEATURES = os.getenv("PROFILE_WORK_FEATURES", "false").lower() in ("1", "true", "yes")
+WORK_FEATURE_FIELDS = ("work_id", "quality_of_sleep", "physical_activity_level", "stress_level")
+# Kolom users yang dipakai model (sama dengan PROFILE_USER_COLUMNS di Auth Service).
+# Hanya kolom ini yang disimpan di cache: tanpa hashed_password / reset_token.
+PROFILE_FEATURE_FIELDS = (
+    "age", "gender", "height", "weight", "upper_pressure", "lower_pressure", "daily_steps", "heart_rate",
+)
+
+# Shared HTTP client ke Auth Service (start() saat startup, aclose() saat shutdown).
+# Dipakai API (main.py) dan job batch (rescore.py).
+auth_client = http_client.ServiceClient("auth", AUTH_SERVICE_URL)
+
+
+async def _get_user_profiles(emails):
+    """
+    POST /user-profiles/batch per PROFILE_BATCH_SIZE email: hanya kolom fitur
+    model (users + work_data). Return: {email: profile}, user yang tidak ada tidak dimasukkan.
+    """
+    profiles = {}
+    for start in range(0, len(emails), PROFILE_BATCH_SIZE):
+        chunk = emails[start:start + PROFILE_BATCH_SIZE]
+        try:
+            resp = await auth_client.post("/user-profiles/batch", json={"emails": chunk})
+        except httpx.RequestError as e:
+            logger.error(f"Failed to connect to Auth Service: {e}")
+            raise profile_cache.ProfileUnavailable(str(e))
+
+        if resp.status_code != 200:
+            logger.error(f"Auth Service Error: {resp.status_code}")
+            raise profile_cache.ProfileUnavailable(f"Auth Service returned {resp.status_code}")
+        profiles.update(resp.json()["profiles"])
+    fields = PROFILE_FEATURE_FIELDS + WORK_FEATURE_FIELDS if PROFILE_WORK_FEATURES else PROFILE_FEATURE_FIELDS
+    return {email: _project(profile, fields) for email, profile in profiles.items()}
+
+
+def _project(profile, fields):
+    return {field: profile[field] for field in fields if field in profile}
+
+
+async def _get_user_profile(email: str):
+    try:
+        resp = await auth_client.get(f"/user-profile/{email}")
+    except httpx.RequestError as e:
+        logger.error(f"Failed to connect to Auth Service: {e}")
+        raise profile_cache.ProfileUnavailable(str(e))
+
+    if resp.status_code == 200:
+        # Body berisi seluruh baris users; disimpan dalam bentuk yang sama dengan jalur bulk
+        return _project(resp.json(), PROFILE_FEATURE_FIELDS)
+    elif resp.status_code == 404:
+        logger.warning(f"User {email} not found in Auth Service")
+        return None
+    else:
+        logger.error(f"Auth Service Error: {resp.status_code}")
+        raise profile_cache.ProfileUnavailable(f"Auth Service returned {resp.status_code}")
+
+# Cache profil user (TTL + stale-while-revalidate) di depan Auth Service
+user_profile_cache = profile_cache.ProfileCache(_get_user_profile)
+
+
+async def fetch_user_profile(email: str):
+    """
+    Mengambil data user lengkap dari Auth Service via HTTP Request (melalui cache).
+    """
+    return await user_profile_cache.get(email)
+
+
+async def fetch_user_profiles(emails):
+    """
+    Mengambil banyak profil sekaligus: yang belum ada di cache diambil dengan
+    POST /user-profiles/batch lalu disimpan ke cache. Jika request bulk gagal,
+    fallback per user (paralel, dibatasi PROFILE_FETCH_CONCURRENCY) lewat
+    cache, sehingga profil terakhir yang valid tetap bisa dipakai.
+    Return: dict {email: profile} (user yang tidak ditemukan tidak dimasukkan).
+    """
+    try:
+        results = (await user_profile_cache.get_many(emails, _get_user_profiles)).items()
+    except profile_cache.ProfileUnavailable as e:
+        metrics.inc("profile_batch_fallback_total")
+        logger.warning(f"Bulk profile fetch failed ({e}), falling back to per-user requests")
+        semaphore = asyncio.Semaphore(PROFILE_FETCH_CONCURRENCY)
+
+        async def fetch_one(email):
+            async with semaphore:
+                return email, await fetch_user_profile(email)
+
+        results = await asyncio.gather(*(fetch_one(email) for email in dict.fromkeys(emails)))
+
+    return {email: profile for email, profile in results if profile}
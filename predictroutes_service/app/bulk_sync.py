@@ -0,0 +1,43 @@
+import os
+
+from pydantic import ValidationError
+
+# Helper generik endpoint /sync_*/bulk: validasi per item, chunk query, response per item.
+
+# Batas baris per statement untuk endpoint bulk
+SYNC_BULK_CHUNK_SIZE = int(os.getenv("SYNC_BULK_CHUNK_SIZE", "500"))
+
+
+def chunks(rows, size=SYNC_BULK_CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def validate_items(items, schema):
+    """
+    Validasi item bulk satu per satu: item yang tidak valid tidak menggagalkan batch.
+    Return: (list (index, data) yang valid, dict index -> status item tidak valid)
+    """
+    valid, results = [], {}
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema(**item)))
+        except (ValidationError, TypeError) as e:
+            detail = [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()] \
+                if isinstance(e, ValidationError) else [str(e)]
+            results[index] = {"index": index, "status": "invalid", "detail": detail}
+    return valid, results
+
+
+def mark_ok(valid, results):
+    for index, data in valid:
+        results[index] = {"index": index, "email": data.email, "status": "ok"}
+
+
+def bulk_response(results, total):
+    ordered = [results[index] for index in range(total)]
+    return {
+        "synced": sum(1 for r in ordered if r["status"] == "ok"),
+        "failed": sum(1 for r in ordered if r["status"] != "ok"),
+        "results": ordered,
+    }
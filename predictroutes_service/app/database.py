@@ -1,7 +1,9 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects import mysql, sqlite
 from dotenv import load_dotenv
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -31,6 +33,72 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+# ---------------------------------------------------------
+# ASYNC ENGINE (untuk handler async, tidak memblokir event loop)
+# ---------------------------------------------------------
+# DATABASE_URL yang sama dipakai dengan driver async:
+#   mysql+pymysql://... -> mysql+aiomysql://...
+#   sqlite:///...       -> sqlite+aiosqlite:///...
+# Bisa dioverride lewat ASYNC_DATABASE_URL.
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url):
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=int(os.getenv("ASYNC_DB_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "30")),
+    pool_timeout=10,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    # connect_timeout hanya dikenal driver MySQL
+    connect_args={"connect_timeout": 3} if ASYNC_DATABASE_URL.startswith("mysql") else {},
+)
+
+# expire_on_commit=False: atribut ORM tetap bisa dibaca setelah commit
+# (lazy load tidak bisa dilakukan di AsyncSession)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+# ---------------------------------------------------------
+# UPSERT (satu statement, tanpa SELECT lebih dulu)
+# ---------------------------------------------------------
+def upsert(db, model, values, conflict_columns, update):
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE (MySQL) / ON CONFLICT DO UPDATE (SQLite).
+
+    values           : dict (satu baris) atau list of dict (multi-row)
+    conflict_columns : kolom unique key yang menentukan konflik
+    update           : list kolom yang ditimpa nilai baru, atau
+                       fn(new) -> dict kolom -> ekspresi (new = nilai yang akan di-insert)
+
+    Return statement; eksekusi lewat db.execute (sync) / await db.execute (async).
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(model).values(values)
+        new = stmt.inserted
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(model).values(values)
+        new = stmt.excluded
+    else:
+        raise NotImplementedError(f"Upsert is not supported for dialect '{dialect}'")
+
+    set_ = update(new) if callable(update) else {column: new[column] for column in update}
+    if dialect == "mysql":
+        return stmt.on_duplicate_key_update(set_)
+    return stmt.on_conflict_do_update(index_elements=conflict_columns, set_=set_)
+
 # Dependency untuk FastAPI
 def get_db():
     db = SessionLocal()
@@ -38,3 +106,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency async untuk FastAPI
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
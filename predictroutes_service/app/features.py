@@ -0,0 +1,299 @@
+import threading
+import time
+
+import numpy as np
+
+# Fungsi penyiapan fitur model XGBoost.
+# Dipisah dari main.py agar bisa dipakai juga oleh worker inferensi (process pool).
+#
+# prepare_features   : jalur asli per request (sklearn transform), dipakai sebagai referensi
+# FeaturePipeline    : jalur produksi, scaler & encoder dikompilasi sekali saat load model
+
+def calculate_bmi_category(height_cm, weight_kg):
+    """
+    Menghitung BMI dan mengembalikan kategori dalam bentuk INTEGER (0, 1, 2).
+    """
+    if not height_cm or not weight_kg:
+        return 0 # Default Normal
+    
+    height_m = height_cm / 100
+    bmi = weight_kg / (height_m ** 2)
+    
+    # Logic Kategori BMI Standard (Sesuaikan dengan data training)
+    # 0: Normal, 1: Obese, 2: Overweight
+    if bmi < 25:
+        return 0 
+    elif 25 <= bmi < 30:
+        return 2 
+    else:
+        return 1 
+
+def prepare_features(user_data, sleep_duration, scaler, gender_encoder=None):
+    """
+    Menyiapkan array input untuk model XGBoost.
+    """
+    # 1. Extract Semua Data Terlebih Dahulu (Agar Rapi)
+    age = user_data.get('age', 30)
+    raw_gender = user_data.get('gender', 0)
+    occupation = user_data.get('work_id', 0)
+    height = user_data.get('height', 170)
+    weight = user_data.get('weight', 65)
+    
+    # Metrics Kesehatan
+    quality_of_sleep = user_data.get('quality_of_sleep', 5)
+    physical_activity = user_data.get('physical_activity_level', 50)
+    stress_level = user_data.get('stress_level', 5)
+    heart_rate = user_data.get('heart_rate', 70)
+    daily_steps = user_data.get('daily_steps', 5000)
+    systolic = user_data.get('upper_pressure', 120)
+    diastolic = user_data.get('lower_pressure', 80)
+    
+    additional_feature = 0 
+
+    # 2. Proses Encoding Gender
+    # Jika gender berupa string (misal: "Male", "Female") dan encoder tersedia
+    if gender_encoder and isinstance(raw_gender, str):
+        try:
+            gender = gender_encoder.transform([raw_gender])[0]
+        except Exception:
+            gender = 0 
+    else:
+        try:
+            gender = int(raw_gender)
+        except:
+            gender = 0
+
+    # 3. Hitung BMI Category
+    bmi_cat = calculate_bmi_category(height, weight)
+
+    # 4. Scaling (Fitur Numerik)
+    # Urutan array ini HARUS SAMA dengan urutan saat training Scaler
+    raw_numerical = [
+        age,  # <-- Sekarang variabel age dipakai disini
+        sleep_duration, 
+        quality_of_sleep, 
+        physical_activity,
+        stress_level, 
+        heart_rate, 
+        daily_steps, 
+        systolic, 
+        diastolic, 
+        additional_feature
+    ]
+    
+    # Membuat array input untuk scaler
+    input_to_scaler = np.zeros((1, 12)) 
+    input_to_scaler[0, :10] = raw_numerical
+    
+    scaled = scaler.transform(input_to_scaler).flatten()
+
+    # 5. Final Input Vector
+    # Urutan array ini HARUS SAMA dengan urutan saat training Model XGBoost
+    features = np.array([
+        gender,         # 0
+        scaled[0],      # Age (Menggunakan hasil scaling dari variabel age)
+        occupation,     # 2
+        scaled[1],      # Duration
+        scaled[2],      # Quality
+        scaled[3],      # Physical Activity
+        scaled[4],      # Stress
+        bmi_cat,        # 7
+        scaled[5],      # Heart Rate
+        scaled[6],      # Steps
+        scaled[7],      # Systolic
+        scaled[8]       # Diastolic
+    ]).reshape(1, -1)
+    
+    return features
+
+
+# Kolom output (urutan model XGBoost) untuk hasil scaling kolom 0..8 input scaler.
+# Mengikuti urutan prepare_features: age, duration, quality, activity, stress,
+# heart rate, steps, systolic, diastolic.
+_SCALED_OUTPUT_COLUMNS = [1, 3, 4, 5, 6, 8, 9, 10, 11]
+
+
+class FeaturePipeline:
+    """
+    Versi "compiled" dari prepare_features.
+
+    MinMaxScaler dijadikan transformasi affine (x * scale + offset), gender
+    encoder dijadikan dict lookup, dan kategori BMI dihitung vektor. Hasil
+    ditulis langsung ke buffer float32 (N, 12) sesuai urutan kolom model,
+    tanpa validasi sklearn per request.
+    """
+
+    N_FEATURES = 12
+
+    def __init__(self, scaler, gender_encoder=None):
+        n_scaled = len(_SCALED_OUTPUT_COLUMNS)
+        self.scale = np.asarray(scaler.scale_[:n_scaled], dtype=np.float64)
+        self.offset = np.asarray(scaler.min_[:n_scaled], dtype=np.float64)
+        self.clip = getattr(scaler, "clip", False)
+        self.feature_range = scaler.feature_range
+
+        # None = tidak ada encoder -> gender string dikonversi dengan int() seperti jalur lama
+        self.gender_lookup = None
+        if gender_encoder is not None:
+            self.gender_lookup = {label: int(i) for i, label in enumerate(gender_encoder.classes_)}
+
+        self._local = threading.local()
+
+    def _gender(self, raw_gender):
+        if self.gender_lookup is not None and isinstance(raw_gender, str):
+            return self.gender_lookup.get(raw_gender, 0)
+        try:
+            return int(raw_gender)
+        except:
+            return 0
+
+    def _buffer(self, n):
+        # Buffer per thread, dipakai ulang antar panggilan (hanya tumbuh jika perlu)
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape[0] < n:
+            buffer = self._local.buffer = np.empty((max(n, 64), self.N_FEATURES), dtype=np.float32)
+        return buffer[:n]
+
+    def transform(self, user_rows, sleep_durations, out=None):
+        """
+        Return: (features float32 (N, 12), valid_mask).
+
+        Tanpa `out`, hasil ditulis ke buffer milik thread ini dan hanya valid
+        sampai panggilan transform berikutnya di thread yang sama.
+        Baris dengan data profil kosong (None) atau bukan angka ditandai False di valid_mask.
+        """
+        n = len(user_rows)
+        features = self._buffer(n) if out is None else out[:n]
+
+        rows = [
+            (
+                u.get('age', 30),
+                duration,
+                u.get('quality_of_sleep', 5),
+                u.get('physical_activity_level', 50),
+                u.get('stress_level', 5),
+                u.get('heart_rate', 70),
+                u.get('daily_steps', 5000),
+                u.get('upper_pressure', 120),
+                u.get('lower_pressure', 80),
+                u.get('work_id', 0),
+                u.get('height', 170) or 0,
+                u.get('weight', 65) or 0,
+            )
+            for u, duration in zip(user_rows, sleep_durations)
+        ]
+        try:
+            raw = np.array(rows, dtype=np.float64).reshape(n, 12)
+            parsed = np.ones(n, dtype=bool)
+        except (TypeError, ValueError):
+            # Ada nilai yang bukan angka: hanya baris tersebut yang invalid, bukan seluruh batch
+            raw, parsed = self._convert_rows(rows)
+
+        valid_mask = ~np.isnan(raw[:, :10]).any(axis=1) & parsed
+
+        scaled = raw[:, :9] * self.scale + self.offset
+        if self.clip:
+            np.clip(scaled, self.feature_range[0], self.feature_range[1], out=scaled)
+        features[:, _SCALED_OUTPUT_COLUMNS] = scaled
+
+        features[:, 0] = [self._gender(u.get('gender', 0)) for u in user_rows]
+        features[:, 2] = raw[:, 9]
+
+        # BMI Category (0: Normal, 1: Obese, 2: Overweight)
+        height, weight = raw[:, 10], raw[:, 11]
+        has_bmi = (height != 0) & (weight != 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bmi = weight / (height / 100) ** 2
+        features[:, 7] = np.where(~has_bmi | (bmi < 25), 0, np.where(bmi < 30, 2, 1))
+
+        return features, valid_mask
+
+    def _convert_rows(self, rows):
+        """Konversi per nilai: None -> NaN, nilai yang tidak bisa di-float -> NaN + baris ditandai gagal."""
+        raw = np.empty((len(rows), self.N_FEATURES), dtype=np.float64)
+        parsed = np.ones(len(rows), dtype=bool)
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                if value is None:
+                    raw[i, j] = np.nan
+                    continue
+                try:
+                    raw[i, j] = float(value)
+                except (TypeError, ValueError):
+                    raw[i, j] = np.nan
+                    parsed[i] = False
+        return raw, parsed
+
+
+# ==========================================
+# CLI: parity check + microbenchmark
+# ==========================================
+# python features.py
+
+def _random_profiles(n, seed=0):
+    rng = np.random.default_rng(seed)
+    genders = [0, 1, "Male", "Female", "Unknown", None, "1"]
+    rows = []
+    for i in range(n):
+        row = {
+            'age': int(rng.integers(18, 70)),
+            'gender': genders[i % len(genders)],
+            'work_id': int(rng.integers(0, 11)),
+            'height': float(rng.uniform(140, 200)),
+            'weight': float(rng.uniform(40, 130)),
+            'quality_of_sleep': float(rng.uniform(1, 10)),
+            'physical_activity_level': float(rng.uniform(0, 100)),
+            'stress_level': float(rng.uniform(1, 10)),
+            'heart_rate': int(rng.integers(50, 110)),
+            'daily_steps': int(rng.integers(0, 15000)),
+            'upper_pressure': int(rng.integers(90, 160)),
+            'lower_pressure': int(rng.integers(60, 100)),
+        }
+        # Sebagian profil tidak lengkap / memakai default
+        if i % 11 == 0:
+            row.pop('quality_of_sleep')
+        if i % 13 == 0:
+            row['height'] = None
+        rows.append(row)
+    return rows, rng.uniform(0, 10, n).tolist()
+
+
+def main():
+    import os
+    import joblib
+
+    ml_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml_model')
+    scaler = joblib.load(os.path.join(ml_dir, 'minmax_scaler_split.pkl'))
+    gender_encoder = joblib.load(os.path.join(ml_dir, 'Gender_label_encoder.pkl'))
+    pipeline = FeaturePipeline(scaler, gender_encoder)
+
+    rows, durations = _random_profiles(2000)
+    expected = np.vstack([prepare_features(u, d, scaler, gender_encoder) for u, d in zip(rows, durations)])
+    actual, valid_mask = pipeline.transform(rows, durations, out=np.empty((len(rows), 12), dtype=np.float32))
+    match = np.allclose(expected.astype(np.float32), actual) and valid_mask.all()
+    print(f"parity: {'OK' if match else 'MISMATCH'} ({len(rows)} rows, max abs diff "
+          f"{np.abs(expected.astype(np.float32) - actual).max():.2e})")
+
+    def bench(fn, repeat):
+        fn()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - started) / repeat * 1e6
+
+    one_row, one_duration = rows[:1], durations[:1]
+    old = bench(lambda: prepare_features(one_row[0], one_duration[0], scaler, gender_encoder), 2000)
+    new = bench(lambda: pipeline.transform(one_row, one_duration), 2000)
+    print(f"1 row  : prepare_features {old:7.1f} us | FeaturePipeline {new:7.1f} us")
+
+    batch, batch_durations = rows[:64], durations[:64]
+    old = bench(lambda: [prepare_features(u, d, scaler, gender_encoder) for u, d in zip(batch, batch_durations)], 100)
+    new = bench(lambda: pipeline.transform(batch, batch_durations), 2000)
+    print(f"64 rows: prepare_features {old:7.1f} us | FeaturePipeline {new:7.1f} us")
+
+    return 0 if match else 1
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import logging
+import os
+
+import httpx
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- HTTP CLIENT SETTINGS ---
+# Satu client per service tujuan, jadi HTTP_MAX_CONNECTIONS = batas koneksi per host.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+class ServiceClient:
+    """
+    httpx.AsyncClient long-lived untuk satu service internal.
+    Dibuat saat startup dan ditutup saat shutdown, sehingga koneksi TCP
+    dipakai ulang (keep-alive) antar request.
+    """
+
+    def __init__(self, name, base_url):
+        self.name = name
+        self.base_url = base_url
+        self._client = None
+
+        metrics.register_gauge(f"http_{name}_connection_reuse_ratio", self.reuse_ratio)
+
+    async def start(self):
+        if self._client is not None:
+            return
+
+        http2 = HTTP2_ENABLED
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP2_ENABLED is set but package 'h2' is not installed. Using HTTP/1.1.")
+                http2 = False
+
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        )
+        logger.info(f"HTTP client '{self.name}' started ({self.base_url}, http2={http2})")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method, url, **kwargs):
+        if self._client is None:
+            # Dipakai di luar lifecycle app (misal script CLI)
+            await self.start()
+
+        extensions = kwargs.pop("extensions", None) or {}
+        extensions["trace"] = self._trace
+        metrics.inc(f"http_{self.name}_requests_total")
+        return await self._client.request(method, url, extensions=extensions, **kwargs)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def _trace(self, event_name, info):
+        # Hanya koneksi baru yang melewati TCP connect; request lain memakai ulang koneksi
+        if event_name == "connection.connect_tcp.complete":
+            metrics.inc(f"http_{self.name}_connections_opened_total")
+
+    def reuse_ratio(self):
+        requests = metrics.counter_value(f"http_{self.name}_requests_total")
+        opened = metrics.counter_value(f"http_{self.name}_connections_opened_total")
+        if not requests:
+            return None
+        return round(max(0.0, 1 - opened / requests), 4)
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+import metrics
+import model_registry
+
+logger = logging.getLogger(__name__)
+
+# --- ML MODEL PATHS ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ML_DIR = os.path.join(BASE_DIR, 'ml_model')
+
+# Versi model yang aktif saat startup (lihat model_registry.py)
+DEFAULT_MODEL_VERSION = os.getenv("MODEL_VERSION", "xgb_model_Test")
+
+# --- INFERENCE EXECUTOR SETTINGS ---
+# "thread"  : inferensi di thread pool (model dipakai bersama, hemat memori)
+# "process" : inferensi di process pool (model di-load sekali per worker, bebas GIL)
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread").lower()
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+
+# --- MICRO-BATCHING SETTINGS ---
+# Request /predict yang datang bersamaan dikumpulkan maksimal selama
+# PREDICT_BATCH_WINDOW_MS atau sampai PREDICT_BATCH_MAX_SIZE baris,
+# lalu diprediksi dengan satu kali model.predict.
+BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "2"))
+BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "64"))
+
+# Registry model (per proses; worker process pool punya registry sendiri)
+registry = model_registry.ModelRegistry(ML_DIR)
+
+_executor = None
+
+
+def load_models(version=DEFAULT_MODEL_VERSION):
+    try:
+        registry.activate(version)
+    except Exception as e:
+        logger.critical(f"CRITICAL: Model bundle '{version}' failed to load ({e}). Prediction will not work.")
+
+
+def models_ready():
+    bundle = registry.active
+    return bundle is not None and bundle.ready()
+
+
+def score_rows(version, user_rows, sleep_durations):
+    """
+    Feature preparation + scaling + predict untuk N baris sekaligus.
+    Dijalankan di executor (thread/process), bukan di event loop.
+
+    Return: (predictions, valid_mask). Baris tidak valid bernilai -1.
+    """
+    bundle = registry.get(version)
+    features, valid_mask = bundle.pipeline.transform(user_rows, sleep_durations)
+
+    predictions = np.full(len(user_rows), -1, dtype=int)
+    if valid_mask.any():
+        predictions[valid_mask] = bundle.predict(features[valid_mask])
+    return predictions, valid_mask
+
+
+def _init_worker(version):
+    # Dipanggil sekali di setiap worker process pool
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    load_models(version)
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def create_executor(version, kind=INFERENCE_EXECUTOR, workers=INFERENCE_WORKERS):
+    """Executor untuk score_rows: process pool (worker me-load `version`) atau thread pool."""
+    if kind == "process":
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(version,),
+        )
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+
+
+def start_executor():
+    global _executor
+    version = registry.active.version if registry.active else DEFAULT_MODEL_VERSION
+    _executor = create_executor(version)
+    logger.info(f"Inference executor started ({INFERENCE_EXECUTOR}, workers={INFERENCE_WORKERS})")
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# ==========================================
+# HOT-SWAP MODEL VERSION
+# ==========================================
+# Bundle baru selalu di-load di background (thread / pool baru) lebih dulu,
+# baru kemudian referensi aktif ditukar. Request tidak pernah menunggu reload.
+
+async def preload_version(version):
+    await asyncio.to_thread(registry.load, version)
+    return registry.get(version)
+
+
+async def _warm_process_pool(version):
+    # Pool baru yang worker-nya sudah me-load versi ini lewat initializer
+    executor = create_executor(version)
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(executor, _worker_ready) for _ in range(INFERENCE_WORKERS)))
+    return executor
+
+
+def _swap_executor(new_executor):
+    global _executor
+    old_executor, _executor = _executor, new_executor
+    if old_executor is not None:
+        # Batch yang sedang berjalan di pool lama tetap diselesaikan
+        old_executor.shutdown(wait=False)
+
+
+async def activate_version(version):
+    await preload_version(version)
+    new_executor = await _warm_process_pool(version) if INFERENCE_EXECUTOR == "process" else None
+
+    # Tanpa await di antara dua baris ini: bundle & executor tertukar bersamaan
+    bundle = registry.activate(version)
+    if new_executor is not None:
+        _swap_executor(new_executor)
+    return bundle
+
+
+async def rollback_version():
+    version = registry.previous_version()
+    if version is None:
+        raise model_registry.ModelNotFound("No previous model version to roll back to")
+    new_executor = await _warm_process_pool(version) if INFERENCE_EXECUTOR == "process" else None
+
+    bundle = registry.rollback()
+    if new_executor is not None:
+        _swap_executor(new_executor)
+    return bundle
+
+
+async def run_inference(user_rows, sleep_durations):
+    """
+    Menjalankan score_rows di executor tanpa memblokir event loop.
+    Return: (predictions, valid_mask, model_version).
+    """
+    # Versi & executor diambil sekali: satu batch selalu memakai satu versi model
+    bundle, executor = registry.active, _executor
+    if bundle is None:
+        raise RuntimeError("ML Model not loaded properly.")
+
+    started = time.perf_counter()
+    if executor is None:
+        predictions, valid_mask = score_rows(bundle.version, user_rows, sleep_durations)
+    else:
+        loop = asyncio.get_running_loop()
+        predictions, valid_mask = await loop.run_in_executor(
+            executor, score_rows, bundle.version, user_rows, sleep_durations
+        )
+    metrics.observe("inference_latency_ms", (time.perf_counter() - started) * 1000)
+    return predictions, valid_mask, bundle.version
+
+
+class MicroBatcher:
+    """
+    Antrian inferensi in-process. Handler cukup `await batcher.submit(user_data, duration)`,
+    worker di background menumpuk request yang datang bersamaan menjadi satu matriks,
+    menjalankan satu kali score_fn, lalu membagikan hasilnya ke masing-masing request.
+    """
+
+    def __init__(self, score_fn, window_ms=BATCH_WINDOW_MS, max_batch_size=BATCH_MAX_SIZE):
+        self.score_fn = score_fn
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue = None
+        self._worker = None
+        self._inflight = set()
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"Micro-batcher started (window={self.window * 1000:.1f} ms, max_batch={self.max_batch_size})"
+        )
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        # Request yang masih mengantri tidak boleh menggantung
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference batcher stopped"))
+
+    async def submit(self, user_data, sleep_duration):
+        """
+        Return: (hasil prediksi (int), versi model).
+        ValueError jika data profil tidak lengkap.
+        """
+        if self._worker is None:
+            # Batcher belum/tidak berjalan -> prediksi langsung
+            predictions, valid_mask, version = await self.score_fn([user_data], [sleep_duration])
+            return self._unpack(predictions[0], valid_mask[0]), version
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((user_data, sleep_duration), future, time.perf_counter()))
+        return await future
+
+    @staticmethod
+    def _unpack(prediction, valid):
+        if not valid:
+            raise ValueError("Incomplete user profile data")
+        return int(prediction)
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.perf_counter() + self.window
+
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Batch dijalankan sebagai task terpisah agar batch berikutnya
+            # bisa dikumpulkan selama executor masih bekerja
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch):
+        started = time.perf_counter()
+        metrics.observe("predict_batch_size", len(batch))
+        for _, _, enqueued in batch:
+            metrics.observe("predict_queue_wait_ms", (started - enqueued) * 1000)
+
+        user_rows = [item[0] for item, _, _ in batch]
+        sleep_durations = [item[1] for item, _, _ in batch]
+        try:
+            predictions, valid_mask, version = await self.score_fn(user_rows, sleep_durations)
+        except Exception as e:
+            logger.error(f"Batched inference failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        metrics.inc("predict_batches_total")
+        metrics.inc("predict_rows_total", len(batch))
+        for (_, future, _), prediction, valid in zip(batch, predictions, valid_mask):
+            # Future bisa sudah dibatalkan kalau client memutus koneksi
+            if future.done():
+                continue
+            try:
+                future.set_result((self._unpack(prediction, valid), version))
+            except ValueError as e:
+                future.set_exception(e)
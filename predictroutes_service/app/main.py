@@ -1,22 +1,43 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import json
 import logging
 import os
-import joblib
-import numpy as np
+import anyio
 import httpx
+from collections import namedtuple
 from datetime import datetime, timedelta, date
+from typing import Optional
 
 # Framework & Database
-from fastapi import FastAPI, Depends, HTTPException, APIRouter
+from fastapi import FastAPI, Depends, HTTPException, APIRouter, Query, Header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, select, insert
 from dotenv import load_dotenv
 
 # Internal Modules
 import models
 import schemas
 import database
-from database import get_db
+import auth_profiles
+import bulk_sync
+import inference
+import metrics
+import model_registry
+import prediction_stats
+import profile_cache
+import response_cache
+import rollups
+import scheduler
+import sleep_analytics
+import timeline_cache
+from database import get_db, get_async_db
 
 # --- CONFIGURATION & SETUP ---
 
@@ -33,24 +54,24 @@ logging.basicConfig(
 # Logging
 logger = logging.getLogger(__name__)
 
-# --- ML MODEL PATHS ---
-ML_DIR = os.path.join(BASE_DIR, 'ml_model')
+# Shared secret untuk endpoint admin & internal (header X-Admin-Token).
+# Tidak diisi -> endpoint tsb menolak semua request.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
-MODEL_PATH = os.path.join(ML_DIR, 'xgb_model_Test.pkl')
-SCALER_PATH = os.path.join(ML_DIR, 'minmax_scaler_split.pkl')
-OCCUPATION_ENCODER_PATH = os.path.join(ML_DIR, 'Occupation_label_encoder.pkl')
-BMI_CATEGORY_ENCODER_PATH = os.path.join(ML_DIR, 'BMI Category_label_encoder.pkl')
-GENDER_ENCODER_PATH = os.path.join(ML_DIR, 'Gender_label_encoder.pkl') # NEW
+# Shared HTTP client & cache profil ke Auth Service (lihat auth_profiles.py)
+auth_client = auth_profiles.auth_client
+user_profile_cache = auth_profiles.user_profile_cache
+fetch_user_profile = auth_profiles.fetch_user_profile
+fetch_user_profiles = auth_profiles.fetch_user_profiles
 
-# Auth Service URL
-AUTH_SERVICE_URL = "http://authroutes_service:8000"
+# Micro-batching untuk /predict (inferensi berjalan di executor, bukan di event loop)
+batcher = inference.MicroBatcher(inference.run_inference)
 
-# Global Variables for Models
-model = None
-scaler = None
-occupation_encoder = None
-bmi_encoder = None
-gender_encoder = None # NEW
+# Cache response GET di Redis (versi per user, dinaikkan oleh endpoint tulis)
+api_response_cache = response_cache.ResponseCache()
+
+# Materialisasi weekly/monthly predictions tiap malam (SCHEDULER_ENABLED, lihat scheduler.py)
+nightly_scheduler = scheduler.NightlyScheduler(scheduler.materialize)
 
 app = FastAPI()
 
@@ -67,158 +88,116 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
-    global model, scaler, occupation_encoder, bmi_encoder, gender_encoder
     logger.info(f"Server starting up from {BASE_DIR}...")
-    
-    # Helper function to check and load
-    def load_pickle(path, name):
-        if os.path.exists(path):
-            try:
-                obj = joblib.load(path)
-                logger.info(f"{name} loaded successfully.")
-                return obj
-            except Exception as e:
-                logger.error(f"Failed to load {name}: {e}")
-                return None
-        else:
-            logger.error(f"{name} file not found at {path}")
-            return None
 
-    # Load All Models
-    model = load_pickle(MODEL_PATH, "XGBoost Model")
-    scaler = load_pickle(SCALER_PATH, "Scaler")
-    occupation_encoder = load_pickle(OCCUPATION_ENCODER_PATH, "Occupation Encoder")
-    bmi_encoder = load_pickle(BMI_CATEGORY_ENCODER_PATH, "BMI Encoder")
-    gender_encoder = load_pickle(GENDER_ENCODER_PATH, "Gender Encoder") # NEW
+    # Load All Models (+ executor inferensi & micro-batcher)
+    inference.load_models()
+    inference.start_executor()
+    batcher.start()
 
-    if not model or not scaler:
-        logger.critical("CRITICAL: Model or Scaler failed to load. Prediction will not work.")
+    await auth_client.start()
+    await api_response_cache.start()
+
+    if scheduler.SCHEDULER_ENABLED:
+        nightly_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await nightly_scheduler.stop()
+    await batcher.stop()
+    inference.shutdown_executor()
+    await auth_client.aclose()
+    await api_response_cache.aclose()
+    await database.async_engine.dispose()
 
 # --- HELPER FUNCTIONS ---
 
-async def fetch_user_profile(email: str):
+async def _load_sleep_timeline(email, limit):
+    # Session sendiri: load dibagi (coalesced) antar request
+    async with database.AsyncSessionLocal() as db:
+        return await sleep_analytics.load_timeline(db, email, limit=limit)
+
+# Riwayat tidur per user sebagai array NumPy (LRU berdasarkan byte), ditambal oleh save-sleep-record
+sleep_timeline_cache = timeline_cache.TimelineCache(_load_sleep_timeline)
+
+async def fetch_sleep_timeline(db, email, **bounds):
     """
-    Mengambil data user lengkap dari Auth Service via HTTP Request.
+    Timeline tidur user (opsional dipotong `bounds`, lihat SleepTimeline.window)
+    dari cache; riwayat yang terlalu besar untuk di-cache dibaca dari database.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(f"{AUTH_SERVICE_URL}/user-profile/{email}", timeout=10.0)
-            if resp.status_code == 200:
-                return resp.json()
-            elif resp.status_code == 404:
-                logger.warning(f"User {email} not found in Auth Service")
-                return None
-            else:
-                logger.error(f"Auth Service Error: {resp.status_code}")
-                return None
-        except httpx.RequestError as e:
-            logger.error(f"Failed to connect to Auth Service: {e}")
-            return None
-
-def calculate_bmi_category(height_cm, weight_kg):
+    timeline = await sleep_timeline_cache.get(email)
+    if timeline is None:
+        return await sleep_analytics.load_timeline(db, email, **bounds)
+    return timeline.window(**bounds) if bounds else timeline
+
+async def cached_json(email, endpoint, params, build, version=None):
     """
-    Menghitung BMI dan mengembalikan kategori dalam bentuk INTEGER (0, 1, 2).
+    Response JSON dari Redis; saat miss (atau Redis tidak tersedia) `build()`
+    dijalankan dan hasilnya disimpan untuk versi data user saat ini.
     """
-    if not height_cm or not weight_kg:
-        return 0 # Default Normal
-    
-    height_m = height_cm / 100
-    bmi = weight_kg / (height_m ** 2)
-    
-    # Logic Kategori BMI Standard (Sesuaikan dengan data training)
-    # 0: Normal, 1: Obese, 2: Overweight
-    if bmi < 25:
-        return 0 
-    elif 25 <= bmi < 30:
-        return 2 
-    else:
-        return 1 
-
-def prepare_features(user_data, sleep_duration, scaler):
+    key = await api_response_cache.key(email, endpoint, params, version)
+    if key is not None:
+        body = await api_response_cache.get(key)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+
+    response = JSONResponse(await build())
+    if key is not None:
+        await api_response_cache.set(key, response.body)
+    return response
+
+async def sleep_data_etag(db, email, endpoint, params, version=None):
     """
-    Menyiapkan array input untuk model XGBoost.
+    ETag dari jumlah & max(id) record tidur user + versi tulis (Redis, atau
+    counter in-process saat Redis mati). Tanpa membaca record / agregasi.
     """
-    # 1. Extract Semua Data Terlebih Dahulu (Agar Rapi)
-    age = user_data.get('age', 30)
-    raw_gender = user_data.get('gender', 0)
-    occupation = user_data.get('work_id', 0)
-    height = user_data.get('height', 170)
-    weight = user_data.get('weight', 65)
-    
-    # Metrics Kesehatan
-    quality_of_sleep = user_data.get('quality_of_sleep', 5)
-    physical_activity = user_data.get('physical_activity_level', 50)
-    stress_level = user_data.get('stress_level', 5)
-    heart_rate = user_data.get('heart_rate', 70)
-    daily_steps = user_data.get('daily_steps', 5000)
-    systolic = user_data.get('upper_pressure', 120)
-    diastolic = user_data.get('lower_pressure', 80)
-    
-    additional_feature = 0 
-
-    # 2. Proses Encoding Gender
-    # Jika gender berupa string (misal: "Male", "Female") dan encoder tersedia
-    if gender_encoder and isinstance(raw_gender, str):
-        try:
-            gender = gender_encoder.transform([raw_gender])[0]
-        except Exception:
-            gender = 0 
+    timeline = sleep_timeline_cache.peek(email)
+    if timeline is not None:
+        count, max_id = len(timeline), int(timeline.ids.max()) if len(timeline) else None
     else:
-        try:
-            gender = int(raw_gender)
-        except:
-            gender = 0
-
-    # 3. Hitung BMI Category
-    bmi_cat = calculate_bmi_category(height, weight)
-
-    # 4. Scaling (Fitur Numerik)
-    # Urutan array ini HARUS SAMA dengan urutan saat training Scaler
-    raw_numerical = [
-        age,  # <-- Sekarang variabel age dipakai disini
-        sleep_duration, 
-        quality_of_sleep, 
-        physical_activity,
-        stress_level, 
-        heart_rate, 
-        daily_steps, 
-        systolic, 
-        diastolic, 
-        additional_feature
-    ]
-    
-    # Membuat array input untuk scaler
-    input_to_scaler = np.zeros((1, 12)) 
-    input_to_scaler[0, :10] = raw_numerical
-    
-    scaled = scaler.transform(input_to_scaler).flatten()
-
-    # 5. Final Input Vector
-    # Urutan array ini HARUS SAMA dengan urutan saat training Model XGBoost
-    features = np.array([
-        gender,         # 0
-        scaled[0],      # Age (Menggunakan hasil scaling dari variabel age)
-        occupation,     # 2
-        scaled[1],      # Duration
-        scaled[2],      # Quality
-        scaled[3],      # Physical Activity
-        scaled[4],      # Stress
-        bmi_cat,        # 7
-        scaled[5],      # Heart Rate
-        scaled[6],      # Steps
-        scaled[7],      # Systolic
-        scaled[8]       # Diastolic
-    ]).reshape(1, -1)
-    
-    return features
+        count, max_id = (await db.execute(
+            select(func.count(models.SleepRecord.id), func.max(models.SleepRecord.id))
+            .where(models.SleepRecord.email == email)
+        )).one()
+    version = version or api_response_cache.local_version(email)
+    raw = f"{endpoint}|{response_cache.params_digest(params)}|{count}|{max_id}|{version}"
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in tags or f"W/{etag}" in tags
+
+async def conditional_json(db, email, endpoint, params, build, if_none_match):
+    """cached_json + ETag: If-None-Match yang cocok dijawab 304 sebelum agregasi."""
+    version = await api_response_cache.version(email)
+    etag = await sleep_data_etag(db, email, endpoint, params, version)
+    if _etag_matches(if_none_match, etag):
+        metrics.inc("etag_not_modified_total")
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response = await cached_json(email, endpoint, params, build, version)
+    response.headers["ETag"] = etag
+    return response
+
+def bump_data_version(*emails):
+    """Untuk handler sync (thread pool): naikkan versi cache response user."""
+    anyio.from_thread.run(api_response_cache.bump, *emails)
 
 # ==========================================
 # 1. PREDICTION ENDPOINTS (DAILY)
 # ==========================================
 
+# Kolom Daily yang ditimpa saat prediksi ulang di hari yang sama
+DAILY_SNAPSHOT_COLUMNS = [
+    "upper_pressure", "lower_pressure", "daily_steps", "heart_rate",
+    "duration", "prediction_result", "model_version",
+]
+
 @app.post("/predict")
-async def predict(request: schemas.PredictRequest, db: Session = Depends(get_db)):
-    if model is None or scaler is None:
+async def predict(request: schemas.PredictRequest, db: AsyncSession = Depends(get_async_db)):
+    if not inference.models_ready():
         raise HTTPException(status_code=503, detail="ML Model not loaded properly.")
 
     email = request.email
@@ -228,70 +207,147 @@ async def predict(request: schemas.PredictRequest, db: Session = Depends(get_db)
     if not user_data:
         raise HTTPException(status_code=404, detail="User profile not found via Auth Service.")
 
-    # B. Fetch Data Tidur Terakhir dari DB Lokal
-    sleep_record = db.query(models.SleepRecord)\
-        .filter(models.SleepRecord.email == email)\
-        .order_by(models.SleepRecord.sleep_time.desc())\
-        .first()
-
-    if not sleep_record:
+    # B. Fetch Data Tidur Terakhir (timeline cache jika user sudah di-cache, selain itu DB Lokal)
+    timeline = sleep_timeline_cache.peek(email)
+    if timeline is not None:
+        sleep_duration = float(timeline.duration[0]) if len(timeline) else None
+    else:
+        sleep_duration = (await db.execute(
+            select(models.SleepRecord.duration)
+            .where(models.SleepRecord.email == email)
+            .order_by(models.SleepRecord.sleep_time.desc())
+            .limit(1)
+        )).scalar()
+
+    if sleep_duration is None:
         logger.warning(f"No sleep record found for {email}, using default duration.")
         sleep_duration = 0.0
-    else:
-        sleep_duration = sleep_record.duration
 
     try:
-        # C. Prepare Features & Predict
-        features = prepare_features(user_data, sleep_duration, scaler)
-        
-        prediction = model.predict(features)[0]
-        prediction_int = int(prediction)
+        # C. Prepare Features & Predict (di executor inferensi, lewat micro-batcher)
+        prediction_int, model_version = await batcher.submit(user_data, sleep_duration)
         
         # Mapping Result
-        mapping = {0: 'Insomnia', 1: 'Normal', 2: 'Sleep Apnea'}
-        result_str = mapping.get(prediction_int, 'Unknown')
+        result_str = prediction_mapping.get(prediction_int, 'Unknown')
 
-        # D. Save Result
+        # D. Save Result (upsert pada unique key (email, date))
         today = date.today()
-        daily_record = db.query(models.Daily).filter(
-            models.Daily.email == email,
-            models.Daily.date == today
-        ).first()
 
         # Data snapshot untuk disimpan di history
-        systolic = user_data.get('upper_pressure', 0)
-        diastolic = user_data.get('lower_pressure', 0)
-        daily_steps = user_data.get('daily_steps', 0)
-        heart_rate = user_data.get('heart_rate', 0)
-
-        if daily_record:
-            daily_record.prediction_result = prediction_int
-            daily_record.duration = sleep_duration
-            daily_record.upper_pressure = systolic
-            daily_record.lower_pressure = diastolic
-            daily_record.daily_steps = daily_steps
-            daily_record.heart_rate = heart_rate
-        else:
-            new_daily_record = models.Daily(
-                email=email,
-                date=today,
-                upper_pressure=systolic,
-                lower_pressure=diastolic,
-                daily_steps=daily_steps,
-                heart_rate=heart_rate,
-                duration=sleep_duration,
-                prediction_result=prediction_int
-            )
-            db.add(new_daily_record)
-        
-        db.commit()
-        return {"prediction": result_str}
+        snapshot = {
+            "upper_pressure": user_data.get('upper_pressure', 0),
+            "lower_pressure": user_data.get('lower_pressure', 0),
+            "daily_steps": user_data.get('daily_steps', 0),
+            "heart_rate": user_data.get('heart_rate', 0),
+            "duration": sleep_duration,
+            "prediction_result": prediction_int,
+            "model_version": model_version,
+        }
+        await db.execute(database.upsert(
+            db, models.Daily, {"email": email, "date": today, **snapshot},
+            conflict_columns=["email", "date"], update=DAILY_SNAPSHOT_COLUMNS
+        ))
+
+        await db.run_sync(rollups.record_result, email, today, prediction_int)
+        await db.commit()
+        await api_response_cache.bump(email)
+        return {"prediction": result_str, "model_version": model_version}
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Prediction failed: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+@app.post("/predict/batch")
+async def predict_batch(request: schemas.PredictBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Prediksi banyak user sekaligus: profil & tidur terakhir diambil bulk,
+    satu matriks fitur (N, 12), satu scaler.transform, satu model.predict,
+    dan semua baris Daily disimpan dalam satu transaksi.
+    """
+    if not inference.models_ready():
+        raise HTTPException(status_code=503, detail="ML Model not loaded properly.")
+
+    emails = list(dict.fromkeys(request.emails))  # Hapus duplikat, urutan tetap
+    if not emails:
+        return {"results": []}
+
+    # A. Fetch Profil dari Auth Service (bulk)
+    profiles = await fetch_user_profiles(emails)
+
+    # B. Fetch Data Tidur Terakhir per user (satu query)
+    latest = select(
+        models.SleepRecord.email,
+        func.max(models.SleepRecord.sleep_time).label("latest_sleep_time")
+    ).where(models.SleepRecord.email.in_(emails))\
+        .group_by(models.SleepRecord.email)\
+        .subquery()
+
+    durations = dict((await db.execute(
+        select(models.SleepRecord.email, models.SleepRecord.duration)
+        .join(latest, and_(
+            models.SleepRecord.email == latest.c.email,
+            models.SleepRecord.sleep_time == latest.c.latest_sleep_time
+        ))
+    )).all())
+
+    found = [email for email in emails if email in profiles]
+    results = {email: {"email": email, "status": "not_found"} for email in emails if email not in profiles}
+
+    try:
+        if found:
+            # C. Prepare Features & Predict (satu kali untuk semua user)
+            user_rows = [profiles[email] for email in found]
+            sleep_durations = [durations.get(email, 0.0) for email in found]
+            predictions, valid_mask, model_version = await inference.run_inference(user_rows, sleep_durations)
+
+            # D. Save Result (satu upsert multi-row, satu transaksi)
+            today = date.today()
+            rows = []
+            saved = {}  # email -> prediction_result yang ditulis (untuk rollup)
+            for i, email in enumerate(found):
+                if not valid_mask[i]:
+                    results[email] = {"email": email, "status": "incomplete_profile"}
+                    continue
+
+                user_data = user_rows[i]
+                prediction_int = int(predictions[i])
+                snapshot = {
+                    "upper_pressure": user_data.get('upper_pressure', 0),
+                    "lower_pressure": user_data.get('lower_pressure', 0),
+                    "daily_steps": user_data.get('daily_steps', 0),
+                    "heart_rate": user_data.get('heart_rate', 0),
+                    "duration": sleep_durations[i],
+                    "prediction_result": prediction_int,
+                    "model_version": model_version,
+                }
+
+                rows.append({"email": email, "date": today, **snapshot})
+
+                results[email] = {
+                    "email": email,
+                    "status": "ok",
+                    "prediction": prediction_mapping.get(prediction_int, 'Unknown'),
+                    "model_version": model_version
+                }
+                saved[email] = prediction_int
+
+            if rows:
+                await db.execute(database.upsert(
+                    db, models.Daily, rows,
+                    conflict_columns=["email", "date"], update=DAILY_SNAPSHOT_COLUMNS
+                ))
+            await db.run_sync(rollups.record_results, today, saved)
+            await db.commit()
+            await api_response_cache.bump(*saved)
+
+        return {"results": [results[email] for email in emails]}
+
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Batch prediction failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
 # ==========================================
 # 2. WEEKLY & MONTHLY PREDICTION
 # ==========================================
@@ -299,35 +355,15 @@ async def predict(request: schemas.PredictRequest, db: Session = Depends(get_db)
 @app.post("/weekly_predict")
 def weekly_predict(request: schemas.WeeklyPredictRequest, db: Session = Depends(get_db)):
     try:
-        email = request.email
-        today = date.today()
-        seven_days_ago = today - timedelta(days=7)
-
-        weekly_data = db.query(models.Daily).filter(
-            models.Daily.email == email,
-            models.Daily.date >= seven_days_ago,
-            models.Daily.date <= today
-        ).all()
-
-        if not weekly_data:
+        # Counts dibaca dari rollup (satu lookup primary key, lihat rollups.py)
+        counts, _, total, _ = rollups.read_period(db, request.email)
+        if not total:
             raise HTTPException(status_code=404, detail="Tidak ada data harian minggu ini.")
 
-        counts = {0: 0, 1: 0, 2: 0} # 0: Insomnia, 1: Normal, 2: Apnea
-        for r in weekly_data:
-            if r.prediction_result in counts:
-                counts[r.prediction_result] += 1
-
-        if counts[1] > (counts[0] + counts[2]):
-            result = 'Normal'
-        elif counts[2] > counts[0]:
-            result = 'Sleep Apnea'
-        elif counts[0] > counts[2]:
-            result = 'Insomnia'
-        else:
-            result = 'Sleep Apnea'
-
-        return {"weekly_prediction": result}
+        return {"weekly_prediction": prediction_stats.weekly_verdict(counts)}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Weekly Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -336,36 +372,73 @@ def weekly_predict(request: schemas.WeeklyPredictRequest, db: Session = Depends(
 @app.post("/monthly_predict")
 def monthly_predict(request: schemas.MonthlyPredictRequest, db: Session = Depends(get_db)):
     try:
-        email = request.email
-        today = date.today()
-        thirty_days_ago = today - timedelta(days=30)
+        _, counts, _, total = rollups.read_period(db, request.email)
+        if not total:
+            raise HTTPException(status_code=404, detail="Tidak ada data bulan ini.")
 
-        monthly_data = db.query(models.Daily).filter(
-            models.Daily.email == email,
-            models.Daily.date >= thirty_days_ago
-        ).all()
+        return {"monthly_prediction": prediction_stats.monthly_verdict(counts)}
 
-        if not monthly_data:
-            raise HTTPException(status_code=404, detail="Tidak ada data bulan ini.")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Monthly Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        counts = {0: 0, 1: 0, 2: 0}
-        for r in monthly_data:
-            if r.prediction_result in counts:
-                counts[r.prediction_result] += 1
 
-        if counts[1] > (counts[0] + counts[2]):
-            result = 'Normal'
-        elif counts[2] > counts[0]:
-            result = 'Sleep Apnea'
-        else:
-            result = 'Insomnia'
+@app.post("/period_predict")
+def period_predict(request: schemas.PeriodPredictRequest, db: Session = Depends(get_db)):
+    """Verdict mingguan (7 hari) & bulanan (30 hari) dari satu baris rollup."""
+    try:
+        weekly, monthly, weekly_total, monthly_total = rollups.read_period(db, request.email)
+        if not monthly_total:
+            raise HTTPException(status_code=404, detail="Tidak ada data bulan ini.")
 
-        return {"monthly_prediction": result}
+        return {
+            "weekly_prediction": prediction_stats.weekly_verdict(weekly) if weekly_total else None,
+            "monthly_prediction": prediction_stats.monthly_verdict(monthly),
+            "weekly_counts": {prediction_mapping[c]: n for c, n in weekly.items()},
+            "monthly_counts": {prediction_mapping[c]: n for c, n in monthly.items()},
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Monthly Error: {e}")
+        logger.error(f"Period Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- Hasil materialisasi scheduler (weekly_predictions / monthly_predictions) ---
+
+MATERIALIZED_PREDICTIONS_LIMIT = 12
+
+
+def _materialized_predictions(db, model, email, limit):
+    rows = db.execute(
+        select(model.period_start, model.prediction_result, model.prediction_date)
+        .where(model.email == email, model.period_start.isnot(None))
+        .order_by(model.period_start.desc())
+        .limit(limit)
+    ).all()
+    return [
+        {
+            "period_start": row.period_start.isoformat(),
+            "prediction": row.prediction_result,
+            "computed_at": row.prediction_date.isoformat() if row.prediction_date else None,
+        }
+        for row in rows
+    ]
+
+@app.get("/weekly_predictions/{email}")
+def get_weekly_predictions(email: str, limit: int = Query(MATERIALIZED_PREDICTIONS_LIMIT, ge=1, le=104),
+                           db: Session = Depends(get_db)):
+    """Verdict per minggu kalender (Senin), terbaru lebih dulu. Ditulis scheduler tiap malam."""
+    return _materialized_predictions(db, models.WeeklyPrediction, email, limit)
+
+@app.get("/monthly_predictions/{email}")
+def get_monthly_predictions(email: str, limit: int = Query(MATERIALIZED_PREDICTIONS_LIMIT, ge=1, le=60),
+                            db: Session = Depends(get_db)):
+    """Verdict per bulan kalender, terbaru lebih dulu. Ditulis scheduler tiap malam."""
+    return _materialized_predictions(db, models.MonthlyPrediction, email, limit)
+
 # ==========================================
 # 3. SAVE PREDICTION & SLEEP RECORD
 # ==========================================
@@ -376,22 +449,13 @@ prediction_mapping = {0: "Insomnia", 1: "Normal", 2: "Sleep Apnea"}
 def save_prediction_manual(request: schemas.SavePredictionRequest, db: Session = Depends(get_db)):
     try:
         today = date.today()
-        daily_record = db.query(models.Daily).filter(
-            models.Daily.email == request.email,
-            models.Daily.date == today
-        ).first()
+        db.execute(database.upsert(
+            db, models.Daily,
+            {"email": request.email, "date": today, "prediction_result": request.prediction_result, "duration": 0.0},
+            conflict_columns=["email", "date"], update=["prediction_result"]
+        ))
 
-        if daily_record:
-            daily_record.prediction_result = request.prediction_result
-        else:
-            new_record = models.Daily(
-                email=request.email,
-                date=today,
-                prediction_result=request.prediction_result,
-                duration=0.0
-            )
-            db.add(new_record)
-        
+        rollups.record_result(db, request.email, today, request.prediction_result)
         db.commit()
         return {"message": "Prediction saved manually"}
     except Exception as e:
@@ -455,7 +519,7 @@ def save_prediction_month(request: schemas.SavePredictionRequestMonth, db: Sessi
 
 
 @app.post("/save-sleep-record/")
-async def save_sleep_record(sleep_data: schemas.SleepData, db: Session = Depends(get_db)):
+async def save_sleep_record(sleep_data: schemas.SleepData, db: AsyncSession = Depends(get_async_db)):
     sleep_time = sleep_data.sleep_time
     wake_time = sleep_data.wake_time
     
@@ -464,255 +528,334 @@ async def save_sleep_record(sleep_data: schemas.SleepData, db: Session = Depends
     
     duration = (wake_time - sleep_time).total_seconds() / 3600
 
-    existing = db.query(models.SleepRecord).filter(
-        models.SleepRecord.email == sleep_data.email,
-        extract('year', models.SleepRecord.sleep_time) == sleep_time.year,
-        extract('month', models.SleepRecord.sleep_time) == sleep_time.month,
-        extract('day', models.SleepRecord.sleep_time) == sleep_time.day
-    ).first()
-
-    if existing:
-        existing.sleep_time = sleep_time
-        existing.wake_time = wake_time
-        existing.duration = duration
-        db.commit()
+    # Satu record per (email, tanggal tidur): upsert pada unique key
+    result = await db.execute(database.upsert(
+        db, models.SleepRecord,
+        {
+            "email": sleep_data.email,
+            "sleep_date": sleep_time.date(),
+            "sleep_time": sleep_time,
+            "wake_time": wake_time,
+            "duration": duration,
+        },
+        conflict_columns=["email", "sleep_date"], update=["sleep_time", "wake_time", "duration"]
+    ))
+    # Id record dibutuhkan untuk menambal timeline cache (hanya jika user sedang di-cache)
+    record_id = None
+    if sleep_data.email in sleep_timeline_cache:
+        record_id = (await db.execute(
+            select(models.SleepRecord.id).where(
+                models.SleepRecord.email == sleep_data.email,
+                models.SleepRecord.sleep_date == sleep_time.date()
+            )
+        )).scalar()
+    await db.commit()
+
+    sleep_timeline_cache.patch(sleep_data.email, record_id, sleep_time, wake_time, duration)
+    await api_response_cache.bump(sleep_data.email)
+
+    # MySQL: affected rows = 2 jika baris lama di-update
+    if result.rowcount == 2:
         return {"message": "Record updated"}
-    else:
-        new_record = models.SleepRecord(
-            email=sleep_data.email,
-            sleep_time=sleep_time,
-            wake_time=wake_time,
-            duration=duration
-        )
-        db.add(new_record)
-        db.commit()
-        return {"message": "Record saved"}
+    return {"message": "Record saved"}
 
-@app.get("/get-sleep-records/{email}")
-async def get_sleep_records(email: str, db: Session = Depends(get_db)):
-    records = db.query(models.SleepRecord).filter(models.SleepRecord.email == email)\
-        .order_by(models.SleepRecord.sleep_time.desc()).all()
-    
-    response_data = []
-    seen_dates = set()
-    for r in records:
-        r_date = r.sleep_time.date()
-        if r_date not in seen_dates:
-            dur = r.wake_time - r.sleep_time
-            response_data.append({
-                "date": r.sleep_time.strftime('%d %B %Y'),
-                "duration": f"{dur.seconds // 3600} jam {dur.seconds % 3600 // 60} menit",
-                "time": f"{r.sleep_time.strftime('%H:%M')} - {r.wake_time.strftime('%H:%M')}"
-            })
-            seen_dates.add(r_date)
-    return response_data
+# --- SLEEP RECORDS: keyset pagination & streaming ---
 
-@app.get("/get-weekly-sleep-data/{email}")
-async def get_weekly_sleep_data(email: str, start_date: str, end_date: str, db: Session = Depends(database.get_db)):
-    # Convert string dates to datetime objects
-    start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
-    end_date_obj = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=2)
+SLEEP_RECORDS_PAGE_SIZE = int(os.getenv("SLEEP_RECORDS_PAGE_SIZE", "50"))
+SLEEP_RECORDS_MAX_PAGE_SIZE = 500
 
-    # Retrieve sleep records for the user between the start and end date
-    sleep_records = db.query(models.SleepRecord).filter(
-        models.SleepRecord.email == email,
-        models.SleepRecord.sleep_time >= start_date_obj,
-        models.SleepRecord.wake_time <= end_date_obj
-    ).order_by(models.SleepRecord.sleep_time.desc()).all()
 
+def _format_sleep_record(sleep_time, wake_time):
+    dur = wake_time - sleep_time
+    return {
+        "date": sleep_time.strftime('%d %B %Y'),
+        "duration": f"{dur.seconds // 3600} jam {dur.seconds % 3600 // 60} menit",
+        "time": f"{sleep_time.strftime('%H:%M')} - {wake_time.strftime('%H:%M')}"
+    }
 
-    if not sleep_records:
-        raise HTTPException(status_code=404, detail="No sleep records found for the week")
 
-    # Filter to keep only the latest record per day
-    latest_records_per_day = {}
-    for record in sleep_records:
-        record_date = record.sleep_time.date()
-        # Only keep the latest record for each date
-        if record_date not in latest_records_per_day:
-            latest_records_per_day[record_date] = record
+def _encode_cursor(row):
+    raw = f"{row.sleep_time.isoformat()}|{row.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-    # Initialize dictionaries to store sleep durations, start times, and wake times for each day
-    daily_sleep_durations = {i: timedelta() for i in range(7)}  # {0: Monday, ..., 6: Sunday}
-    daily_sleep_start_times = {i: [] for i in range(7)}  # Store sleep start times for each day
-    daily_wake_times = {i: [] for i in range(7)}  # Store wake times for each day
 
-    for record in latest_records_per_day.values():
-        # Handle cross-midnight sleep records
-        if record.wake_time < record.sleep_time:
-            record.wake_time += timedelta(days=1)
+def _decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        sleep_time, record_id = raw.split("|")
+        return datetime.fromisoformat(sleep_time), int(record_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-        duration = record.wake_time - record.sleep_time
 
-        # Calculate the day of the week for the sleep time (0=Monday, 6=Sunday)
-        day_of_week = record.sleep_time.weekday()
-        daily_sleep_durations[day_of_week] += duration
+def _sleep_records_query(email, after=None, limit=None):
+    """
+    Record tidur terbaru lebih dulu, keyset pada (sleep_time, id).
+    Satu record per hari dijamin unique key (email, sleep_date).
+    """
+    query = select(
+        models.SleepRecord.id, models.SleepRecord.sleep_time, models.SleepRecord.wake_time
+    ).where(models.SleepRecord.email == email)
+    if after is not None:
+        sleep_time, record_id = after
+        query = query.where(or_(
+            models.SleepRecord.sleep_time < sleep_time,
+            and_(models.SleepRecord.sleep_time == sleep_time, models.SleepRecord.id < record_id)
+        ))
+    query = query.order_by(models.SleepRecord.sleep_time.desc(), models.SleepRecord.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+# Baris record dari timeline cache, bentuk sama dengan hasil _sleep_records_query
+SleepRecordRow = namedtuple("SleepRecordRow", ["id", "sleep_time", "wake_time"])
+
+
+def _timeline_rows(timeline, after=None, limit=None):
+    if after is not None:
+        timeline = timeline.after(*after)
+    n = len(timeline) if limit is None else min(limit, len(timeline))
+    return [
+        SleepRecordRow(*row) for row in zip(
+            timeline.ids[:n].tolist(), timeline.sleep[:n].tolist(), timeline.wake[:n].tolist()
+        )
+    ]
 
-        # Store the sleep start time for the day
-        daily_sleep_start_times[day_of_week].append(record.sleep_time.strftime("%H:%M"))
-        
-        # Store the wake time for the day
-        daily_wake_times[day_of_week].append(record.wake_time.strftime("%H:%M"))
 
-    # Convert timedelta to hours for each day
-    daily_sleep_durations_hours = [round(daily_sleep_durations[i].total_seconds() / 3600, 2) for i in range(7)]
+async def _iter_rows(rows):
+    for row in rows:
+        yield row
+
 
-    # Calculate total duration as the sum of daily sleep durations
-    total_duration = sum(daily_sleep_durations_hours)
+async def _ndjson_sleep_records(rows, limit):
+    # `rows` berisi limit + 1 baris: baris tambahan hanya penanda halaman berikutnya
+    sent, last = 0, None
+    async for row in rows:
+        if limit and sent == limit:
+            yield json.dumps({"next_cursor": _encode_cursor(last)}) + "\n"
+            return
+        yield json.dumps(_format_sleep_record(row.sleep_time, row.wake_time)) + "\n"
+        sent, last = sent + 1, row
+    yield json.dumps({"next_cursor": None}) + "\n"
 
-    # Calculate averages
-    avg_duration = total_duration / len(latest_records_per_day)
-    avg_sleep_time = (sum((timedelta(hours=int(time[:2]), minutes=int(time[3:])) 
-                          for times in daily_sleep_start_times.values() for time in times), timedelta()) 
-                      / len(latest_records_per_day))
-    avg_wake_time = (sum((timedelta(hours=int(time[:2]), minutes=int(time[3:])) 
-                         for times in daily_wake_times.values() for time in times), timedelta()) 
-                     / len(latest_records_per_day))
 
+async def _stream_sleep_records(email, after, limit):
+    # Session sendiri: dependency get_async_db sudah ditutup saat body di-stream
+    async with database.AsyncSessionLocal() as db:
+        result = await db.stream(_sleep_records_query(email, after, limit + 1 if limit else None))
+        try:
+            async for line in _ndjson_sleep_records(result, limit):
+                yield line
+        finally:
+            await result.close()
+
+
+async def _sleep_records_page(db, email, after, limit):
+    timeline = await sleep_timeline_cache.get(email)
+    paged = limit is not None or after is not None
+    if paged:
+        limit = limit or SLEEP_RECORDS_PAGE_SIZE
+    fetch = limit + 1 if paged else None
+    if timeline is None:
+        rows = (await db.execute(_sleep_records_query(email, after, fetch))).all()
+    else:
+        rows = _timeline_rows(timeline, after, fetch)
+
+    if not paged:
+        return [_format_sleep_record(r.sleep_time, r.wake_time) for r in rows]
     return {
-        "daily_sleep_durations": daily_sleep_durations_hours,
-        "daily_sleep_start_times": daily_sleep_start_times,  # Field with sleep start times
-        "daily_wake_times": daily_wake_times,  # New field with wake times
-        "avg_duration": f"{int(avg_duration)} jam {int((avg_duration * 60) % 60)} menit",
-        "avg_sleep_time": (datetime.min + avg_sleep_time).strftime("%H:%M"),
-        "avg_wake_time": (datetime.min + avg_wake_time).strftime("%H:%M"),
-        "total_duration": f"{int(total_duration)} jam {int((total_duration * 60) % 60)} menit"
+        "records": [_format_sleep_record(r.sleep_time, r.wake_time) for r in rows[:limit]],
+        "next_cursor": _encode_cursor(rows[limit - 1]) if len(rows) > limit else None,
     }
 
+
+@app.get("/get-sleep-records/{email}")
+async def get_sleep_records(
+    email: str,
+    limit: Optional[int] = Query(None, ge=1, le=SLEEP_RECORDS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Tanpa parameter: list seluruh riwayat (format lama).
+    limit / cursor : {"records": [...], "next_cursor": ...}
+    stream=true    : NDJSON, satu record per baris, baris terakhir {"next_cursor": ...}
+    Dibaca dari timeline cache; riwayat yang terlalu besar untuk di-cache dari database.
+    Response non-stream di-cache di Redis.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+
+    if stream:
+        timeline = await sleep_timeline_cache.get(email)
+        if timeline is None:
+            body = _stream_sleep_records(email, after, limit)
+        else:
+            rows = _timeline_rows(timeline, after, limit + 1 if limit else None)
+            body = _ndjson_sleep_records(_iter_rows(rows), limit)
+        return StreamingResponse(body, media_type="application/x-ndjson")
+
+    return await cached_json(
+        email, "sleep-records", {"limit": limit, "cursor": cursor},
+        lambda: _sleep_records_page(db, email, after, limit)
+    )
+
+@app.get("/get-weekly-sleep-data/{email}")
+async def get_weekly_sleep_data(
+    email: str, start_date: str, end_date: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Convert string dates to datetime objects
+    start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
+    end_date_obj = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=2)
+
+    async def build():
+        # Timeline cache (array NumPy) -> agregasi di sleep_analytics.py
+        timeline = await fetch_sleep_timeline(db, email, sleep_from=start_date_obj, wake_until=end_date_obj)
+        if not len(timeline):
+            raise HTTPException(status_code=404, detail="No sleep records found for the week")
+        return sleep_analytics.weekly_summary(timeline)
+
+    params = {"start_date": start_date, "end_date": end_date}
+    return await conditional_json(db, email, "weekly-sleep-data", params, build, if_none_match)
+
 @app.get("/get-monthly-sleep-data/{email}")
-async def get_monthly_sleep_data(email: str, month: str, year: int, db: Session = Depends(database.get_db)):
+async def get_monthly_sleep_data(
+    email: str, month: str, year: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     # Calculate the start and end dates for the month
     start_date_obj = datetime(year, int(month), 1)
     next_month = start_date_obj.replace(day=28) + timedelta(days=4)  # This will always jump to the next month
     end_date_obj = next_month - timedelta(days=next_month.day)
 
-    # Retrieve sleep records for the user between the start and end dates
-    sleep_records = db.query(models.SleepRecord).filter(
-        models.SleepRecord.email == email,
-        models.SleepRecord.sleep_time >= start_date_obj,
-        models.SleepRecord.wake_time < end_date_obj + timedelta(days=1)  # Include the entire end day
-    ).order_by(models.SleepRecord.sleep_time.desc()).all()  # Sort by sleep_time descending
-
-    if not sleep_records:
-        raise HTTPException(status_code=404, detail="No sleep records found for the month")
-
-    # Filter to keep only the latest record per day
-    latest_records_per_day = {}
-    for record in sleep_records:
-        record_date = record.sleep_time.date()
-        if record_date not in latest_records_per_day:
-            latest_records_per_day[record_date] = record
-
-    # Initialize dictionaries to store weekly and daily sleep durations, start times, and wake times
-    weekly_sleep_durations = {i: timedelta() for i in range(4)}
-    weekly_sleep_start_times = {i: [] for i in range(4)}
-    weekly_wake_times = {i: [] for i in range(4)}
-
-    # Initialize daily sleep duration list
-    days_in_month = (end_date_obj - start_date_obj).days + 1
-    daily_sleep_durations = [0.0] * days_in_month  # Initialize daily sleep durations with 0
-
-    for record in latest_records_per_day.values():
-        # Handle cross-midnight sleep records
-        if record.wake_time < record.sleep_time:
-            record.wake_time += timedelta(days=1)
-
-        duration = record.wake_time - record.sleep_time
-
-        # Calculate the day of the month for the sleep time
-        day_of_month = (record.sleep_time - start_date_obj).days
-        daily_sleep_durations[day_of_month] = round(duration.total_seconds() / 3600, 2)  # Convert to hours
-
-        # Calculate the week of the month for the sleep time
-        week_of_month = day_of_month // 7
-        if week_of_month > 3:
-            week_of_month = 3
-
-        weekly_sleep_durations[week_of_month] += duration
-        weekly_sleep_start_times[week_of_month].append(record.sleep_time.strftime("%H:%M"))
-        weekly_wake_times[week_of_month].append(record.wake_time.strftime("%H:%M"))
-
-    weekly_sleep_durations_hours = [round(weekly_sleep_durations[i].total_seconds() / 3600, 2) for i in range(4)]
-    total_duration = sum(weekly_sleep_durations_hours)
-
-    avg_duration = total_duration / len(latest_records_per_day)
-
-    # Adjust sleep times for proper average calculation
-    sleep_times_in_minutes = []
-    for times in weekly_sleep_start_times.values():
-        for time in times:
-            hours, minutes = map(int, time.split(':'))
-            if hours < 12:
-                hours += 24  # Adjust early morning times past midnight to make calculations accurate
-            sleep_times_in_minutes.append(hours * 60 + minutes)
-
-    avg_sleep_minutes = sum(sleep_times_in_minutes) / len(sleep_times_in_minutes)
-    avg_sleep_hours = int(avg_sleep_minutes // 60)
-    avg_sleep_minutes = int(avg_sleep_minutes % 60)
-
-    wake_times_in_minutes = []
-    for times in weekly_wake_times.values():
-        for time in times:
-            hours, minutes = map(int, time.split(':'))
-            wake_times_in_minutes.append(hours * 60 + minutes)
-
-    avg_wake_minutes = sum(wake_times_in_minutes) / len(wake_times_in_minutes)
-    avg_wake_hours = int(avg_wake_minutes // 60)
-    avg_wake_minutes = int(avg_wake_minutes % 60)
+    async def build():
+        timeline = await fetch_sleep_timeline(
+            db, email, sleep_from=start_date_obj, wake_before=end_date_obj + timedelta(days=1)  # Include the entire end day
+        )
+        if not len(timeline):
+            raise HTTPException(status_code=404, detail="No sleep records found for the month")
+
+        days_in_month = (end_date_obj - start_date_obj).days + 1
+        return sleep_analytics.monthly_summary(timeline, start_date_obj.date(), days_in_month)
+
+    params = {"month": int(month), "year": year}
+    return await conditional_json(db, email, "monthly-sleep-data", params, build, if_none_match)
+
+@app.get("/sleep-analytics/{email}")
+async def get_sleep_analytics(
+    email: str,
+    granularity: str = "month",
+    year: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Ringkasan tidur per bucket (day / week / month / year).
+    Rentang: `year` (1 Jan - 31 Des) atau start_date & end_date (YYYY-MM-DD, inklusif).
+    """
+    if granularity not in ("day", "week", "month", "year"):
+        raise HTTPException(status_code=400, detail="granularity must be day, week, month or year")
+    try:
+        if year is not None:
+            start, end = date(year, 1, 1), date(year, 12, 31)
+        elif start_date and end_date:
+            start = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        else:
+            raise HTTPException(status_code=400, detail="Provide year or start_date and end_date")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date")
+    if end < start:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+
+    async def build():
+        timeline = await fetch_sleep_timeline(
+            db, email,
+            sleep_from=datetime.combine(start, datetime.min.time()),
+            sleep_before=datetime.combine(end + timedelta(days=1), datetime.min.time())
+        )
+        if not len(timeline):
+            raise HTTPException(status_code=404, detail="No sleep records found for the period")
+        return sleep_analytics.period_summary(timeline, start, end, granularity)
 
-    return {
-        "weekly_sleep_durations": weekly_sleep_durations_hours,
-        "weekly_sleep_start_times": weekly_sleep_start_times,
-        "weekly_wake_times": weekly_wake_times,
-        "daily_sleep_durations": daily_sleep_durations,  # Send daily data to the frontend
-        "avg_duration": f"{int(avg_duration)} jam {int((avg_duration * 60) % 60)} menit",
-        "avg_sleep_time": f"{avg_sleep_hours:02d}:{avg_sleep_minutes:02d}",
-        "avg_wake_time": f"{avg_wake_hours:02d}:{avg_wake_minutes:02d}",
-        "total_duration": f"{int(total_duration)} jam {int((total_duration * 60) % 60)} menit"
-    }
+    params = {"granularity": granularity, "start": start.isoformat(), "end": end.isoformat()}
+    return await cached_json(email, "sleep-analytics", params, build)
 
 # ==========================================
 # 4. SYNC ENDPOINTS (DATA TRANSFER)
 # ==========================================
 
+SYNC_DAILY_PARTIAL_COLUMNS = ("daily_steps", "duration", "upper_pressure", "lower_pressure", "heart_rate")
+
+
+def _parse_sync_date(date_str):
+    date_str = str(date_str)
+    if "T" in date_str:
+        return datetime.strptime(date_str.split("T")[0], "%Y-%m-%d").date()
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").date()
+    except ValueError:
+        return date.today()
+
+
+def _parse_created_at(created_at):
+    try:
+        return datetime.fromisoformat(str(created_at).replace("Z", ""))
+    except ValueError:
+        return datetime.now()
+
+
+def _sync_daily_values(data):
+    return {
+        "email": data.email,
+        "date": _parse_sync_date(data.date),
+        "upper_pressure": data.upper_pressure,
+        "lower_pressure": data.lower_pressure,
+        "daily_steps": data.daily_steps,
+        "heart_rate": data.heart_rate,
+        "duration": data.duration,
+        "prediction_result": data.prediction_result,
+    }
+
+
+def _sync_daily_update(new):
+    # Baris yang sudah ada hanya ditimpa oleh nilai yang diisi (bukan 0 / null)
+    return {
+        "prediction_result": func.coalesce(new.prediction_result, models.Daily.prediction_result),
+        **{
+            column: func.coalesce(func.nullif(new[column], 0), getattr(models.Daily, column))
+            for column in SYNC_DAILY_PARTIAL_COLUMNS
+        },
+    }
+
+
 @app.post("/sync_daily")
 def sync_daily(data: schemas.SyncDailyRequest, db: Session = Depends(get_db)):
     try:
-        date_str = str(data.date)
-        if "T" in date_str:
-            record_date = datetime.strptime(date_str.split("T")[0], "%Y-%m-%d").date()
-        else:
-            try:
-                record_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-            except ValueError:
-                record_date = date.today()
-
-        daily_record = db.query(models.Daily).filter(
-            models.Daily.email == data.email,
-            models.Daily.date == record_date
-        ).first()
-
-        if daily_record:
-            if data.prediction_result is not None: daily_record.prediction_result = data.prediction_result
-            if data.daily_steps: daily_record.daily_steps = data.daily_steps
-            if data.duration: daily_record.duration = data.duration
-            if data.upper_pressure: daily_record.upper_pressure = data.upper_pressure
-            if data.lower_pressure: daily_record.lower_pressure = data.lower_pressure
-            if data.heart_rate: daily_record.heart_rate = data.heart_rate
-        else:
-            new_daily = models.Daily(
-                email=data.email,
-                date=record_date,
-                upper_pressure=data.upper_pressure,
-                lower_pressure=data.lower_pressure,
-                daily_steps=data.daily_steps,
-                heart_rate=data.heart_rate,
-                duration=data.duration,
-                prediction_result=data.prediction_result
-            )
-            db.add(new_daily)
-
+        values = _sync_daily_values(data)
+        record_date = values["date"]
+        db.execute(database.upsert(
+            db, models.Daily, values,
+            conflict_columns=["email", "date"], update=_sync_daily_update
+        ))
+
+        prediction_result = data.prediction_result
+        if prediction_result is None:
+            # Tidak ada prediksi baru: rollup mengikuti nilai yang tersimpan
+            prediction_result = db.execute(
+                select(models.Daily.prediction_result).where(
+                    models.Daily.email == data.email,
+                    models.Daily.date == record_date
+                )
+            ).scalar()
+        rollups.record_result(db, data.email, record_date, prediction_result)
         db.commit()
+        bump_data_version(data.email)
         return {"message": "Daily data synced"}
     except Exception as e:
         db.rollback()
@@ -757,4 +900,146 @@ def sync_monthly(data: schemas.SyncPredictionRequest, db: Session = Depends(get_
         return {"message": "Monthly prediction synced"}
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- BULK SYNC (replay antrian offline dalam satu request) ---
+
+@app.post("/sync_daily/bulk")
+def sync_daily_bulk(request: schemas.SyncBulkRequest, db: Session = Depends(get_db)):
+    """Semua item valid ditulis dengan upsert multi-row dalam satu transaksi."""
+    valid, results = bulk_sync.validate_items(request.items, schemas.SyncDailyRequest)
+    if valid:
+        rows = [_sync_daily_values(data) for _, data in valid]
+        try:
+            for chunk in bulk_sync.chunks(rows):
+                db.execute(database.upsert(
+                    db, models.Daily, chunk,
+                    conflict_columns=["email", "date"], update=_sync_daily_update
+                ))
+
+            # Rollup mengikuti prediction_result yang tersimpan setelah upsert
+            touched = {(row["email"], row["date"]) for row in rows}
+            stored = {}
+            for chunk in bulk_sync.chunks(sorted(touched)):
+                for email, day, result in db.execute(
+                    select(models.Daily.email, models.Daily.date, models.Daily.prediction_result).where(
+                        models.Daily.email.in_({email for email, _ in chunk}),
+                        models.Daily.date.in_({day for _, day in chunk})
+                    )
+                ):
+                    if (email, day) in touched:
+                        stored.setdefault(day, {})[email] = result
+            for day, day_results in stored.items():
+                rollups.record_results(db, day, day_results)
+
+            db.commit()
+            bump_data_version(*{row["email"] for row in rows})
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Bulk Sync Daily Error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+        bulk_sync.mark_ok(valid, results)
+    return bulk_sync.bulk_response(results, len(request.items))
+
+
+def _sync_predictions_bulk(request):
+    valid, results = bulk_sync.validate_items(request.items, schemas.SyncPredictionRequest)
+    rows = []
+    for index, data in valid:
+        label = prediction_mapping.get(data.prediction_result)
+        if label is None:
+            results[index] = {"index": index, "email": data.email, "status": "invalid",
+                              "detail": [f"prediction_result: unknown class {data.prediction_result}"]}
+            continue
+        rows.append({"email": data.email, "prediction_result": label,
+                     "prediction_date": _parse_created_at(data.created_at)})
+        results[index] = {"index": index, "email": data.email, "status": "ok"}
+    return rows, results
+
+
+@app.post("/sync_weekly_predictions/bulk")
+def sync_weekly_bulk(request: schemas.SyncBulkRequest, db: Session = Depends(get_db)):
+    rows, results = _sync_predictions_bulk(request)
+    if rows:
+        try:
+            # executemany: satu statement INSERT untuk semua baris
+            db.execute(insert(models.WeeklyPrediction), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Bulk Sync Weekly Error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+    return bulk_sync.bulk_response(results, len(request.items))
+
+
+@app.post("/sync_monthly_predictions/bulk")
+def sync_monthly_bulk(request: schemas.SyncBulkRequest, db: Session = Depends(get_db)):
+    rows, results = _sync_predictions_bulk(request)
+    if rows:
+        try:
+            db.execute(insert(models.MonthlyPrediction), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Bulk Sync Monthly Error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+    return bulk_sync.bulk_response(results, len(request.items))
+
+# ==========================================
+# 5. ADMIN: MODEL REGISTRY
+# ==========================================
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin token is not configured")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/models", dependencies=[Depends(require_admin_token)])
+def list_model_versions():
+    return inference.registry.describe()
+
+@app.post("/admin/models/{version}/preload", dependencies=[Depends(require_admin_token)])
+async def preload_model_version(version: str):
+    try:
+        await inference.preload_version(version)
+    except model_registry.ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Preload model {version} failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"message": f"Model version '{version}' preloaded"}
+
+@app.post("/admin/models/{version}/activate", dependencies=[Depends(require_admin_token)])
+async def activate_model_version(version: str):
+    try:
+        await inference.activate_version(version)
+    except model_registry.ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Activate model {version} failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"message": f"Model version '{version}' activated", "active": version}
+
+@app.post("/admin/models/rollback", dependencies=[Depends(require_admin_token)])
+async def rollback_model_version():
+    try:
+        bundle = await inference.rollback_version()
+    except model_registry.ModelNotFound as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": "Model rolled back", "active": bundle.version}
+
+# ==========================================
+# 6. MONITORING & CACHE
+# ==========================================
+
+@app.post("/user-profile-cache/invalidate", dependencies=[Depends(require_admin_token)])
+def invalidate_user_profile_cache(request: schemas.ProfileCacheInvalidateRequest):
+    """Dipanggil Auth Service setelah profil user berubah (dengan X-Admin-Token)."""
+    user_profile_cache.invalidate(request.email)
+    return {"message": "Profile cache invalidated"}
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
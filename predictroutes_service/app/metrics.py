@@ -0,0 +1,78 @@
+import threading
+from collections import defaultdict, deque
+
+# Metrics sederhana in-process (tanpa dependency tambahan).
+# Dibaca lewat endpoint /metrics dalam bentuk JSON.
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+_summaries = {}
+
+SUMMARY_WINDOW = 1024  # Jumlah sampel terakhir untuk perhitungan percentile
+
+
+class _Summary:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=SUMMARY_WINDOW)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def snapshot(self):
+        data = {
+            "count": self.count,
+            "avg": round(self.total / self.count, 4) if self.count else 0.0,
+            "max": round(self.max, 4),
+        }
+        if self.recent:
+            ordered = sorted(self.recent)
+            for p in (50, 95, 99):
+                idx = min(len(ordered) - 1, int(len(ordered) * p / 100))
+                data[f"p{p}"] = round(ordered[idx], 4)
+        return data
+
+
+def inc(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def counter_value(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def observe(name, value):
+    with _lock:
+        summary = _summaries.get(name)
+        if summary is None:
+            summary = _summaries[name] = _Summary()
+        summary.observe(value)
+
+
+def register_gauge(name, fn):
+    """Gauge dihitung saat dibaca (fn tanpa argumen)."""
+    _gauges[name] = fn
+
+
+def snapshot():
+    with _lock:
+        data = {
+            "counters": dict(_counters),
+            "summaries": {name: s.snapshot() for name, s in _summaries.items()},
+        }
+    gauges = {}
+    for name, fn in list(_gauges.items()):
+        try:
+            gauges[name] = fn()
+        except Exception:
+            gauges[name] = None
+    data["gauges"] = gauges
+    return data
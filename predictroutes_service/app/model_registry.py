@@ -0,0 +1,234 @@
+import logging
+import os
+import threading
+from datetime import datetime
+
+import joblib
+
+import tree_compiler
+from features import FeaturePipeline
+
+logger = logging.getLogger(__name__)
+
+# Nama file artefak (sama untuk semua versi; versi di subfolder boleh menimpa)
+SCALER_FILE = 'minmax_scaler_split.pkl'
+OCCUPATION_ENCODER_FILE = 'Occupation_label_encoder.pkl'
+BMI_CATEGORY_ENCODER_FILE = 'BMI Category_label_encoder.pkl'
+GENDER_ENCODER_FILE = 'Gender_label_encoder.pkl'
+
+# Pakai model hasil kompilasi NumPy (<model>.npz, lihat tree_compiler.py) jika ada
+USE_COMPILED_MODEL = os.getenv("USE_COMPILED_MODEL", "true").lower() in ("1", "true", "yes")
+# > 0: batch lebih besar dari ini memakai booster XGBoost (di-load saat pertama dibutuhkan,
+# compiled forest lebih lambat untuk batch besar). 0: compiled untuk semua ukuran batch,
+# xgboost tidak pernah di-import selama .npz valid.
+COMPILED_MODEL_MAX_ROWS = int(os.getenv("COMPILED_MODEL_MAX_ROWS", "0"))
+
+
+class ModelNotFound(Exception):
+    pass
+
+
+class ModelBundle:
+    """
+    Satu versi model: XGBoost + scaler + encoder, di-load sebagai satu unit.
+    Booster XGBoost (`model`) boleh None selama `compiled` ada; di-load dari
+    `model_path` hanya jika dibutuhkan (lihat predict).
+    """
+
+    def __init__(self, version, model, scaler, occupation_encoder, bmi_encoder, gender_encoder,
+                 compiled=None, model_path=None):
+        self.version = version
+        self.model = model
+        self.compiled = compiled
+        self.model_path = model_path
+        self.scaler = scaler
+        self.occupation_encoder = occupation_encoder
+        self.bmi_encoder = bmi_encoder
+        self.gender_encoder = gender_encoder
+        # Scaler + encoder dikompilasi sekali (lihat features.FeaturePipeline)
+        self.pipeline = FeaturePipeline(scaler, gender_encoder) if scaler is not None else None
+        self.loaded_at = datetime.now()
+        self._booster_lock = threading.Lock()
+
+    def ready(self):
+        return (self.model is not None or self.compiled is not None) and self.scaler is not None
+
+    def booster(self):
+        if self.model is None and self.model_path is not None:
+            with self._booster_lock:
+                if self.model is None:
+                    self.model = load_pickle(self.model_path, "XGBoost Model")
+        return self.model
+
+    def predict(self, features):
+        if self.compiled is not None and (COMPILED_MODEL_MAX_ROWS <= 0 or len(features) <= COMPILED_MODEL_MAX_ROWS):
+            return self.compiled.predict(features)
+        booster = self.booster()
+        if booster is None:
+            return self.compiled.predict(features)
+        return booster.predict(features)
+
+
+def load_pickle(path, name):
+    if os.path.exists(path):
+        try:
+            obj = joblib.load(path)
+            logger.info(f"{name} loaded successfully.")
+            return obj
+        except Exception as e:
+            logger.error(f"Failed to load {name}: {e}")
+            return None
+    else:
+        logger.error(f"{name} file not found at {path}")
+        return None
+
+
+def load_compiled(path):
+    """
+    Versi compiled (<model>.npz) jika ada dan dibuat dari .pkl ini (sha256
+    sama). Tanpa load pickle / import xgboost. None -> pakai pickle.
+    """
+    if not USE_COMPILED_MODEL:
+        return None
+    compiled = tree_compiler.compiled_path(path)
+    if not os.path.exists(compiled):
+        return None
+    try:
+        obj = tree_compiler.CompiledForest.load(compiled)
+    except Exception as e:
+        logger.error(f"Failed to load compiled model {compiled}: {e}. Falling back to pickle.")
+        return None
+    if obj.source_hash != tree_compiler.file_sha256(path):
+        logger.warning(f"Compiled model {compiled} does not match {os.path.basename(path)}. Falling back to pickle.")
+        return None
+    logger.info(f"Compiled XGBoost Model loaded successfully ({os.path.basename(compiled)}).")
+    return obj
+
+
+def compile_loaded(path, model):
+    """Kompilasi ulang di memori dari pickle yang sudah di-load (.npz tidak ada / basi)."""
+    if not USE_COMPILED_MODEL or model is None:
+        return None
+    try:
+        return tree_compiler.compile_model(model, source_hash=tree_compiler.file_sha256(path))
+    except Exception as e:
+        logger.error(f"Failed to compile {path}: {e}. Using XGBoost booster only.")
+        return None
+
+
+class ModelRegistry:
+    """
+    Registry versi model di folder ml_model/.
+
+    Versi yang dikenali:
+      - ml_model/<versi>.pkl (mis. xgb_model_Test): scaler & encoder dari ml_model/
+      - ml_model/<versi>/model.pkl: scaler & encoder dari subfolder tsb,
+        fallback ke ml_model/ jika tidak ada
+
+    Bundle aktif disimpan sebagai satu referensi (`active`). Pembaca cukup
+    mengambil referensi itu sekali per request (tanpa lock); penggantian versi
+    hanya menukar referensi setelah bundle baru selesai di-load.
+    """
+
+    def __init__(self, ml_dir):
+        self.ml_dir = ml_dir
+        self.active = None
+        self._bundles = {}      # versi -> ModelBundle yang sudah di-load
+        self._history = []      # versi aktif sebelumnya (untuk rollback)
+        self._lock = threading.Lock()  # Hanya untuk penulis (load/activate)
+
+    def available_versions(self):
+        versions = {}
+        for name in sorted(os.listdir(self.ml_dir)):
+            path = os.path.join(self.ml_dir, name)
+            stem, ext = os.path.splitext(name)
+            if os.path.isdir(path) and os.path.exists(os.path.join(path, 'model.pkl')):
+                versions[name] = os.path.join(path, 'model.pkl')
+            elif ext == '.pkl' and stem.startswith('xgb_'):
+                versions[stem] = path
+        return versions
+
+    def _artifact(self, model_path, filename):
+        own = os.path.join(os.path.dirname(model_path), filename)
+        return own if os.path.exists(own) else os.path.join(self.ml_dir, filename)
+
+    def load(self, version):
+        """Load (sekali) bundle untuk versi ini. Blocking -> panggil dari thread background."""
+        bundle = self._bundles.get(version)
+        if bundle is not None:
+            return bundle
+
+        with self._lock:
+            bundle = self._bundles.get(version)
+            if bundle is not None:
+                return bundle
+
+            model_path = self.available_versions().get(version)
+            if model_path is None:
+                raise ModelNotFound(f"Model version '{version}' not found")
+
+            logger.info(f"Loading model bundle '{version}'...")
+            compiled = load_compiled(model_path)
+            model = None
+            if compiled is None:
+                model = load_pickle(model_path, "XGBoost Model")
+                compiled = compile_loaded(model_path, model)
+            bundle = ModelBundle(
+                version=version,
+                model=model,
+                compiled=compiled,
+                model_path=model_path,
+                scaler=load_pickle(self._artifact(model_path, SCALER_FILE), "Scaler"),
+                occupation_encoder=load_pickle(self._artifact(model_path, OCCUPATION_ENCODER_FILE), "Occupation Encoder"),
+                bmi_encoder=load_pickle(self._artifact(model_path, BMI_CATEGORY_ENCODER_FILE), "BMI Encoder"),
+                gender_encoder=load_pickle(self._artifact(model_path, GENDER_ENCODER_FILE), "Gender Encoder"),
+            )
+            if not bundle.ready():
+                raise RuntimeError(f"Model bundle '{version}' failed to load (model or scaler missing)")
+
+            self._bundles[version] = bundle
+            return bundle
+
+    def get(self, version):
+        return self._bundles.get(version) or self.load(version)
+
+    def activate(self, version):
+        """Tukar bundle aktif. Bundle harus sudah/akan di-load lebih dulu (blocking)."""
+        bundle = self.load(version)
+        with self._lock:
+            if self.active is not None and self.active.version != version:
+                self._history.append(self.active.version)
+            self.active = bundle
+        logger.info(f"Model version '{version}' is now active.")
+        return bundle
+
+    def previous_version(self):
+        return self._history[-1] if self._history else None
+
+    def rollback(self):
+        with self._lock:
+            if not self._history:
+                raise ModelNotFound("No previous model version to roll back to")
+            version = self._history.pop()
+            self.active = self._bundles[version]
+        logger.info(f"Rolled back to model version '{version}'.")
+        return self.active
+
+    def describe(self):
+        active = self.active.version if self.active else None
+        return {
+            "active": active,
+            "history": list(self._history),
+            "versions": [
+                {
+                    "version": version,
+                    "loaded": version in self._bundles,
+                    "active": version == active,
+                    "compiled": self._bundles[version].compiled is not None
+                    if version in self._bundles else None,
+                    "loaded_at": self._bundles[version].loaded_at.isoformat()
+                    if version in self._bundles else None,
+                }
+                for version in self.available_versions()
+            ],
+        }
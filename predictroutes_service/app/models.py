@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Date, Enum, TIMESTAMP
+from sqlalchemy import Column, Integer, String, DateTime, Float, Date, Enum, TIMESTAMP, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from database import Base
 
@@ -11,8 +11,15 @@ class SleepRecord(Base):
     # HAPUS ForeignKey, ganti jadi String biasa + index agar pencarian cepat
     email = Column(String(255), index=True, nullable=False) 
     sleep_time = Column(DateTime, nullable=False)
+    sleep_date = Column(Date, nullable=False)  # Tanggal dari sleep_time (satu record per hari)
     wake_time = Column(DateTime, nullable=False)
     duration = Column(Float, nullable=False) 
+
+    __table_args__ = (
+        UniqueConstraint("email", "sleep_date", name="uq_sleep_records_email_sleep_date"),
+        # Urutan riwayat & keyset pagination (lihat /get-sleep-records)
+        Index("ix_sleep_records_email_sleep_time", "email", "sleep_time"),
+    )
     
 class Daily(Base):
     __tablename__ = "daily"
@@ -27,7 +34,30 @@ class Daily(Base):
     heart_rate = Column(Integer, nullable=True)
     duration = Column(Float, nullable=False)
     prediction_result = Column(Integer, nullable=True)
+    model_version = Column(String(64), nullable=True)  # Versi model yang menghasilkan prediction_result
+
+    __table_args__ = (
+        UniqueConstraint("email", "date", name="uq_daily_email_date"),
+        # Covering index untuk agregasi weekly/monthly (lihat prediction_stats.py)
+        Index("ix_daily_email_date_result", "email", "date", "prediction_result"),
+    )
     
+class PredictionRollup(Base):
+    # Ringkasan prediksi harian per user, dijaga incremental (lihat rollups.py)
+    __tablename__ = "prediction_rollups"
+
+    email = Column(String(255), primary_key=True)
+    as_of = Column(Date, nullable=False)              # Hari untuk posisi 0 di day_results
+    day_results = Column(String(31), nullable=False)  # Satu karakter per hari: as_of, as_of-1, ...
+    week_insomnia = Column(Integer, nullable=False, default=0)
+    week_normal = Column(Integer, nullable=False, default=0)
+    week_apnea = Column(Integer, nullable=False, default=0)
+    week_days = Column(Integer, nullable=False, default=0)
+    month_insomnia = Column(Integer, nullable=False, default=0)
+    month_normal = Column(Integer, nullable=False, default=0)
+    month_apnea = Column(Integer, nullable=False, default=0)
+    month_days = Column(Integer, nullable=False, default=0)
+
 class WeeklyPrediction(Base):
     __tablename__ = "weekly_predictions"
 
@@ -36,6 +66,12 @@ class WeeklyPrediction(Base):
     email = Column(String(255), index=True, nullable=False)
     prediction_result = Column(Enum('Insomnia', 'Normal', 'Sleep Apnea', name="prediction_enum"), nullable=False)
     prediction_date = Column(TIMESTAMP, server_default=func.now())
+    period_start = Column(Date, nullable=True)  # Senin awal minggu (diisi scheduler.py), NULL untuk data dari client
+
+    __table_args__ = (
+        # Satu hasil per user per minggu: scheduler menulis dengan upsert
+        UniqueConstraint("email", "period_start", name="uq_weekly_predictions_email_period"),
+    )
 
 class MonthlyPrediction(Base):
     __tablename__ = "monthly_predictions"
@@ -43,4 +79,10 @@ class MonthlyPrediction(Base):
     id = Column(Integer, primary_key=True, index=True)
     # Yang ini sudah benar dari awal
     email = Column(String(255), index=True, nullable=False) 
-    prediction_result = Column(String(255), nullable=False)
\ No newline at end of file
+    prediction_result = Column(String(255), nullable=False)
+    prediction_date = Column(TIMESTAMP, server_default=func.now())
+    period_start = Column(Date, nullable=True)  # Tanggal 1 (diisi scheduler.py), NULL untuk data dari client
+
+    __table_args__ = (
+        UniqueConstraint("email", "period_start", name="uq_monthly_predictions_email_period"),
+    )
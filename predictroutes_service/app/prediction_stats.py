@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from sqlalchemy import select, func, case
+
+import models
+
+# Agregasi prediksi harian (tabel daily) untuk verdict mingguan & bulanan.
+# Jumlah per kelas dihitung di database (GROUP BY prediction_result) memakai
+# index (email, date, prediction_result), jadi yang dibaca hanya tiga angka.
+
+WEEKLY_WINDOW_DAYS = 7
+MONTHLY_WINDOW_DAYS = 30
+
+CLASSES = (0, 1, 2)  # 0: Insomnia, 1: Normal, 2: Apnea
+
+
+def _empty_counts():
+    return {c: 0 for c in CLASSES}
+
+
+def count_predictions(db, email, start, end=None):
+    """
+    Jumlah Daily per prediction_result untuk email pada rentang [start, end].
+    Return: (counts, total). total ikut menghitung baris tanpa prediksi.
+    """
+    query = select(models.Daily.prediction_result, func.count()).where(
+        models.Daily.email == email,
+        models.Daily.date >= start,
+    )
+    if end is not None:
+        query = query.where(models.Daily.date <= end)
+
+    counts = _empty_counts()
+    total = 0
+    for result, n in db.execute(query.group_by(models.Daily.prediction_result)):
+        total += n
+        if result in counts:
+            counts[result] = n
+    return counts, total
+
+
+def period_counts(db, email, today):
+    """
+    Jumlah per kelas untuk jendela 7 hari & 30 hari sekaligus (satu scan).
+    Jendela sama dengan /weekly_predict dan /monthly_predict.
+    Return: (weekly_counts, monthly_counts, weekly_total, monthly_total)
+    """
+    week_start = today - timedelta(days=WEEKLY_WINDOW_DAYS)
+    month_start = today - timedelta(days=MONTHLY_WINDOW_DAYS)
+    in_week = case((models.Daily.date.between(week_start, today), 1), else_=0)
+
+    rows = db.execute(
+        select(
+            models.Daily.prediction_result,
+            func.sum(in_week),
+            func.count(),
+        ).where(
+            models.Daily.email == email,
+            models.Daily.date >= month_start,
+        ).group_by(models.Daily.prediction_result)
+    )
+
+    weekly, monthly = _empty_counts(), _empty_counts()
+    weekly_total = monthly_total = 0
+    for result, n_week, n_month in rows:
+        n_week = int(n_week or 0)
+        weekly_total += n_week
+        monthly_total += n_month
+        if result in weekly:
+            weekly[result] = n_week
+            monthly[result] = n_month
+    return weekly, monthly, weekly_total, monthly_total
+
+
+def weekly_verdict(counts):
+    if counts[1] > (counts[0] + counts[2]):
+        return 'Normal'
+    elif counts[2] > counts[0]:
+        return 'Sleep Apnea'
+    elif counts[0] > counts[2]:
+        return 'Insomnia'
+    else:
+        return 'Sleep Apnea'
+
+
+def monthly_verdict(counts):
+    if counts[1] > (counts[0] + counts[2]):
+        return 'Normal'
+    elif counts[2] > counts[0]:
+        return 'Sleep Apnea'
+    else:
+        return 'Insomnia'
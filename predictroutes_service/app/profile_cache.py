@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- PROFILE CACHE SETTINGS ---
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "10000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "300"))              # detik, entry dianggap fresh
+PROFILE_CACHE_STALE_TTL = float(os.getenv("PROFILE_CACHE_STALE_TTL", "3600"))  # detik, entry boleh disajikan stale
+
+
+class ProfileUnavailable(Exception):
+    """Auth Service tidak bisa dihubungi / error (bukan user tidak ditemukan)."""
+
+
+class ProfileCache:
+    """
+    Cache profil user in-process: LRU dengan batas jumlah entry + TTL.
+
+    - fresh  (umur < ttl)       : langsung dikembalikan
+    - stale  (umur < stale_ttl) : dikembalikan, lalu di-refresh di background
+    - expired / miss            : loader dipanggil; jika Auth Service down,
+                                  profil terakhir yang valid tetap dipakai
+    """
+
+    def __init__(self, loader, max_entries=PROFILE_CACHE_MAX_ENTRIES,
+                 ttl=PROFILE_CACHE_TTL, stale_ttl=PROFILE_CACHE_STALE_TTL):
+        # loader(email) -> dict profil, None jika user tidak ada,
+        # raise ProfileUnavailable jika Auth Service bermasalah
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self._entries = OrderedDict()  # email -> (profile, loaded_at)
+        self._refreshing = {}          # email -> asyncio.Task
+        self._generations = {}         # email -> counter invalidasi
+
+        metrics.register_gauge("profile_cache_entries", lambda: len(self._entries))
+
+    async def get(self, email):
+        entry = self._entries.get(email)
+        if entry is not None:
+            profile, loaded_at = entry
+            self._entries.move_to_end(email)
+            age = time.monotonic() - loaded_at
+
+            if age < self.ttl:
+                metrics.inc("profile_cache_hit_total")
+                return profile
+            if age < self.stale_ttl:
+                metrics.inc("profile_cache_stale_total")
+                self._refresh_in_background(email)
+                return profile
+
+        metrics.inc("profile_cache_miss_total")
+        try:
+            return await self._load(email)
+        except ProfileUnavailable:
+            if entry is not None:
+                # Auth Service down: tetap pakai profil terakhir yang valid
+                metrics.inc("profile_cache_fallback_total")
+                return entry[0]
+            return None
+
+    async def get_many(self, emails, bulk_loader):
+        """
+        Banyak profil sekaligus: entry fresh langsung dari cache, sisanya
+        satu kali bulk_loader(emails) -> {email: profile} lalu disimpan ke cache.
+        Email yang tidak ada di hasil bulk dianggap tidak ditemukan (None).
+        raise ProfileUnavailable jika bulk gagal (pemanggil boleh fallback ke get()).
+        """
+        now = time.monotonic()
+        profiles, missing = {}, []
+        for email in dict.fromkeys(emails):
+            entry = self._entries.get(email)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(email)
+                metrics.inc("profile_cache_hit_total")
+                profiles[email] = entry[0]
+            else:
+                missing.append(email)
+        if not missing:
+            return profiles
+
+        metrics.inc("profile_cache_miss_total", len(missing))
+        generations = {email: self._generations.get(email, 0) for email in missing}
+        loaded = await bulk_loader(missing)
+        for email in missing:
+            profile = profiles[email] = loaded.get(email)
+            if generations[email] != self._generations.get(email, 0):
+                # Di-invalidate selama request berjalan -> jangan disimpan
+                continue
+            if profile is None:
+                self._entries.pop(email, None)
+            else:
+                self.put(email, profile)
+        return profiles
+
+    def put(self, email, profile):
+        self._entries[email] = (profile, time.monotonic())
+        self._entries.move_to_end(email)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, email=None):
+        """Hapus satu email, atau seluruh cache jika email None."""
+        # Refresh yang sedang berjalan tidak boleh menulis ulang data lama
+        if email is None:
+            self._entries.clear()
+            for key in list(self._refreshing):
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self._refreshing.clear()
+        else:
+            self._entries.pop(email, None)
+            self._generations[email] = self._generations.get(email, 0) + 1
+            self._refreshing.pop(email, None)
+        metrics.inc("profile_cache_invalidations_total")
+
+    async def _load(self, email):
+        # Request bersamaan untuk email yang sama cukup satu kali ke Auth Service
+        task = self._refreshing.get(email)
+        if task is None:
+            task = self._start_refresh(email)
+        return await asyncio.shield(task)
+
+    def _refresh_in_background(self, email):
+        if email not in self._refreshing:
+            self._start_refresh(email)
+
+    def _start_refresh(self, email):
+        task = asyncio.create_task(self._fetch(email, self._generations.get(email, 0)))
+        self._refreshing[email] = task
+
+        def done(t):
+            if self._refreshing.get(email) is t:
+                del self._refreshing[email]
+            if not t.cancelled():
+                t.exception()  # Error refresh background sudah di-log/dihitung
+
+        task.add_done_callback(done)
+        return task
+
+    async def _fetch(self, email, generation):
+        try:
+            profile = await self.loader(email)
+        except ProfileUnavailable:
+            metrics.inc("profile_cache_load_errors_total")
+            raise
+        if generation != self._generations.get(email, 0):
+            # Di-invalidate selama request berjalan -> jangan disimpan
+            return profile
+        if profile is None:
+            # User sudah tidak ada di Auth Service
+            self._entries.pop(email, None)
+        else:
+            self.put(email, profile)
+        return profile
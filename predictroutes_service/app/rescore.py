@@ -0,0 +1,314 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from datetime import date, datetime
+
+from sqlalchemy import select, update, func, and_, or_
+
+import auth_profiles
+import database
+import inference
+import metrics
+import model_registry
+import models
+import rollups
+
+logger = logging.getLogger(__name__)
+
+# Re-scoring riwayat Daily dengan satu versi model (mis. setelah ganti model).
+#
+# Baris Daily (+ durasi SleepRecord di tanggal yang sama) dibaca lewat
+# server-side cursor urut (email, date). Per chunk: profil diambil bulk dari
+# Auth Service, seluruh chunk diprediksi sebagai satu matriks
+# (inference.score_rows, opsional di process pool), lalu prediction_result &
+# model_version ditulis dengan satu bulk UPDATE per primary key. Setelah chunk
+# commit, (email, date) terakhir disimpan ke file checkpoint JSON sehingga job
+# bisa dilanjutkan dari titik itu.
+
+RESCORE_CHUNK_SIZE = int(os.getenv("RESCORE_CHUNK_SIZE", "2000"))
+RESCORE_CHECKPOINT = os.getenv("RESCORE_CHECKPOINT", "rescore_checkpoint.json")
+
+# Kolom snapshot Daily yang menggantikan nilai profil saat ini (nilai saat prediksi asli)
+SNAPSHOT_FIELDS = ("upper_pressure", "lower_pressure", "daily_steps", "heart_rate")
+
+
+class CheckpointMismatch(Exception):
+    pass
+
+
+# ==========================================
+# CHECKPOINT
+# ==========================================
+
+def load_checkpoint(path, version):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("model_version") != version:
+        raise CheckpointMismatch(
+            f"Checkpoint {path} belongs to model version '{state.get('model_version')}'. Use --reset to start over."
+        )
+    return state
+
+
+def save_checkpoint(path, state):
+    # Tulis ke file sementara lalu rename: checkpoint tidak pernah setengah jadi
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+# ==========================================
+# QUERY & FEATURES
+# ==========================================
+
+def _filters(query, emails=None, since=None, until=None):
+    if emails:
+        query = query.where(models.Daily.email.in_(emails))
+    if since is not None:
+        query = query.where(models.Daily.date >= since)
+    if until is not None:
+        query = query.where(models.Daily.date <= until)
+    return query
+
+
+def daily_query(after=None, emails=None, since=None, until=None):
+    """Baris Daily urut (email, date) setelah checkpoint `after` = (email, date)."""
+    daily, sleep = models.Daily, models.SleepRecord
+    query = select(
+        daily.id, daily.email, daily.date,
+        daily.upper_pressure, daily.lower_pressure, daily.daily_steps, daily.heart_rate,
+        daily.duration, daily.prediction_result, daily.model_version,
+        sleep.duration.label("sleep_duration"),
+    ).outerjoin(sleep, and_(sleep.email == daily.email, sleep.sleep_date == daily.date))
+    if after is not None:
+        last_email, last_date = after
+        query = query.where(or_(
+            daily.email > last_email,
+            and_(daily.email == last_email, daily.date > last_date)
+        ))
+    return _filters(query, emails, since, until).order_by(daily.email, daily.date)
+
+
+def count_query(after=None, emails=None, since=None, until=None):
+    query = select(func.count(models.Daily.id))
+    if after is not None:
+        last_email, last_date = after
+        query = query.where(or_(
+            models.Daily.email > last_email,
+            and_(models.Daily.email == last_email, models.Daily.date > last_date)
+        ))
+    return _filters(query, emails, since, until)
+
+
+def build_inputs(rows, profiles):
+    """
+    Profil saat ini + snapshot Daily per baris.
+    Durasi: Daily.duration, atau SleepRecord di tanggal yang sama jika Daily
+    disimpan dengan durasi default (0) karena belum ada record tidur.
+    Return: (index baris yang diprediksi, user_rows, sleep_durations)
+    """
+    scored, user_rows, durations = [], [], []
+    for i, row in enumerate(rows):
+        profile = profiles.get(row.email)
+        if profile is None:
+            continue
+        user = dict(profile)
+        for field in SNAPSHOT_FIELDS:
+            value = getattr(row, field)
+            if value is not None:
+                user[field] = value
+        scored.append(i)
+        user_rows.append(user)
+        durations.append(row.duration or row.sleep_duration or 0.0)
+    return scored, user_rows, durations
+
+
+# ==========================================
+# JOB
+# ==========================================
+
+class Rescorer:
+    def __init__(self, version, executor, checkpoint_path, max_inflight=1, dry_run=False):
+        self.version = version
+        self.executor = executor
+        self.checkpoint_path = checkpoint_path
+        self.max_inflight = max(1, max_inflight)
+        self.dry_run = dry_run
+        self.today = date.today()
+        self.state = {
+            "model_version": version,
+            "last_email": None, "last_date": None,
+            "rows": 0, "updated": 0, "skipped": 0,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    def resume(self, state):
+        self.state.update(state)
+
+    @property
+    def after(self):
+        if self.state["last_email"] is None:
+            return None
+        return self.state["last_email"], date.fromisoformat(self.state["last_date"])
+
+    async def _prepare(self, rows):
+        emails = sorted({row.email for row in rows})
+        errors = metrics.counter_value("profile_cache_load_errors_total")
+        profiles = await auth_profiles.fetch_user_profiles(emails)
+        if metrics.counter_value("profile_cache_load_errors_total") > errors:
+            # Jangan lewati baris karena Auth Service down; checkpoint tetap di chunk sebelumnya
+            raise RuntimeError("Auth Service unavailable while fetching profiles")
+
+        scored, user_rows, durations = build_inputs(rows, profiles)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.executor, inference.score_rows, self.version, user_rows, durations
+        ) if scored else None
+        return rows, scored, future
+
+    async def _write(self, db, rows, scored, future):
+        predictions, valid_mask = await future if future is not None else ([], [])
+
+        updates, touched = [], set()
+        n_valid = 0
+        for i, prediction, valid in zip(scored, predictions, valid_mask):
+            if not valid:
+                continue
+            n_valid += 1
+            row, result = rows[i], int(prediction)
+            if row.prediction_result == result and row.model_version == self.version:
+                continue
+            updates.append({"id": row.id, "prediction_result": result, "model_version": self.version})
+            if row.prediction_result != result and (self.today - row.date).days < rollups.RING_DAYS:
+                touched.add(row.email)
+
+        if not self.dry_run:
+            if updates:
+                # ORM bulk UPDATE per primary key (executemany)
+                await db.execute(update(models.Daily), updates)
+            if touched:
+                await db.run_sync(rollups.rebuild, sorted(touched), self.today)
+            await db.commit()
+
+        last = rows[-1]
+        self.state.update(
+            last_email=last.email, last_date=last.date.isoformat(),
+            rows=self.state["rows"] + len(rows),
+            updated=self.state["updated"] + len(updates),
+            skipped=self.state["skipped"] + len(rows) - n_valid,
+        )
+        if not self.dry_run:
+            save_checkpoint(self.checkpoint_path, self.state)
+
+    async def run(self, chunk_size, emails=None, since=None, until=None):
+        async with database.AsyncSessionLocal() as read_db, database.AsyncSessionLocal() as write_db:
+            after = self.after
+            total = (await read_db.execute(count_query(after, emails, since, until))).scalar()
+            logger.info(f"Re-scoring {total} daily rows with model '{self.version}'"
+                        + (f" (resuming after {after[0]} {after[1]})" if after else ""))
+
+            started = last_report = time.perf_counter()
+            done = reported = 0
+            pending = deque()
+            result = await read_db.stream(
+                daily_query(after, emails, since, until).execution_options(yield_per=chunk_size)
+            )
+            try:
+                # Chunk berikutnya dibaca & diprediksi selama chunk sebelumnya ditulis
+                async for rows in result.partitions():
+                    pending.append(await self._prepare(rows))
+                    while len(pending) > self.max_inflight:
+                        chunk = pending.popleft()
+                        await self._write(write_db, *chunk)
+                        done += len(chunk[0])
+
+                        now = time.perf_counter()
+                        if now - last_report >= 5:
+                            logger.info(
+                                f"{done}/{total} rows | {(done - reported) / (now - last_report):.0f} rows/s "
+                                f"(avg {done / (now - started):.0f} rows/s) | "
+                                f"updated={self.state['updated']} skipped={self.state['skipped']}"
+                            )
+                            last_report, reported = now, done
+                while pending:
+                    chunk = pending.popleft()
+                    await self._write(write_db, *chunk)
+                    done += len(chunk[0])
+            finally:
+                await result.close()
+                for _, _, future in pending:
+                    if future is not None:
+                        future.cancel()
+
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"Done: {done} rows in {elapsed:.1f}s ({done / elapsed if elapsed else 0:.0f} rows/s), "
+                f"updated={self.state['updated']} skipped={self.state['skipped']}"
+                + (" [dry run, nothing written]" if self.dry_run else "")
+            )
+        return self.state
+
+
+# ==========================================
+# CLI
+# ==========================================
+# python rescore.py --model-version xgb_model_v2 [--executor process --workers 4]
+#                   [--chunk-size 2000] [--since 2025-01-01] [--until ...] [--email ...]
+#                   [--checkpoint rescore_checkpoint.json] [--reset] [--dry-run]
+
+async def _main(args):
+    kind = args.executor
+    if kind == "thread":
+        # Thread pool memakai registry proses ini
+        inference.registry.load(args.model_version)
+    elif args.model_version not in inference.registry.available_versions():
+        raise model_registry.ModelNotFound(f"Model version '{args.model_version}' not found")
+
+    state = None if args.reset or args.dry_run else load_checkpoint(args.checkpoint, args.model_version)
+    executor = inference.create_executor(args.model_version, kind=kind, workers=args.workers)
+    await auth_profiles.auth_client.start()
+    try:
+        rescorer = Rescorer(args.model_version, executor, args.checkpoint,
+                            max_inflight=args.workers, dry_run=args.dry_run)
+        if state is not None:
+            rescorer.resume(state)
+        await rescorer.run(args.chunk_size, args.email, args.since, args.until)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        await auth_profiles.auth_client.aclose()
+        await database.async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score riwayat tabel daily dengan satu versi model.")
+    parser.add_argument("--model-version", default=inference.DEFAULT_MODEL_VERSION)
+    parser.add_argument("--chunk-size", type=int, default=RESCORE_CHUNK_SIZE)
+    parser.add_argument("--executor", choices=("thread", "process"), default=inference.INFERENCE_EXECUTOR)
+    parser.add_argument("--workers", type=int, default=inference.INFERENCE_WORKERS)
+    parser.add_argument("--checkpoint", default=RESCORE_CHECKPOINT)
+    parser.add_argument("--reset", action="store_true", help="abaikan checkpoint yang ada")
+    parser.add_argument("--dry-run", action="store_true", help="prediksi saja, tanpa menulis")
+    parser.add_argument("--email", action="append", help="hanya user ini (boleh diulang)")
+    parser.add_argument("--since", type=date.fromisoformat, help="tanggal daily mulai (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="tanggal daily sampai (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    try:
+        asyncio.run(_main(args))
+    except (CheckpointMismatch, model_registry.ModelNotFound) as e:
+        logger.error(str(e))
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import os
+import time
+
+import redis.asyncio as aioredis
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- RESPONSE CACHE SETTINGS ---
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_URL = os.getenv("REDIS_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/0")
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))              # detik, umur response
+RESPONSE_CACHE_TIMEOUT = float(os.getenv("RESPONSE_CACHE_TIMEOUT", "0.1"))    # detik, per operasi Redis
+RESPONSE_CACHE_RETRY_AFTER = float(os.getenv("RESPONSE_CACHE_RETRY_AFTER", "30"))  # detik, jeda setelah Redis error
+
+# Version key harus hidup lebih lama dari response yang memakainya
+VERSION_TTL = max(7 * 24 * 3600, RESPONSE_CACHE_TTL * 2)
+
+# Bump versi yang tertunda saat Redis mati; lebih dari ini -> seluruh cache dianggap basi
+PENDING_BUMPS_MAX = 10000
+
+KEY_PREFIX = "predict"
+EPOCH_KEY = f"{KEY_PREFIX}:epoch"
+
+
+def params_digest(params):
+    query = "&".join(f"{k}={v}" for k, v in sorted(params.items()) if v is not None)
+    return hashlib.sha1(query.encode()).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Cache response JSON di Redis (dipakai bersama semua worker).
+
+    Key response memuat versi data user:
+        predict:resp:<email>:<epoch>.<versi>:<endpoint>:<hash params>
+    Endpoint tulis cukup INCR predict:ver:<email> (O(1)); response lama tidak
+    terbaca lagi dan hilang sendiri lewat TTL.
+
+    Redis mati / lambat -> semua operasi diam-diam dilewati (tanpa cache) dan
+    Redis tidak dicoba lagi selama retry_after detik. Bump versi yang gagal
+    disimpan dan dikirim ulang sebelum cache dipakai lagi, agar response
+    lama tidak pernah tersaji setelah Redis pulih. Jika antrian bump terlalu
+    panjang, epoch global yang dinaikkan (semua key lama ikut basi).
+    """
+
+    def __init__(self, url=REDIS_URL, ttl=RESPONSE_CACHE_TTL, timeout=RESPONSE_CACHE_TIMEOUT,
+                 retry_after=RESPONSE_CACHE_RETRY_AFTER, enabled=RESPONSE_CACHE_ENABLED):
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.enabled = enabled
+        self._redis = None
+        self._down_until = 0.0
+        self._pending_bumps = set()
+        self._bump_epoch = False
+        self._local_versions = {}  # email -> jumlah bump di proses ini (fallback saat Redis mati)
+
+        metrics.register_gauge("response_cache_available", self.available)
+
+    async def start(self):
+        if not self.enabled:
+            return
+        # Koneksi dibuka saat pertama dipakai; from_url tidak memblokir startup
+        self._redis = aioredis.from_url(
+            self.url, socket_timeout=self.timeout, socket_connect_timeout=self.timeout
+        )
+
+    async def aclose(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def available(self):
+        return self._redis is not None and time.monotonic() >= self._down_until
+
+    def _failed(self, e):
+        if self.available():
+            logger.warning(f"Redis response cache unavailable ({e!r}), serving uncached for {self.retry_after:.0f}s")
+        self._down_until = time.monotonic() + self.retry_after
+        metrics.inc("response_cache_errors_total")
+
+    @staticmethod
+    def _version_key(email):
+        return f"{KEY_PREFIX}:ver:{email}"
+
+    def _defer_bumps(self, emails):
+        if self._bump_epoch:
+            return
+        self._pending_bumps.update(emails)
+        if len(self._pending_bumps) > PENDING_BUMPS_MAX:
+            self._pending_bumps.clear()
+            self._bump_epoch = True
+
+    async def _flush_pending(self):
+        if self._bump_epoch:
+            await self._redis.incr(EPOCH_KEY)
+            self._bump_epoch = False
+            return
+        pending, self._pending_bumps = self._pending_bumps, set()
+        try:
+            await self._incr(pending)
+        except Exception:
+            self._defer_bumps(pending)
+            raise
+
+    async def _incr(self, emails):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for email in emails:
+                pipe.incr(self._version_key(email))
+                pipe.expire(self._version_key(email), VERSION_TTL)
+            await pipe.execute()
+
+    async def version(self, email):
+        """Versi data user ("<epoch>.<versi>") dari Redis, None jika Redis tidak bisa dipakai."""
+        if not self.available():
+            return None
+        try:
+            if self._pending_bumps or self._bump_epoch:
+                await self._flush_pending()
+            epoch, version = await self._redis.mget(EPOCH_KEY, self._version_key(email))
+        except Exception as e:
+            self._failed(e)
+            return None
+        return f"{int(epoch or 0)}.{int(version or 0)}"
+
+    def local_version(self, email):
+        """Counter tulis in-process (tetap berjalan walau Redis mati)."""
+        return f"local.{self._local_versions.get(email, 0)}"
+
+    async def key(self, email, endpoint, params, version=None):
+        """Key response untuk versi data user saat ini, None jika Redis tidak bisa dipakai."""
+        version = version or await self.version(email)
+        if version is None:
+            return None
+        return f"{KEY_PREFIX}:resp:{email}:{version}:{endpoint}:{params_digest(params)}"
+
+    async def get(self, key):
+        try:
+            body = await self._redis.get(key)
+        except Exception as e:
+            self._failed(e)
+            return None
+        metrics.inc("response_cache_hit_total" if body is not None else "response_cache_miss_total")
+        return body
+
+    async def set(self, key, body):
+        try:
+            await self._redis.set(key, body, ex=self.ttl)
+        except Exception as e:
+            self._failed(e)
+
+    async def bump(self, *emails):
+        """Naikkan versi data user setelah endpoint tulis commit."""
+        for email in emails:
+            self._local_versions[email] = self._local_versions.get(email, 0) + 1
+        if not emails or self._redis is None:
+            return
+        if not self.available():
+            self._defer_bumps(emails)
+            return
+        try:
+            await self._incr(emails)
+        except Exception as e:
+            self._defer_bumps(emails)
+            self._failed(e)
@@ -0,0 +1,243 @@
+import argparse
+import logging
+import sys
+from datetime import date, timedelta
+
+from sqlalchemy import select, delete
+
+import database
+import models
+import prediction_stats
+
+logger = logging.getLogger(__name__)
+
+# Rollup prediksi per user (tabel prediction_rollups).
+#
+# day_results menyimpan hasil 31 hari terakhir (posisi 0 = as_of, 1 = kemarin, ...),
+# counts mingguan/bulanan dijaga incremental setiap kali Daily.prediction_result
+# ditulis. Hari yang keluar dari jendela dikurangi saat ring digeser ke hari ini,
+# sehingga verdict cukup dibaca dari satu baris (lookup primary key).
+
+RING_DAYS = prediction_stats.MONTHLY_WINDOW_DAYS + 1  # today .. today-30
+WEEK_DAYS = prediction_stats.WEEKLY_WINDOW_DAYS + 1   # today .. today-7
+
+NO_ROW = '.'          # Tidak ada baris Daily
+NO_PREDICTION = '-'   # Ada baris Daily, prediction_result kosong
+UNBUILT = ''          # Baris rollup baru (placeholder), isinya belum dihitung dari daily
+
+COUNT_COLUMNS = (
+    "week_insomnia", "week_normal", "week_apnea", "week_days",
+    "month_insomnia", "month_normal", "month_apnea", "month_days",
+)
+
+LABELS = {0: 'insomnia', 1: 'normal', 2: 'apnea'}
+
+
+def _char(result):
+    return str(result) if result in LABELS else NO_PREDICTION
+
+
+def _count(rollup, window, char, sign):
+    if char == NO_ROW:
+        return
+    setattr(rollup, f"{window}_days", getattr(rollup, f"{window}_days") + sign)
+    if char != NO_PREDICTION:
+        field = f"{window}_{LABELS[int(char)]}"
+        setattr(rollup, field, getattr(rollup, field) + sign)
+
+
+def _fill(rollup, today, ring=None):
+    """Isi ulang rollup (objek baru atau baris yang sudah dikunci) dari ring hari."""
+    ring = ring or [NO_ROW] * RING_DAYS
+    rollup.as_of = today
+    rollup.day_results = "".join(ring)
+    for column in COUNT_COLUMNS:
+        setattr(rollup, column, 0)
+    for index, char in enumerate(ring):
+        _count(rollup, "month", char, 1)
+        if index < WEEK_DAYS:
+            _count(rollup, "week", char, 1)
+    return rollup
+
+
+def _new_rollup(email, today, ring=None):
+    return _fill(models.PredictionRollup(email=email), today, ring)
+
+
+def _rollup_values(email, today, ring=None):
+    rollup = _new_rollup(email, today, ring)
+    return {"email": email, "as_of": rollup.as_of, "day_results": rollup.day_results,
+            **{column: getattr(rollup, column) for column in COUNT_COLUMNS}}
+
+
+def _lock(db, emails):
+    return {
+        r.email: r for r in db.execute(
+            select(models.PredictionRollup)
+            .where(models.PredictionRollup.email.in_(list(emails)))
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).scalars()
+    }
+
+
+def _claim(db, emails, today):
+    """
+    Pastikan baris rollup ada lalu kunci (FOR UPDATE).
+    Baris dibuat sebagai placeholder lewat INSERT ... ON DUPLICATE KEY UPDATE
+    tanpa perubahan: dua penulisan pertama bersamaan untuk email yang sama
+    tidak bentrok di primary key, yang kedua menunggu lock baris yang pertama.
+    """
+    placeholder = {column: 0 for column in COUNT_COLUMNS}
+    db.execute(database.upsert(
+        db, models.PredictionRollup,
+        [{"email": email, "as_of": today, "day_results": UNBUILT, **placeholder} for email in emails],
+        conflict_columns=["email"],
+        update=lambda new: {"email": models.PredictionRollup.__table__.c.email},
+    ))
+    return _lock(db, emails)
+
+
+def advance(rollup, today):
+    """Geser ring ke `today`; hari yang keluar dari jendela dikurangi dari counts."""
+    shift = (today - rollup.as_of).days
+    if shift <= 0:
+        return
+
+    ring = rollup.day_results
+    for index, char in enumerate(ring):
+        moved = index + shift
+        if index < WEEK_DAYS <= moved:
+            _count(rollup, "week", char, -1)
+        if moved >= RING_DAYS:
+            _count(rollup, "month", char, -1)
+
+    rollup.day_results = (NO_ROW * min(shift, RING_DAYS) + ring)[:RING_DAYS]
+    rollup.as_of = today
+
+
+def set_day(rollup, day, result):
+    index = (rollup.as_of - day).days
+    if not 0 <= index < RING_DAYS:
+        return
+
+    ring = rollup.day_results
+    old, new = ring[index], _char(result)
+    if old == new:
+        return
+    for char, sign in ((old, -1), (new, 1)):
+        _count(rollup, "month", char, sign)
+        if index < WEEK_DAYS:
+            _count(rollup, "week", char, sign)
+    rollup.day_results = ring[:index] + new + ring[index + 1:]
+
+
+def counts(rollup):
+    """Format sama dengan prediction_stats.period_counts."""
+    weekly = {c: getattr(rollup, f"week_{label}") for c, label in LABELS.items()}
+    monthly = {c: getattr(rollup, f"month_{label}") for c, label in LABELS.items()}
+    return weekly, monthly, rollup.week_days, rollup.month_days
+
+
+def read_period(db, email, today=None):
+    """
+    Counts mingguan & bulanan untuk email: satu lookup primary key.
+    User yang belum punya rollup dihitung langsung dari tabel daily.
+    """
+    today = today or date.today()
+    rollup = db.get(models.PredictionRollup, email)
+    if rollup is None:
+        return prediction_stats.period_counts(db, email, today)
+    advance(rollup, today)
+    return counts(rollup)
+
+
+def record_results(db, day, results, today=None):
+    """
+    Catat prediction_result (email -> hasil) untuk tanggal `day` ke rollup.
+    Dipanggil di transaksi yang sama dengan penulisan Daily, sebelum commit.
+    """
+    today = today or date.today()
+    if not results or day > today or (today - day).days >= RING_DAYS:
+        return
+
+    # Perubahan Daily harus sudah terlihat kalau rollup perlu dibangun ulang
+    db.flush()
+    rollups = _lock(db, results)
+    missing = [email for email in results if email not in rollups]
+    if missing:
+        rollups.update(_claim(db, missing, today))
+
+    # Placeholder yang kita buat sendiri: hitung dari daily (sudah memuat hasil ini)
+    unbuilt = [email for email, rollup in rollups.items() if rollup.day_results == UNBUILT]
+    rings = _rings(db, unbuilt, today) if unbuilt else {}
+    for email, result in results.items():
+        rollup = rollups[email]
+        if rollup.day_results == UNBUILT:
+            _fill(rollup, today, rings.get(email))
+        else:
+            advance(rollup, today)
+            set_day(rollup, day, result)
+
+
+def record_result(db, email, day, result, today=None):
+    record_results(db, day, {email: result}, today)
+
+
+def _rings(db, emails, today):
+    query = select(models.Daily.email, models.Daily.date, models.Daily.prediction_result).where(
+        models.Daily.date.between(today - timedelta(days=RING_DAYS - 1), today)
+    ).order_by(models.Daily.id)
+    if emails is not None:
+        query = query.where(models.Daily.email.in_(emails))
+
+    rings = {}
+    for email, day, result in db.execute(query):
+        ring = rings.setdefault(email, [NO_ROW] * RING_DAYS)
+        ring[(today - day).days] = _char(result)
+    return rings
+
+
+def rebuild(db, emails=None, today=None):
+    """Hitung ulang rollup dari tabel daily (semua user, atau daftar email)."""
+    today = today or date.today()
+    rings = _rings(db, emails, today)
+
+    if emails is None:
+        # Rebuild penuh (CLI, offline): kosongkan tabel lalu isi ulang
+        db.execute(delete(models.PredictionRollup).execution_options(synchronize_session=False))
+        db.add_all([_new_rollup(email, today, ring) for email, ring in rings.items()])
+        return len(rings)
+
+    if emails:
+        # Per email (mis. rescore.py saat API berjalan): upsert, tidak bentrok dengan penulisan pertama bersamaan
+        db.execute(database.upsert(
+            db, models.PredictionRollup,
+            [_rollup_values(email, today, rings.get(email)) for email in emails],
+            conflict_columns=["email"], update=["as_of", "day_results", *COUNT_COLUMNS],
+        ))
+    return len(emails)
+
+
+# ==========================================
+# CLI
+# ==========================================
+# python rollups.py rebuild [--email user@x.com ...]
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain tabel prediction_rollups.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = sub.add_parser("rebuild", help="hitung ulang rollup dari riwayat daily")
+    rebuild_parser.add_argument("--email", action="append", help="hanya user ini (boleh diulang)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    with database.SessionLocal() as db:
+        n = rebuild(db, args.email)
+        db.commit()
+    logger.info(f"Rebuilt {n} prediction rollups.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
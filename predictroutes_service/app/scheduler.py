@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, func, case
+
+import database
+import metrics
+import models
+import prediction_stats
+
+logger = logging.getLogger(__name__)
+
+# Materialisasi prediksi mingguan & bulanan (tabel weekly_predictions /
+# monthly_predictions) untuk semua user aktif, dijalankan tiap malam.
+#
+# Periode kalender: minggu Senin-Minggu dan bulan kalender yang memuat `as_of`
+# (default: kemarin). Jumlah per kelas dihitung di database (GROUP BY email,
+# prediction_result) per chunk email, verdict memakai aturan yang sama dengan
+# /weekly_predict & /monthly_predict, lalu ditulis dengan upsert pada
+# (email, period_start). Menjalankan ulang untuk tanggal yang sama aman.
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "false").lower() in ("1", "true", "yes")
+SCHEDULER_RUN_AT = os.getenv("SCHEDULER_RUN_AT", "02:00")                # jam lokal (HH:MM)
+SCHEDULER_CHUNK_SIZE = int(os.getenv("SCHEDULER_CHUNK_SIZE", "500"))     # user per transaksi
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "4"))     # transaksi paralel
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _active_emails_query(start, end):
+    """User yang punya prediksi harian di rentang [start, end]."""
+    return select(models.Daily.email).where(
+        models.Daily.date.between(start, end),
+        models.Daily.prediction_result.isnot(None),
+    ).distinct().order_by(models.Daily.email)
+
+
+def _counts_query(emails, week_from, month_from, as_of):
+    # Satu scan untuk dua periode: minggu bisa dimulai di bulan sebelumnya
+    in_week = case((models.Daily.date >= week_from, 1), else_=0)
+    in_month = case((models.Daily.date >= month_from, 1), else_=0)
+    return select(
+        models.Daily.email,
+        models.Daily.prediction_result,
+        func.sum(in_week),
+        func.sum(in_month),
+    ).where(
+        models.Daily.email.in_(emails),
+        models.Daily.date.between(min(week_from, month_from), as_of),
+        models.Daily.prediction_result.isnot(None),
+    ).group_by(models.Daily.email, models.Daily.prediction_result)
+
+
+async def materialize_chunk(emails, as_of):
+    """Verdict minggu & bulan untuk satu chunk email, satu transaksi."""
+    week_from, month_from = week_start(as_of), month_start(as_of)
+    computed_at = datetime.now()
+
+    async with database.AsyncSessionLocal() as db:
+        counts = {}
+        for email, result, n_week, n_month in await db.execute(_counts_query(emails, week_from, month_from, as_of)):
+            weekly, monthly = counts.setdefault(email, ({c: 0 for c in prediction_stats.CLASSES},
+                                                        {c: 0 for c in prediction_stats.CLASSES}))
+            if result in weekly:
+                weekly[result] = int(n_week or 0)
+                monthly[result] = int(n_month or 0)
+
+        weekly_rows, monthly_rows = [], []
+        for email, (weekly, monthly) in counts.items():
+            if any(weekly.values()):
+                weekly_rows.append({
+                    "email": email, "period_start": week_from, "prediction_date": computed_at,
+                    "prediction_result": prediction_stats.weekly_verdict(weekly),
+                })
+            if any(monthly.values()):
+                monthly_rows.append({
+                    "email": email, "period_start": month_from, "prediction_date": computed_at,
+                    "prediction_result": prediction_stats.monthly_verdict(monthly),
+                })
+
+        for model, rows in ((models.WeeklyPrediction, weekly_rows), (models.MonthlyPrediction, monthly_rows)):
+            if rows:
+                await db.execute(database.upsert(
+                    db, model, rows,
+                    conflict_columns=["email", "period_start"], update=["prediction_result", "prediction_date"]
+                ))
+        await db.commit()
+    return len(weekly_rows), len(monthly_rows)
+
+
+async def materialize(as_of=None, chunk_size=SCHEDULER_CHUNK_SIZE, concurrency=SCHEDULER_CONCURRENCY):
+    """
+    Tulis weekly_predictions & monthly_predictions untuk periode yang memuat `as_of`.
+    Chunk berjalan paralel (maksimal `concurrency` transaksi), masing-masing commit sendiri.
+    """
+    as_of = as_of or date.today() - timedelta(days=1)
+    started = time.perf_counter()
+
+    async with database.AsyncSessionLocal() as db:
+        emails = (await db.execute(
+            _active_emails_query(min(week_start(as_of), month_start(as_of)), as_of)
+        )).scalars().all()
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_chunk(chunk):
+        async with semaphore:
+            return await materialize_chunk(chunk, as_of)
+
+    chunks = [emails[i:i + chunk_size] for i in range(0, len(emails), chunk_size)]
+    results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+
+    summary = {
+        "as_of": as_of.isoformat(),
+        "week_start": week_start(as_of).isoformat(),
+        "month_start": month_start(as_of).isoformat(),
+        "users": len(emails),
+        "weekly": sum(w for w, _ in results),
+        "monthly": sum(m for _, m in results),
+    }
+    elapsed = time.perf_counter() - started
+    metrics.observe("materialize_predictions_seconds", elapsed)
+    metrics.inc("materialize_predictions_runs_total")
+    logger.info(f"Materialized predictions {summary} in {elapsed:.1f}s")
+    return summary
+
+
+class NightlyScheduler:
+    """Task asyncio in-process: menjalankan `job()` setiap hari pada jam `run_at` (HH:MM)."""
+
+    def __init__(self, job, run_at=SCHEDULER_RUN_AT):
+        self.job = job
+        hour, minute = map(int, run_at.split(":"))
+        self.run_at = (hour, minute)
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Nightly scheduler started (run at {self.run_at[0]:02d}:{self.run_at[1]:02d})")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def seconds_until_next_run(self, now=None):
+        now = now or datetime.now()
+        target = now.replace(hour=self.run_at[0], minute=self.run_at[1], second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        return (target - now).total_seconds()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.seconds_until_next_run())
+            try:
+                await self.job()
+            except Exception as e:
+                # Gagal malam ini tidak menghentikan jadwal berikutnya
+                metrics.inc("materialize_predictions_errors_total")
+                logger.error(f"Nightly job failed: {e}")
+
+
+# ==========================================
+# CLI
+# ==========================================
+# python scheduler.py run [--as-of YYYY-MM-DD]
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialisasi prediksi mingguan & bulanan.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="jalankan sekarang")
+    run_parser.add_argument("--as-of", type=date.fromisoformat, help="tanggal acuan (default: kemarin)")
+    run_parser.add_argument("--chunk-size", type=int, default=SCHEDULER_CHUNK_SIZE)
+    run_parser.add_argument("--concurrency", type=int, default=SCHEDULER_CONCURRENCY)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    async def run():
+        try:
+            await materialize(args.as_of, args.chunk_size, args.concurrency)
+        finally:
+            await database.async_engine.dispose()
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
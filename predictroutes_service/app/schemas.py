@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import date, datetime, time
-from typing import Optional
+from typing import Optional, List, Dict, Any
 
 class SleepData(BaseModel):
     email: str
@@ -10,6 +10,9 @@ class SleepData(BaseModel):
 class PredictRequest(BaseModel):
     email: EmailStr
 
+class PredictBatchRequest(BaseModel):
+    emails: List[EmailStr]
+
 class SavePredictionRequest(BaseModel):
     email: str
     prediction_result: int
@@ -24,6 +27,9 @@ class SavePredictionRequestWeek(BaseModel):
 class MonthlyPredictRequest(BaseModel):
     email: str
 
+class PeriodPredictRequest(BaseModel):
+    email: str
+
 class SavePredictionRequestMonth(BaseModel):
     email: str
     prediction_result: int  # Mengharapkan input berupa integer
@@ -50,3 +56,9 @@ class SyncPredictionRequest(BaseModel):
     prediction_result: int
     created_at: str 
 
+class SyncBulkRequest(BaseModel):
+    # Item divalidasi satu per satu di endpoint (status per item)
+    items: List[Dict[str, Any]]
+
+class ProfileCacheInvalidateRequest(BaseModel):
+    email: Optional[str] = None  # None = kosongkan seluruh cache
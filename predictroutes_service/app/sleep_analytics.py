@@ -0,0 +1,310 @@
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+import models
+
+# Analitik riwayat tidur berbasis array NumPy.
+#
+# Record tidur seorang user diambil sekali (satu query) menjadi array
+# sleep/wake (datetime64[s]), lalu dikelompokkan per bucket waktu
+# (day, weekday, week, month, year) dengan np.bincount. Rata-rata jam tidur &
+# bangun memakai circular mean, sehingga 23:00 dan 01:00 rata-ratanya 00:00.
+
+GRANULARITIES = ("day", "weekday", "week", "month", "year")
+
+SECONDS_PER_DAY = 86400
+ONE_DAY = np.timedelta64(1, "D")
+
+
+class SleepTimeline:
+    """
+    Record tidur satu user sebagai array (terbaru lebih dulu).
+    ids & duration (jam, kolom sleep_records.duration) opsional; dipakai
+    timeline_cache untuk list record & prediksi.
+    """
+
+    def __init__(self, sleep, wake, ids=None, duration=None):
+        self.sleep = sleep
+        # Record lintas tengah malam yang tersimpan tanpa tanggal bangun berikutnya
+        self.wake = np.where(wake < sleep, wake + ONE_DAY, wake)
+        self.ids = ids
+        self.duration = duration
+
+    @classmethod
+    def from_rows(cls, rows):
+        sleep = np.array([r.sleep_time for r in rows], dtype="datetime64[s]")
+        wake = np.array([r.wake_time for r in rows], dtype="datetime64[s]")
+        ids = np.array([r.id for r in rows], dtype=np.int64)
+        duration = np.array([r.duration for r in rows], dtype=np.float64)
+        return cls(sleep, wake, ids, duration)
+
+    def __len__(self):
+        return len(self.sleep)
+
+    @property
+    def nbytes(self):
+        arrays = (self.sleep, self.wake, self.ids, self.duration)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    @property
+    def duration_seconds(self):
+        return (self.wake - self.sleep).astype(np.int64)
+
+    @property
+    def sleep_day(self):
+        return self.sleep.astype("datetime64[D]")
+
+    def _take(self, index):
+        return SleepTimeline(
+            self.sleep[index], self.wake[index],
+            self.ids[index] if self.ids is not None else None,
+            self.duration[index] if self.duration is not None else None,
+        )
+
+    def window(self, sleep_from=None, sleep_before=None, wake_before=None, wake_until=None):
+        mask = np.ones(len(self), dtype=bool)
+        if sleep_from is not None:
+            mask &= self.sleep >= np.datetime64(sleep_from, "s")
+        if sleep_before is not None:
+            mask &= self.sleep < np.datetime64(sleep_before, "s")
+        if wake_before is not None:
+            mask &= self.wake < np.datetime64(wake_before, "s")
+        if wake_until is not None:
+            mask &= self.wake <= np.datetime64(wake_until, "s")
+        return self._take(mask)
+
+    def after(self, sleep_time, record_id):
+        """Record setelah cursor (sleep_time, id), urutan sama dengan keyset query."""
+        sleep_time = np.datetime64(sleep_time, "s")
+        return self._take((self.sleep < sleep_time) | ((self.sleep == sleep_time) & (self.ids < record_id)))
+
+    def with_record(self, record_id, sleep_time, wake_time, duration):
+        """
+        Timeline baru dengan satu record ditambah/diganti (id atau tanggal tidur
+        yang sama, sesuai unique key (email, sleep_date)). Array lama tidak diubah,
+        jadi request yang sedang membaca timeline lama tetap konsisten.
+        """
+        sleep_time = np.datetime64(sleep_time, "s")
+        keep = (self.ids != record_id) & (self.sleep_day != sleep_time.astype("datetime64[D]"))
+        sleep = np.append(self.sleep[keep], sleep_time)
+        wake = np.append(self.wake[keep], np.datetime64(wake_time, "s"))
+        ids = np.append(self.ids[keep], np.int64(record_id))
+        duration = np.append(self.duration[keep], float(duration))
+        # Urutan (sleep_time, id) menurun
+        order = np.lexsort((ids, sleep))[::-1]
+        return SleepTimeline(sleep[order], wake[order], ids[order], duration[order])
+
+
+async def load_timeline(db, email, sleep_from=None, sleep_before=None, wake_before=None, wake_until=None,
+                        limit=None):
+    """Satu query: kolom id, sleep_time, wake_time & duration saja, tanpa objek ORM."""
+    record = models.SleepRecord
+    query = select(record.id, record.sleep_time, record.wake_time, record.duration).where(record.email == email)
+    if sleep_from is not None:
+        query = query.where(record.sleep_time >= sleep_from)
+    if sleep_before is not None:
+        query = query.where(record.sleep_time < sleep_before)
+    if wake_before is not None:
+        query = query.where(record.wake_time < wake_before)
+    if wake_until is not None:
+        query = query.where(record.wake_time <= wake_until)
+    query = query.order_by(record.sleep_time.desc(), record.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    rows = (await db.execute(query)).all()
+    return SleepTimeline.from_rows(rows)
+
+
+# ==========================================
+# BUCKETING
+# ==========================================
+
+def bucket_index(timeline, start, granularity, n_buckets=None):
+    """Index bucket (0..n-1) untuk setiap record, relatif ke tanggal `start`."""
+    days = timeline.sleep_day
+    start_day = np.datetime64(start, "D")
+
+    if granularity == "day":
+        index = (days - start_day).astype(np.int64)
+    elif granularity == "weekday":
+        # 1970-01-01 adalah hari Kamis (weekday 3)
+        index = (days.astype(np.int64) + 3) % 7
+    elif granularity == "week":
+        index = (days - start_day).astype(np.int64) // 7
+    elif granularity == "month":
+        index = (days.astype("datetime64[M]") - start_day.astype("datetime64[M]")).astype(np.int64)
+    elif granularity == "year":
+        index = (days.astype("datetime64[Y]") - start_day.astype("datetime64[Y]")).astype(np.int64)
+    else:
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    if n_buckets is not None:
+        index = np.clip(index, 0, n_buckets - 1)
+    return index
+
+
+def bucket_count(start, end, granularity):
+    """Jumlah bucket untuk rentang tanggal [start, end] (inklusif)."""
+    if granularity == "day":
+        return (end - start).days + 1
+    if granularity == "weekday":
+        return 7
+    if granularity == "week":
+        return (end - start).days // 7 + 1
+    if granularity == "month":
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    if granularity == "year":
+        return end.year - start.year + 1
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def bucket_starts(start, n_buckets, granularity):
+    """Tanggal awal setiap bucket (untuk label)."""
+    if granularity == "day":
+        return [start + timedelta(days=i) for i in range(n_buckets)]
+    if granularity == "week":
+        return [start + timedelta(days=7 * i) for i in range(n_buckets)]
+    if granularity == "month":
+        first = start.year * 12 + start.month - 1
+        return [date((first + i) // 12, (first + i) % 12 + 1, 1) for i in range(n_buckets)]
+    if granularity == "year":
+        return [date(start.year + i, 1, 1) for i in range(n_buckets)]
+    return [None] * n_buckets
+
+
+# ==========================================
+# AGGREGATION
+# ==========================================
+
+def time_of_day_seconds(values):
+    return (values - values.astype("datetime64[D]")).astype(np.int64)
+
+
+def circular_mean_seconds(seconds, index=None, n_buckets=1):
+    """
+    Rata-rata jam (detik sejak 00:00) pada lingkaran 24 jam.
+    Return array per bucket; NaN untuk bucket kosong.
+    """
+    if index is None:
+        index = np.zeros(len(seconds), dtype=np.int64)
+    angle = seconds * (2 * np.pi / SECONDS_PER_DAY)
+    sin = np.bincount(index, np.sin(angle), minlength=n_buckets)
+    cos = np.bincount(index, np.cos(angle), minlength=n_buckets)
+    counts = np.bincount(index, minlength=n_buckets)
+
+    mean = np.mod(np.arctan2(sin, cos), 2 * np.pi) * (SECONDS_PER_DAY / (2 * np.pi))
+    return np.where(counts > 0, mean, np.nan)
+
+
+def aggregate(timeline, start, granularity, n_buckets):
+    """Jumlah record, total durasi & rata-rata jam tidur/bangun per bucket."""
+    index = bucket_index(timeline, start, granularity, n_buckets)
+    return {
+        "index": index,
+        "counts": np.bincount(index, minlength=n_buckets),
+        "duration_seconds": np.bincount(index, timeline.duration_seconds, minlength=n_buckets),
+        "sleep_time": circular_mean_seconds(time_of_day_seconds(timeline.sleep), index, n_buckets),
+        "wake_time": circular_mean_seconds(time_of_day_seconds(timeline.wake), index, n_buckets),
+    }
+
+
+def format_clock(seconds):
+    if seconds is None or np.isnan(seconds):
+        return None
+    minutes = int(seconds) // 60 % (24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def format_hours(hours):
+    return f"{int(hours)} jam {int((hours * 60) % 60)} menit"
+
+
+def to_hours(seconds):
+    # round() Python (bukan np.round) agar pembulatan sama dengan perhitungan sebelumnya
+    return [round(float(s) / 3600, 2) for s in np.atleast_1d(seconds)]
+
+
+def hhmm_lists(values, index, n_buckets):
+    """Jam "HH:MM" per bucket, urutan sama dengan timeline (terbaru lebih dulu)."""
+    labels = np.datetime_as_string(values, unit="m")
+    lists = {i: [] for i in range(n_buckets)}
+    for i, label in zip(index.tolist(), labels.tolist()):
+        lists[i].append(label[11:16])
+    return lists
+
+
+# ==========================================
+# RESPONSES
+# ==========================================
+
+def weekly_summary(timeline):
+    """Response /get-weekly-sleep-data: bucket per hari dalam minggu (0=Senin)."""
+    agg = aggregate(timeline, date(1970, 1, 1), "weekday", 7)
+    daily_hours = to_hours(agg["duration_seconds"])
+    total_duration = sum(daily_hours)
+    avg_duration = total_duration / len(timeline)
+
+    return {
+        "daily_sleep_durations": daily_hours,
+        "daily_sleep_start_times": hhmm_lists(timeline.sleep, agg["index"], 7),
+        "daily_wake_times": hhmm_lists(timeline.wake, agg["index"], 7),
+        "avg_duration": format_hours(avg_duration),
+        "avg_sleep_time": format_clock(circular_mean_seconds(time_of_day_seconds(timeline.sleep))[0]),
+        "avg_wake_time": format_clock(circular_mean_seconds(time_of_day_seconds(timeline.wake))[0]),
+        "total_duration": format_hours(total_duration),
+    }
+
+
+def monthly_summary(timeline, month_start, days_in_month):
+    """Response /get-monthly-sleep-data: 4 bucket minggu (minggu ke-4 menampung sisa hari)."""
+    weekly = aggregate(timeline, month_start, "week", 4)
+    daily = aggregate(timeline, month_start, "day", days_in_month)
+    weekly_hours = to_hours(weekly["duration_seconds"])
+    total_duration = sum(weekly_hours)
+    avg_duration = total_duration / len(timeline)
+
+    return {
+        "weekly_sleep_durations": weekly_hours,
+        "weekly_sleep_start_times": hhmm_lists(timeline.sleep, weekly["index"], 4),
+        "weekly_wake_times": hhmm_lists(timeline.wake, weekly["index"], 4),
+        "daily_sleep_durations": to_hours(daily["duration_seconds"]),
+        "avg_duration": format_hours(avg_duration),
+        "avg_sleep_time": format_clock(circular_mean_seconds(time_of_day_seconds(timeline.sleep))[0]),
+        "avg_wake_time": format_clock(circular_mean_seconds(time_of_day_seconds(timeline.wake))[0]),
+        "total_duration": format_hours(total_duration),
+    }
+
+
+def period_summary(timeline, start, end, granularity):
+    """Response /sleep-analytics: bucket day/week/month/year untuk rentang [start, end]."""
+    n_buckets = bucket_count(start, end, granularity)
+    agg = aggregate(timeline, start, granularity, n_buckets)
+    starts = bucket_starts(start, n_buckets, granularity)
+
+    buckets = []
+    for i in range(n_buckets):
+        count = int(agg["counts"][i])
+        total_hours = to_hours(agg["duration_seconds"][i])[0]
+        buckets.append({
+            "start": starts[i].isoformat() if starts[i] else i,
+            "records": count,
+            "total_hours": total_hours,
+            "avg_hours": round(total_hours / count, 2) if count else 0.0,
+            "avg_sleep_time": format_clock(agg["sleep_time"][i]),
+            "avg_wake_time": format_clock(agg["wake_time"][i]),
+        })
+
+    total_hours = to_hours(timeline.duration_seconds.sum())[0]
+    return {
+        "granularity": granularity,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "records": len(timeline),
+        "total_duration": format_hours(total_hours),
+        "avg_duration": format_hours(total_hours / len(timeline)) if len(timeline) else format_hours(0),
+        "avg_sleep_time": format_clock(circular_mean_seconds(time_of_day_seconds(timeline.sleep))[0]),
+        "avg_wake_time": format_clock(circular_mean_seconds(time_of_day_seconds(timeline.wake))[0]),
+        "buckets": buckets,
+    }
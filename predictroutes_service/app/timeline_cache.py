@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- SLEEP TIMELINE CACHE SETTINGS ---
+TIMELINE_CACHE_MAX_BYTES = int(os.getenv("TIMELINE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+TIMELINE_CACHE_MAX_RECORDS = int(os.getenv("TIMELINE_CACHE_MAX_RECORDS", "20000"))  # per user
+TIMELINE_CACHE_TTL = float(os.getenv("TIMELINE_CACHE_TTL", "600"))  # detik, batas basi antar worker
+
+# Perkiraan overhead per entry (key, tuple, objek SleepTimeline), ikut dihitung
+# agar user tanpa record / riwayat terlalu besar tetap membatasi ukuran cache
+ENTRY_OVERHEAD_BYTES = 512
+
+
+def _entry_bytes(timeline):
+    return ENTRY_OVERHEAD_BYTES + (timeline.nbytes if timeline is not None else 0)
+
+
+class TimelineCache:
+    """
+    Cache riwayat tidur per user in-process: sleep_analytics.SleepTimeline
+    (array id, sleep, wake, duration), bukan objek ORM.
+
+    - LRU dengan batas total byte array (bukan jumlah entry)
+    - Riwayat lebih dari max_records tidak di-cache -> get() return None,
+      pemanggil membaca langsung dari database
+    - Ditambal langsung oleh save_sleep_record (patch); TTL hanya membatasi
+      umur data jika ada penulis lain (worker / proses lain)
+    """
+
+    def __init__(self, loader, max_bytes=TIMELINE_CACHE_MAX_BYTES,
+                 max_records=TIMELINE_CACHE_MAX_RECORDS, ttl=TIMELINE_CACHE_TTL):
+        # loader(email, limit) -> SleepTimeline (maksimal `limit` record, terbaru lebih dulu)
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.max_records = max_records
+        self.ttl = ttl
+        self.resident_bytes = 0
+        self._entries = OrderedDict()  # email -> (timeline | None jika terlalu besar, loaded_at)
+        self._loading = {}             # email -> asyncio.Task
+        self._generations = {}         # email -> counter invalidasi / patch
+
+        metrics.register_gauge("timeline_cache_users", lambda: len(self._entries))
+        metrics.register_gauge("timeline_cache_resident_bytes", lambda: self.resident_bytes)
+        metrics.register_gauge("timeline_cache_hit_ratio", self.hit_ratio)
+
+    def __contains__(self, email):
+        return email in self._entries
+
+    def hit_ratio(self):
+        hits = metrics.counter_value("timeline_cache_hit_total")
+        total = hits + metrics.counter_value("timeline_cache_miss_total")
+        return round(hits / total, 4) if total else None
+
+    async def get(self, email):
+        """Timeline lengkap user, atau None jika riwayatnya terlalu besar untuk di-cache."""
+        entry = self._entries.get(email)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            self._entries.move_to_end(email)
+            metrics.inc("timeline_cache_hit_total")
+            return entry[0]
+
+        metrics.inc("timeline_cache_miss_total")
+        # Request bersamaan untuk email yang sama cukup satu kali query
+        task = self._loading.get(email)
+        if task is None:
+            task = self._start_load(email)
+        return await asyncio.shield(task)
+
+    def peek(self, email):
+        """Timeline yang sudah ada di cache (tanpa load), atau None."""
+        entry = self._entries.get(email)
+        if entry is None or time.monotonic() - entry[1] >= self.ttl:
+            return None
+        return entry[0]
+
+    def patch(self, email, record_id, sleep_time, wake_time, duration):
+        """
+        Tambah/ganti satu record setelah save_sleep_record commit.
+        record_id None (user belum di-cache saat menulis): entry cukup dibuang.
+        """
+        # Load yang sedang berjalan mungkin sudah membaca data lama
+        self._generations[email] = self._generations.get(email, 0) + 1
+        self._loading.pop(email, None)
+
+        entry = self._entries.get(email)
+        if entry is None or entry[0] is None:
+            return
+        if record_id is None:
+            self._drop(email)
+            return
+        timeline = entry[0].with_record(record_id, sleep_time, wake_time, duration)
+        if len(timeline) > self.max_records:
+            self._store(email, None, entry[1])
+        else:
+            self._store(email, timeline, entry[1])
+        metrics.inc("timeline_cache_patches_total")
+
+    def invalidate(self, email=None):
+        """Hapus satu email, atau seluruh cache jika email None."""
+        emails = list(self._entries) + list(self._loading) if email is None else [email]
+        for key in emails:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._loading.pop(key, None)
+            self._drop(key)
+        metrics.inc("timeline_cache_invalidations_total")
+
+    def _store(self, email, timeline, loaded_at):
+        self._drop(email)
+        self._entries[email] = (timeline, loaded_at)
+        self.resident_bytes += _entry_bytes(timeline)
+        # Evict LRU sampai total byte di bawah batas (entry terbaru tetap disimpan)
+        while self.resident_bytes > self.max_bytes and len(self._entries) > 1:
+            evicted, _ = next(iter(self._entries.items()))
+            self._drop(evicted)
+            metrics.inc("timeline_cache_evictions_total")
+
+    def _drop(self, email):
+        entry = self._entries.pop(email, None)
+        if entry is not None:
+            self.resident_bytes -= _entry_bytes(entry[0])
+
+    def _start_load(self, email):
+        task = asyncio.create_task(self._fetch(email, self._generations.get(email, 0)))
+        self._loading[email] = task
+
+        def done(t):
+            if self._loading.get(email) is t:
+                del self._loading[email]
+            if not t.cancelled():
+                t.exception()  # Error diteruskan ke pemanggil lewat await
+
+        task.add_done_callback(done)
+        return task
+
+    async def _fetch(self, email, generation):
+        timeline = await self.loader(email, self.max_records + 1)
+        if len(timeline) > self.max_records:
+            # Riwayat terlalu besar: tandai saja, pemanggil membaca dari database
+            metrics.inc("timeline_cache_oversized_total")
+            timeline = None
+        if generation == self._generations.get(email, 0):
+            self._store(email, timeline, time.monotonic())
+        return timeline
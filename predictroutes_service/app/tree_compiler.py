@@ -0,0 +1,255 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Compiler & evaluator pohon XGBoost berbasis NumPy murni.
+#
+# Booster XGBoost dikonversi sekali menjadi array datar (feature, threshold,
+# left/right child, leaf value) lalu disimpan sebagai .npz di samping file .pkl.
+# Saat runtime, CompiledForest hanya butuh NumPy (tanpa import xgboost).
+# File .npz menyimpan sha256 dari .pkl sumbernya; jika .pkl diganti tanpa
+# kompilasi ulang, .npz dianggap basi (lihat model_registry.load_compiled).
+
+
+class CompiledForest:
+    """
+    Pengganti XGBClassifier untuk inferensi: predict / predict_proba.
+    Semua pohon ditelusuri bersamaan untuk seluruh batch (vectorized).
+    """
+
+    ARRAYS = ("feature", "threshold", "left", "right", "default_left",
+              "value", "roots", "tree_class", "base_margin")
+
+    def __init__(self, feature, threshold, left, right, default_left,
+                 value, roots, tree_class, base_margin, max_depth, source_hash=""):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.tree_class = tree_class
+        self.base_margin = base_margin
+        self.max_depth = int(max_depth)
+        self.source_hash = str(source_hash)
+
+        self.n_classes = len(base_margin)
+        self.classes_ = np.arange(self.n_classes)
+        # children[2 * node + go_left] -> node berikutnya (right, left)
+        self._children = np.stack([right, left], axis=1).ravel()
+        # Matriks (n_trees, n_classes) untuk menjumlahkan leaf per kelas sekaligus
+        self._class_matrix = np.zeros((len(roots), self.n_classes), dtype=np.float32)
+        self._class_matrix[np.arange(len(roots)), tree_class] = 1.0
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        source_hash = data["source_hash"] if "source_hash" in data.files else ""
+        return cls(*(data[name] for name in cls.ARRAYS), max_depth=data["max_depth"], source_hash=source_hash)
+
+    def save(self, path):
+        np.savez(path, max_depth=self.max_depth, source_hash=self.source_hash,
+                 **{name: getattr(self, name) for name in self.ARRAYS})
+
+    def predict_margin(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        flat_X = X.ravel()
+        row_offset = (np.arange(X.shape[0], dtype=np.intp) * X.shape[1])[:, None]
+        nodes = np.tile(self.roots, (X.shape[0], 1))
+        has_missing = np.isnan(X).any()
+
+        # Leaf menunjuk ke dirinya sendiri, jadi cukup iterasi sebanyak max_depth
+        for _ in range(self.max_depth):
+            x = flat_X[row_offset + self.feature[nodes]]
+            go_left = x < self.threshold[nodes]
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.default_left[nodes], go_left)
+            nodes = self._children[2 * nodes + go_left]
+
+        return self.value[nodes] @ self._class_matrix + self.base_margin
+
+    def predict_proba(self, X):
+        margin = self.predict_margin(X)
+        margin = margin - margin.max(axis=1, keepdims=True)
+        exp = np.exp(margin)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_margin(X), axis=1)]
+
+
+def compile_model(model, source_hash=""):
+    """
+    Konversi XGBClassifier (atau Booster) multi:softprob menjadi CompiledForest.
+    source_hash: sha256 file .pkl asal (lihat file_sha256).
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    learner = json.loads(booster.save_raw("json"))["learner"]
+
+    objective = learner["objective"]["name"]
+    if objective != "multi:softprob" and objective != "multi:softmax":
+        raise ValueError(f"Unsupported objective: {objective}")
+
+    params = learner["learner_model_param"]
+    n_classes = int(params["num_class"])
+    base_margin = np.array(json.loads(params["base_score"].replace("E", "e")), dtype=np.float32).reshape(-1)
+    if base_margin.size == 1:
+        base_margin = np.repeat(base_margin, n_classes)
+
+    gbtree = learner["gradient_booster"]["model"]
+    trees = gbtree["trees"]
+    tree_info = gbtree["tree_info"]
+
+    # Ikuti best_iteration (early stopping) seperti XGBClassifier.predict
+    best_iteration = booster.attr("best_iteration")
+    if best_iteration is not None:
+        n_used = gbtree["iteration_indptr"][int(best_iteration) + 1]
+        trees, tree_info = trees[:n_used], tree_info[:n_used]
+
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        if any(tree["split_type"]):
+            raise ValueError("Categorical splits are not supported")
+
+        n_nodes = len(tree["left_children"])
+        lc = np.array(tree["left_children"], dtype=np.int32)
+        rc = np.array(tree["right_children"], dtype=np.int32)
+        is_leaf = lc == -1
+        node_ids = np.arange(n_nodes, dtype=np.int32)
+
+        feature.append(np.where(is_leaf, 0, tree["split_indices"]).astype(np.int32))
+        threshold.append(np.where(is_leaf, 0, tree["split_conditions"]).astype(np.float32))
+        left.append(np.where(is_leaf, node_ids, lc) + offset)
+        right.append(np.where(is_leaf, node_ids, rc) + offset)
+        default_left.append(np.array(tree["default_left"], dtype=bool))
+        # Untuk leaf, split_conditions berisi nilai leaf (sudah dikali learning rate)
+        value.append(np.where(is_leaf, tree["split_conditions"], 0).astype(np.float32))
+        roots.append(offset)
+
+        max_depth = max(max_depth, _tree_depth(lc, rc))
+        offset += n_nodes
+
+    return CompiledForest(
+        feature=np.concatenate(feature),
+        threshold=np.concatenate(threshold),
+        left=np.concatenate(left).astype(np.int32),
+        right=np.concatenate(right).astype(np.int32),
+        default_left=np.concatenate(default_left),
+        value=np.concatenate(value),
+        roots=np.array(roots, dtype=np.int32),
+        tree_class=np.array(tree_info, dtype=np.int32),
+        base_margin=base_margin,
+        max_depth=max_depth,
+        source_hash=source_hash,
+    )
+
+
+def _tree_depth(left, right):
+    depth = 0
+    frontier = [0]
+    while frontier:
+        frontier = [c for n in frontier for c in (left[n], right[n]) if c != -1]
+        if frontier:
+            depth += 1
+    return depth
+
+
+def compiled_path(model_path):
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ==========================================
+# CLI: compile + parity check
+# ==========================================
+# python tree_compiler.py ml_model/xgb_model_Test.pkl [--check]
+
+def _peak_rss_mb(code):
+    # Diukur di proses baru agar import xgboost di proses ini tidak ikut terhitung
+    import subprocess
+    script = code + (
+        "\nprint([l.split()[1] for l in open('/proc/self/status') if l.startswith('VmHWM')][0])"
+    )
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", script], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return int(out.stdout.strip().splitlines()[-1]) / 1024
+
+
+def _timeit(fn, X, repeat):
+    fn(X)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def check_parity(model, compiled, model_path, n_rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    # Sampel di sekitar threshold yang dipakai model agar semua cabang terlewati
+    X = np.empty((n_rows, compiled.feature.max() + 1), dtype=np.float32)
+    for f in range(X.shape[1]):
+        thr = compiled.threshold[(compiled.feature == f) & (compiled.left != np.arange(len(compiled.left)))]
+        lo, hi = (thr.min(), thr.max()) if thr.size else (0.0, 1.0)
+        span = max(hi - lo, 1.0)
+        X[:, f] = rng.uniform(lo - 0.1 * span, hi + 0.1 * span, n_rows)
+    X[rng.random(X.shape) < 0.02] = np.nan
+
+    expected = model.predict(X)
+    actual = compiled.predict(X)
+    mismatches = int((expected != actual).sum())
+    proba_diff = float(np.abs(model.predict_proba(X) - compiled.predict_proba(X)).max())
+    print(f"parity: {n_rows - mismatches}/{n_rows} labels match, max |proba diff| = {proba_diff:.2e}")
+
+    row = X[:1]
+    print(f"latency   1 row : xgboost {_timeit(model.predict, row, 200):8.1f} us | compiled {_timeit(compiled.predict, row, 200):8.1f} us")
+    for n in (64, 256):
+        batch = X[:n]
+        print(f"latency {n:3d} rows: xgboost {_timeit(model.predict, batch, 50):8.1f} us | compiled {_timeit(compiled.predict, batch, 50):8.1f} us")
+
+    rss_pickle = _peak_rss_mb(f"import joblib; joblib.load({model_path!r})")
+    rss_compiled = _peak_rss_mb(f"from tree_compiler import CompiledForest; CompiledForest.load({compiled_path(model_path)!r})")
+    print(f"peak RSS        : joblib+xgboost {rss_pickle:.1f} MB | compiled {rss_compiled:.1f} MB")
+
+    return mismatches == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile XGBoost pickle models to NumPy arrays (.npz).")
+    parser.add_argument("models", nargs="+", help="path ke file .pkl model XGBoost")
+    parser.add_argument("--check", action="store_true", help="bandingkan hasil dengan model.predict")
+    args = parser.parse_args()
+
+    import joblib
+
+    ok = True
+    for path in args.models:
+        model = joblib.load(path)
+        compiled = compile_model(model, source_hash=file_sha256(path))
+        compiled.save(compiled_path(path))
+        print(f"{path} -> {compiled_path(path)} ({len(compiled.roots)} trees, depth {compiled.max_depth})")
+        if args.check:
+            ok = check_parity(model, compiled, path) and ok
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
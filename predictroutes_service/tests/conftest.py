@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Modul service di-import flat (seperti saat dijalankan dari app/)
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+sys.path.insert(0, APP_DIR)
+
+# database.py wajib punya DATABASE_URL saat import; test memakai engine sqlite sendiri
+# (engine modul hanya dibuat, tidak pernah connect)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "predict_tests.db"))
@@ -0,0 +1,43 @@
+import asyncio
+
+import auth_profiles
+import profile_cache
+
+USER_ROW = {
+    "id": 7, "email": "a@x", "hashed_password": "$2b$12$secret", "reset_token": "tok", "role": "user",
+    "name": "A", "gender": 1, "work": "Teacher", "date_of_birth": "1990-01-01", "age": 36,
+    "weight": 70.0, "height": 175.0, "upper_pressure": 120, "lower_pressure": 80,
+    "daily_steps": 8000, "heart_rate": 65,
+}
+BATCH_PROFILE = {field: USER_ROW[field] for field in auth_profiles.PROFILE_FEATURE_FIELDS}
+
+
+class Resp:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+def test_single_and_bulk_loaders_cache_the_same_compact_shape(monkeypatch):
+    async def get(url):
+        return Resp(200, dict(USER_ROW))
+
+    async def post(url, json):
+        return Resp(200, {"profiles": {e: dict(BATCH_PROFILE, work_id=3) for e in json["emails"]}, "not_found": []})
+
+    monkeypatch.setattr(auth_profiles.auth_client, "get", get)
+    monkeypatch.setattr(auth_profiles.auth_client, "post", post)
+    cache = profile_cache.ProfileCache(auth_profiles._get_user_profile)
+
+    async def run():
+        single = await cache.get("a@x")
+        bulk = await cache.get_many(["b@x"], auth_profiles._get_user_profiles)
+        return single, bulk["b@x"]
+
+    single, bulk = asyncio.run(run())
+    assert single == bulk == BATCH_PROFILE
+    assert "hashed_password" not in cache._entries["a@x"][0]
+    assert "reset_token" not in cache._entries["a@x"][0]
@@ -0,0 +1,67 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+import models
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("mysql+pymysql://u:p@db:3306/x", "mysql+aiomysql://u:p@db:3306/x"),
+    ("mysql://u:p@db/x", "mysql+aiomysql://u:p@db/x"),
+    ("sqlite:///data/x.db", "sqlite+aiosqlite:///data/x.db"),
+    ("postgresql+asyncpg://u@db/x", "postgresql+asyncpg://u@db/x"),
+])
+def test_to_async_url(url, expected):
+    assert database.to_async_url(url) == expected
+
+
+def sleep_rows(email, days, start=date(2026, 1, 1)):
+    rows = []
+    for i in range(days):
+        sleep_time = datetime.combine(start + timedelta(days=i), datetime.min.time()) + timedelta(hours=22)
+        rows.append({
+            "email": email, "sleep_date": sleep_time.date(), "sleep_time": sleep_time,
+            "wake_time": sleep_time + timedelta(hours=7 + i % 3), "duration": 7.0 + i % 3,
+        })
+    return rows
+
+
+def test_sync_and_async_sessions_see_the_same_rows(tmp_path):
+    url = f"sqlite:///{tmp_path / 'predict.db'}"
+    engine = create_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(database.to_async_url(url))
+
+    query = (
+        select(models.SleepRecord.email, models.SleepRecord.sleep_date, models.SleepRecord.duration)
+        .order_by(models.SleepRecord.email, models.SleepRecord.sleep_date)
+    )
+    # Upsert yang sama lewat Session (sync) dan AsyncSession: update durasi, bukan baris baru
+    upsert_args = dict(conflict_columns=["email", "sleep_date"], update=["sleep_time", "wake_time", "duration"])
+
+    with sessionmaker(bind=engine)() as db:
+        db.execute(database.upsert(db, models.SleepRecord, sleep_rows("a@x", 10), **upsert_args))
+        db.execute(database.upsert(db, models.SleepRecord, dict(sleep_rows("a@x", 1)[0], duration=9.5), **upsert_args))
+        db.commit()
+        expected = db.execute(query).all()
+
+    async def read_and_write():
+        async with async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)() as db:
+            seen = (await db.execute(query)).all()
+            await db.execute(database.upsert(db, models.SleepRecord, sleep_rows("b@x", 3), **upsert_args))
+            await db.commit()
+        await async_engine.dispose()
+        return seen
+
+    assert asyncio.run(read_and_write()) == expected
+    assert len(expected) == 10 and expected[0].duration == 9.5
+
+    with sessionmaker(bind=engine)() as db:
+        written = db.execute(query.where(models.SleepRecord.email == "b@x")).all()
+    assert [(r.sleep_date, r.duration) for r in written] == [(r["sleep_date"], r["duration"]) for r in sleep_rows("b@x", 3)]
+    engine.dispose()
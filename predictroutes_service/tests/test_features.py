@@ -0,0 +1,82 @@
+import asyncio
+import os
+import warnings
+
+import joblib
+import numpy as np
+import pytest
+
+import features
+import inference
+from conftest import APP_DIR
+
+ML_DIR = os.path.join(APP_DIR, "ml_model")
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    scaler = joblib.load(os.path.join(ML_DIR, "minmax_scaler_split.pkl"))
+    gender_encoder = joblib.load(os.path.join(ML_DIR, "Gender_label_encoder.pkl"))
+    return features.FeaturePipeline(scaler, gender_encoder)
+
+
+def test_pipeline_matches_prepare_features(pipeline):
+    scaler = joblib.load(os.path.join(ML_DIR, "minmax_scaler_split.pkl"))
+    gender_encoder = joblib.load(os.path.join(ML_DIR, "Gender_label_encoder.pkl"))
+    rows, durations = features._random_profiles(500, seed=0)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # sklearn: feature names pada jalur referensi
+        expected = np.vstack([
+            features.prepare_features(u, d, scaler, gender_encoder) for u, d in zip(rows, durations)
+        ]).astype(np.float32)
+    actual, valid_mask = pipeline.transform(rows, durations, out=np.empty((len(rows), 12), dtype=np.float32))
+
+    assert valid_mask.all()
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-6)
+
+
+def test_malformed_value_only_invalidates_its_row(pipeline):
+    rows, durations = features._random_profiles(6)
+    rows[2] = dict(rows[2], heart_rate="abc")
+    rows[4] = dict(rows[4], height=[170])
+    durations[5] = "7h"
+
+    out, valid_mask = pipeline.transform(rows, durations, out=np.empty((6, 12), dtype=np.float32))
+    assert valid_mask.tolist() == [True, True, False, True, False, False]
+
+    clean, clean_mask = pipeline.transform([rows[i] for i in (0, 1, 3)], [durations[i] for i in (0, 1, 3)])
+    assert clean_mask.all()
+    np.testing.assert_array_equal(out[[0, 1, 3]], clean)
+
+
+def test_numeric_strings_are_accepted(pipeline):
+    rows, durations = features._random_profiles(2)
+    as_strings = [dict(row, age=str(row["age"])) for row in rows]
+    expected, _ = pipeline.transform(rows, durations, out=np.empty((2, 12), dtype=np.float32))
+    actual, valid_mask = pipeline.transform(as_strings, durations, out=np.empty((2, 12), dtype=np.float32))
+    assert valid_mask.all()
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_batcher_fails_only_the_malformed_request(pipeline):
+    async def score(user_rows, sleep_durations):
+        _, valid_mask = pipeline.transform(user_rows, sleep_durations)
+        return np.zeros(len(user_rows), dtype=int), valid_mask, "test"
+
+    async def run():
+        batcher = inference.MicroBatcher(score, window_ms=50, max_batch_size=8)
+        batcher.start()
+        try:
+            rows, durations = features._random_profiles(4)
+            rows[1] = dict(rows[1], daily_steps="many")
+            return await asyncio.gather(
+                *(batcher.submit(row, duration) for row, duration in zip(rows, durations)),
+                return_exceptions=True,
+            )
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+    assert isinstance(results[1], ValueError)
+    assert [results[i] for i in (0, 2, 3)] == [(0, "test")] * 3
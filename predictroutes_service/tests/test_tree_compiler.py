@@ -0,0 +1,104 @@
+import os
+import shutil
+import subprocess
+import sys
+import warnings
+
+import joblib
+import numpy as np
+import pytest
+
+import model_registry
+import tree_compiler
+from conftest import APP_DIR
+
+ML_DIR = os.path.join(APP_DIR, "ml_model")
+MODELS = ["xgb_model_Test", "xgb_model_tuned"]
+
+
+def load_xgb(name):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return joblib.load(os.path.join(ML_DIR, name + ".pkl"))
+
+
+def sample_features(compiled, n_rows=2000, seed=0):
+    # Sampel di sekitar threshold model agar semua cabang (termasuk missing) terlewati
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, compiled.feature.max() + 1), dtype=np.float32)
+    is_split = compiled.left != np.arange(len(compiled.left))
+    for f in range(X.shape[1]):
+        thr = compiled.threshold[(compiled.feature == f) & is_split]
+        lo, hi = (thr.min(), thr.max()) if thr.size else (0.0, 1.0)
+        span = max(hi - lo, 1.0)
+        X[:, f] = rng.uniform(lo - 0.1 * span, hi + 0.1 * span, n_rows)
+    X[rng.random(X.shape) < 0.02] = np.nan
+    return X
+
+
+@pytest.mark.parametrize("name", MODELS)
+def test_compiled_forest_matches_xgboost(name):
+    model = load_xgb(name)
+    compiled = tree_compiler.compile_model(model)
+    X = sample_features(compiled)
+
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), atol=1e-5)
+
+
+@pytest.mark.parametrize("name", MODELS)
+def test_shipped_npz_matches_pickle(name):
+    path = os.path.join(ML_DIR, name + ".pkl")
+    compiled = tree_compiler.CompiledForest.load(tree_compiler.compiled_path(path))
+    assert compiled.source_hash == tree_compiler.file_sha256(path)
+
+
+def test_stale_npz_falls_back_to_pickle(tmp_path):
+    shutil.copy(os.path.join(ML_DIR, "xgb_model_Test.pkl"), tmp_path / "xgb_model_Test.pkl")
+    for name in ("minmax_scaler_split.pkl", "Gender_label_encoder.pkl"):
+        shutil.copy(os.path.join(ML_DIR, name), tmp_path / name)
+    model = load_xgb("xgb_model_Test")
+
+    # .npz dari model lain di samping .pkl ini
+    stale = tree_compiler.compile_model(load_xgb("xgb_model_tuned"), source_hash="0" * 64)
+    stale.save(tree_compiler.compiled_path(str(tmp_path / "xgb_model_Test.pkl")))
+    assert model_registry.load_compiled(str(tmp_path / "xgb_model_Test.pkl")) is None
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        bundle = model_registry.ModelRegistry(str(tmp_path)).load("xgb_model_Test")
+    assert bundle.model is not None
+    assert bundle.compiled.source_hash == tree_compiler.file_sha256(str(tmp_path / "xgb_model_Test.pkl"))
+    X = sample_features(bundle.compiled, n_rows=200)
+    np.testing.assert_array_equal(bundle.predict(X), model.predict(X))
+
+
+def test_valid_npz_loads_without_xgboost():
+    # Proses baru: import xgboost di proses test tidak boleh ikut terhitung
+    code = (
+        "import sys, warnings; warnings.simplefilter('ignore')\n"
+        "import model_registry\n"
+        f"bundle = model_registry.ModelRegistry({ML_DIR!r}).load('xgb_model_Test')\n"
+        "print(bundle.model is None, bundle.compiled is not None, 'xgboost' in sys.modules)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["True", "True", "False"]
+
+
+def test_large_batches_load_booster_lazily(monkeypatch):
+    path = os.path.join(ML_DIR, "xgb_model_Test.pkl")
+    compiled = model_registry.load_compiled(path)
+    bundle = model_registry.ModelBundle("v", None, None, None, None, None, compiled=compiled, model_path=path)
+    X = sample_features(compiled, n_rows=10)
+
+    monkeypatch.setattr(model_registry, "COMPILED_MODEL_MAX_ROWS", 0)
+    bundle.predict(X)
+    assert bundle.model is None
+
+    monkeypatch.setattr(model_registry, "COMPILED_MODEL_MAX_ROWS", 4)
+    bundle.predict(X[:4])
+    assert bundle.model is None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        np.testing.assert_array_equal(bundle.predict(X), load_xgb("xgb_model_Test").predict(X))
+    assert bundle.model is not None